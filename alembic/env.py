@@ -12,6 +12,8 @@ from iam.core.config import settings
 from iam.db.base import Base
 from iam.models.user import User
 from iam.models.role import Role
+from iam.models.outbox import OutboxEvent
+from iam.models.permission import Permission
 
 
 # this is the Alembic Config object, which provides
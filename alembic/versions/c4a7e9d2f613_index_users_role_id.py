@@ -0,0 +1,39 @@
+"""Index users by role
+
+Revision ID: c4a7e9d2f613
+Revises: 8d3f6a2b7c41
+Create Date: 2026-10-18 15:21:09.552871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a7e9d2f613'
+down_revision: Union[str, None] = '8d3f6a2b7c41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built concurrently on PostgreSQL so large users tables stay writable.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_users_role_id',
+            'users',
+            ['role_id', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_users_role_id', table_name='users', postgresql_concurrently=True
+        )
@@ -0,0 +1,83 @@
+"""Compare two benchmark result files and flag regressions.
+
+Metrics ending in ``_ms`` or ``_us`` are better when lower, metrics ending in
+``per_sec`` when higher; other metrics are shown but never flagged.
+
+Run from the project root::
+
+    python -m benchmarks.compare benchmarks/results/load-abc1234.json \\
+        benchmarks/results/load-def5678.json --threshold 0.1
+"""
+
+import argparse
+import json
+import sys
+
+
+def changes(
+    baseline: dict, current: dict
+) -> list[tuple[str, str, float, float, float]]:
+    """Pair up the metrics present in both result documents.
+
+    Args:
+        baseline (dict): The earlier results document
+        current (dict): The later results document
+
+    Returns:
+        list[tuple[str, str, float, float, float]]: ``(case, metric, before,
+            after, regression)`` where ``regression`` is the relative change
+            in the bad direction, negative for improvements and 0 for
+            metrics without a direction
+    """
+    rows = []
+    for case, metrics in current["results"].items():
+        before_metrics = baseline["results"].get(case, {})
+        for metric, after in metrics.items():
+            before = before_metrics.get(metric)
+            if before is None:
+                continue
+            relative = (after - before) / before if before else 0.0
+            if metric.endswith(("_ms", "_us")):
+                regression = relative
+            elif metric.endswith("per_sec"):
+                regression = -relative
+            else:
+                regression = 0.0
+            rows.append((case, metric, before, after, regression))
+    return rows
+
+
+def main():
+    """Print the comparison and exit with status 1 if anything regressed."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slowdown reported as a regression (default 0.1)",
+    )
+    args = parser.parse_args()
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+
+    print(f"{baseline['commit']} -> {current['commit']}")
+    regressed = False
+    for case, metric, before, after, regression in changes(baseline, current):
+        flag = ""
+        if regression > args.threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        print(
+            f"{case:<34} {metric:<16} {before:>12.2f} {after:>12.2f} "
+            f"{regression:>+8.1%}{flag}"
+        )
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
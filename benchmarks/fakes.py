@@ -0,0 +1,308 @@
+"""In-process stand-ins for Redis and RabbitMQ used by the benchmarks.
+
+:class:`FakeRedis` implements the subset of ``redis.asyncio.Redis`` used by
+:mod:`iam.core.cache`, with the Lua scripts of the cache and the rate limiter
+reimplemented in Python, and :class:`FakeConnection` the subset of an aio_pika
+robust connection used by :mod:`iam.core.messaging`. Both can add a fixed
+delay per round-trip to approximate a network hop.
+"""
+
+import asyncio
+import functools
+import hashlib
+import time
+
+import aio_pika
+from redis.exceptions import NoScriptError
+
+
+def _incr_hash_if_built(redis: "FakeRedis", keys: list, args: list) -> int:
+    fields = redis._get(keys[0])
+    if fields is None or b"__built" not in fields:
+        redis._hincrby(keys[0], "__changes", 1)
+        if keys[0] not in redis._expires:
+            redis._expires[keys[0]] = time.monotonic() + int(args[0])
+        return 0
+    for field, delta in zip(args[1::2], args[2::2]):
+        redis._hincrby(keys[0], field, int(delta))
+    return 1
+
+
+def _build_hash(redis: "FakeRedis", keys: list, args: list) -> int:
+    fields = redis._get(keys[0]) or {}
+    if b"__built" in fields or fields.get(b"__changes", b"0") != redis._encode(args[0]):
+        return 0
+    redis._delete(keys[0])
+    redis._hset(keys[0], {"__built": 1, **dict(zip(args[2::2], args[3::2]))})
+    redis._expires[keys[0]] = time.monotonic() + int(args[1])
+    return 1
+
+
+def _release_lock(redis: "FakeRedis", keys: list, args: list) -> int:
+    if redis._get(keys[0]) != redis._encode(args[0]):
+        return 0
+    return redis._delete(keys[0])
+
+
+def _sliding_window(redis: "FakeRedis", keys: list, args: list) -> int:
+    now_ms = int(time.time() * 1000)
+    window, limit, member = int(args[0]), int(args[1]), args[2]
+    scores = redis._get(keys[0]) or {}
+    scores = {name: score for name, score in scores.items() if score > now_ms - window}
+    if len(scores) < limit:
+        scores[member] = now_ms
+        redis._data[keys[0]] = scores
+        redis._expires[keys[0]] = time.monotonic() + window / 1000
+        return 0
+    redis._data[keys[0]] = scores
+    return max(1, min(scores.values()) + window - now_ms)
+
+
+@functools.cache
+def _scripts() -> dict:
+    # Imported late so the fakes can be installed before the application.
+    from iam.core import cache, ratelimit
+
+    return {
+        cache._INCR_HASH_IF_BUILT.sha: _incr_hash_if_built,
+        cache._BUILD_HASH.sha: _build_hash,
+        cache._RELEASE_LOCK.sha: _release_lock,
+        ratelimit._SLIDING_WINDOW.sha: _sliding_window,
+    }
+
+
+class FakeRedis:
+    """Dictionary-backed Redis with key expiry.
+
+    Args:
+        latency (float, optional): Seconds to sleep per round-trip.
+            Defaults to 0.
+    """
+
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+        self._data: dict[str, bytes | dict] = {}
+        self._expires: dict[str, float] = {}
+
+    async def _round_trip(self):
+        await asyncio.sleep(self.latency)
+
+    @staticmethod
+    def _encode(value) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def _get(self, key: str) -> bytes | dict | None:
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return self._data.get(key)
+
+    def _set(self, key, value, ex=None, px=None, nx=False):
+        if nx and self._get(key) is not None:
+            return None
+        self._data[key] = self._encode(value)
+        self._expires.pop(key, None)
+        if ex is not None:
+            self._expires[key] = time.monotonic() + ex
+        elif px is not None:
+            self._expires[key] = time.monotonic() + px / 1000
+        return True
+
+    def _pttl(self, key: str) -> int:
+        if self._get(key) is None:
+            return -2
+        expires = self._expires.get(key)
+        return -1 if expires is None else int((expires - time.monotonic()) * 1000)
+
+    def _delete(self, *keys) -> int:
+        removed = 0
+        for key in keys:
+            removed += self._data.pop(key, None) is not None
+            self._expires.pop(key, None)
+        return removed
+
+    def _incr(self, key: str) -> int:
+        value = int(self._get(key) or 0) + 1
+        self._data[key] = str(value).encode()
+        return value
+
+    def _hset(self, key: str, mapping: dict) -> int:
+        fields = self._get(key)
+        if fields is None:
+            fields = self._data[key] = {}
+        added = 0
+        for field, value in mapping.items():
+            added += self._encode(field) not in fields
+            fields[self._encode(field)] = self._encode(value)
+        return added
+
+    def _hincrby(self, key: str, field, delta: int) -> int:
+        value = int((self._get(key) or {}).get(self._encode(field), 0)) + delta
+        self._hset(key, {field: value})
+        return value
+
+    def _evalsha(self, sha: str, numkeys: int, keys_and_args: tuple):
+        script = _scripts().get(sha)
+        if script is None:
+            raise NoScriptError("No matching script")
+        keys = list(keys_and_args[:numkeys])
+        return script(self, keys, list(keys_and_args[numkeys:]))
+
+    async def get(self, key):
+        await self._round_trip()
+        return self._get(key)
+
+    async def set(self, key, value, ex=None, px=None, nx=False):
+        await self._round_trip()
+        return self._set(key, value, ex, px, nx)
+
+    async def mget(self, keys):
+        await self._round_trip()
+        return [self._get(key) for key in keys]
+
+    async def delete(self, *keys):
+        await self._round_trip()
+        return self._delete(*keys)
+
+    async def incr(self, key):
+        await self._round_trip()
+        return self._incr(key)
+
+    async def hgetall(self, key):
+        await self._round_trip()
+        return dict(self._get(key) or {})
+
+    async def hset(self, key, mapping):
+        await self._round_trip()
+        return self._hset(key, mapping)
+
+    async def evalsha(self, sha, numkeys, *keys_and_args):
+        await self._round_trip()
+        return self._evalsha(sha, numkeys, keys_and_args)
+
+    async def eval(self, source, numkeys, *keys_and_args):
+        await self._round_trip()
+        sha = hashlib.sha1(source.encode()).hexdigest()
+        return self._evalsha(sha, numkeys, keys_and_args)
+
+    async def publish(self, channel, message):
+        await self._round_trip()
+        return 0
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        """Start a pipeline whose commands run in one round-trip."""
+        return FakePipeline(self)
+
+    async def flushall(self):
+        self._data.clear()
+        self._expires.clear()
+
+
+class FakePipeline:
+    """Pipeline for :class:`FakeRedis` that queues commands until executed."""
+
+    def __init__(self, redis: FakeRedis):
+        self._redis = redis
+        self._commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._commands.clear()
+
+    def get(self, key):
+        self._commands.append(lambda: self._redis._get(key))
+
+    def set(self, key, value, ex=None, px=None, nx=False):
+        self._commands.append(lambda: self._redis._set(key, value, ex, px, nx))
+
+    def pttl(self, key):
+        self._commands.append(lambda: self._redis._pttl(key))
+
+    def delete(self, *keys):
+        self._commands.append(lambda: self._redis._delete(*keys))
+
+    def hset(self, key, mapping):
+        self._commands.append(lambda: self._redis._hset(key, mapping))
+
+    def evalsha(self, sha, numkeys, *keys_and_args):
+        self._commands.append(lambda: self._redis._evalsha(sha, numkeys, keys_and_args))
+
+    def publish(self, channel, message):
+        self._commands.append(lambda: 0)
+
+    async def execute(self):
+        await self._redis._round_trip()
+        results = [command() for command in self._commands]
+        self._commands.clear()
+        return results
+
+
+class FakeExchange:
+    """Default exchange stand-in that counts published messages."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.published = 0
+
+    async def publish(self, message, routing_key, timeout=None):
+        await asyncio.sleep(self.latency)
+        self.published += 1
+
+
+class FakeChannel:
+    """Confirm-mode channel stand-in."""
+
+    def __init__(self, exchange: FakeExchange):
+        self.default_exchange = exchange
+        self.is_closed = False
+
+    async def declare_queue(self, name, durable=False):
+        await asyncio.sleep(self.default_exchange.latency)
+
+    async def close(self):
+        self.is_closed = True
+
+
+class FakeConnection:
+    """Robust connection stand-in handing out fake channels.
+
+    Args:
+        latency (float, optional): Seconds each publish waits for its
+            confirm. Defaults to 0.
+    """
+
+    def __init__(self, latency: float = 0):
+        self.exchange = FakeExchange(latency)
+
+    async def channel(self, publisher_confirms=True):
+        return FakeChannel(self.exchange)
+
+    async def close(self):
+        pass
+
+
+def install(redis_latency: float = 0, amqp_latency: float = 0) -> FakeRedis:
+    """Replace the Redis client and the AMQP connection factory with fakes.
+
+    Args:
+        redis_latency (float, optional): Seconds per Redis round-trip.
+            Defaults to 0.
+        amqp_latency (float, optional): Seconds per broker confirm.
+            Defaults to 0.
+
+    Returns:
+        FakeRedis: The fake now used by :mod:`iam.core.cache`.
+    """
+    from iam.core import cache
+
+    redis = FakeRedis(redis_latency)
+    cache.open_redis([redis])
+
+    async def connect_robust(url):
+        return FakeConnection(amqp_latency)
+
+    aio_pika.connect_robust = connect_robust
+    return redis
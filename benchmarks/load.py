@@ -0,0 +1,203 @@
+"""Load driver for the ASGI app.
+
+Drives the application in-process through httpx's ASGI transport, against a
+throwaway SQLite database and the fakes from :mod:`benchmarks.fakes`, and
+reports latency percentiles and throughput per endpoint.
+
+Run from the project root::
+
+    python -m benchmarks.load --requests 2000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import time
+
+import benchmarks  # noqa: F401  (configures the environment)
+from benchmarks import fakes, results
+from httpx import ASGITransport, AsyncClient
+from iam.crud.user import create_users
+from iam.db.base import Base
+from iam.db import session as db_session
+from iam.db.session import async_session
+from iam.main import app
+from iam.models import outbox, permission, role, user  # noqa: F401  (register tables)
+from iam.models.permission import Permission
+from iam.models.role import Role
+from iam.schemas.user import UserCreate
+
+
+async def seed(roles: int, users: int):
+    """Recreate the schema and insert the roles, permissions and users read by
+    the scenarios.
+
+    Args:
+        roles (int): Number of roles to create
+        users (int): Number of users to create
+    """
+    async with db_session.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_session() as session:
+        session.add_all(Role(name=f"seed-role-{i}") for i in range(roles))
+        await session.commit()
+        session.add_all(
+            Permission(role_id=i + 1, action="read", resource=f"resource{i}")
+            for i in range(roles)
+        )
+        await session.commit()
+        for start in range(0, users, 500):
+            await create_users(
+                session,
+                [
+                    UserCreate(
+                        username=f"seed{i}",
+                        email=f"seed{i}@example.com",
+                        role_id=i % roles + 1,
+                    )
+                    for i in range(start, min(users, start + 500))
+                ],
+            )
+
+
+def scenarios(roles: int, users: int) -> dict:
+    """Build the request factories, one per scenario.
+
+    Args:
+        roles (int): Number of seeded roles
+        users (int): Number of seeded users
+
+    Returns:
+        dict: Functions returning ``(method, url, json)`` by scenario name
+    """
+    serial = itertools.count()
+
+    def create_user():
+        i = next(serial)
+        body = {
+            "username": f"load{i}",
+            "email": f"load{i}@example.com",
+            "role_id": i % roles + 1,
+        }
+        return "POST", "/api/v1/users/", body
+
+    def create_role():
+        return "POST", "/api/v1/roles/", {"name": f"load-role-{next(serial)}"}
+
+    def check():
+        return {
+            "user_id": random.randint(1, users),
+            "action": "read",
+            "resource": f"resource{random.randrange(roles)}",
+        }
+
+    return {
+        "POST /users": create_user,
+        "GET /users/{id}": lambda: (
+            "GET",
+            f"/api/v1/users/{random.randint(1, users)}",
+            None,
+        ),
+        "GET /users?limit=100": lambda: ("GET", "/api/v1/users/?limit=100", None),
+        "POST /roles": create_role,
+        "GET /roles": lambda: ("GET", "/api/v1/roles/", None),
+        "POST /authorize": lambda: ("POST", "/api/v1/authorize/", check()),
+        "POST /authorize/batch (100)": lambda: (
+            "POST",
+            "/api/v1/authorize/batch",
+            {"checks": [check() for _ in range(100)]},
+        ),
+    }
+
+
+async def drive(client: AsyncClient, make_request, requests: int, concurrency: int):
+    """Send ``requests`` requests with ``concurrency`` concurrent clients.
+
+    Args:
+        client (AsyncClient): Client bound to the app
+        make_request: Function returning ``(method, url, json)``
+        requests (int): Total number of requests
+        concurrency (int): Number of concurrent clients
+
+    Returns:
+        dict: Latency percentiles, throughput and error count
+    """
+    latencies: list[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, url, body = make_request()
+            start = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code >= 400
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        **results.percentiles(latencies),
+        "requests_per_sec": requests / elapsed,
+        "errors": errors,
+    }
+
+
+async def run(args) -> dict:
+    """Seed the database, warm up and run every scenario.
+
+    Args:
+        args: The parsed command line arguments
+
+    Returns:
+        dict: Metrics by scenario
+    """
+    fakes.install(args.redis_latency, args.amqp_latency)
+    db_session.init_engines()
+    await seed(args.roles, args.users)
+    report = {}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, make_request in scenarios(args.roles, args.users).items():
+            if args.only and name not in args.only:
+                continue
+            await drive(client, make_request, args.warmup, args.concurrency)
+            report[name] = await drive(
+                client, make_request, args.requests, args.concurrency
+            )
+    await db_session.dispose_engines()
+    return report
+
+
+def main():
+    """Parse arguments, run the load test, print and store the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--roles", type=int, default=20)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--redis-latency", type=float, default=0.0)
+    parser.add_argument("--amqp-latency", type=float, default=0.0)
+    parser.add_argument("--only", action="append", help="Run only this scenario")
+    parser.add_argument("--output", help="JSON results file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(f"{'scenario':<22} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>9}")
+    for name, metrics in report.items():
+        print(
+            f"{name:<22} {metrics['p50_ms']:>8.2f} {metrics['p95_ms']:>8.2f} "
+            f"{metrics['p99_ms']:>8.2f} {metrics['requests_per_sec']:>9.0f}"
+            + (f"  ({metrics['errors']} errors)" if metrics["errors"] else "")
+        )
+    parameters = {key: value for key, value in vars(args).items() if key != "output"}
+    print("Results written to", results.write("load", parameters, report, args.output))
+
+
+if __name__ == "__main__":
+    main()
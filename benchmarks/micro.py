@@ -0,0 +1,172 @@
+"""Microbenchmarks for the user CRUD, cache and messaging modules.
+
+Each case runs a single operation in a loop against a throwaway SQLite
+database and the fakes from :mod:`benchmarks.fakes`, and reports the best and
+mean time per operation over several repeats.
+
+Run from the project root::
+
+    python -m benchmarks.micro --iterations 2000
+"""
+
+import argparse
+import asyncio
+import inspect
+import statistics
+import time
+
+import benchmarks  # noqa: F401  (configures the environment)
+from benchmarks import fakes, results
+from benchmarks.load import seed
+from iam.core import cache
+from iam.core.cache import LocalCache
+from iam.core.messaging import EventPublisher
+from iam.crud import user as user_crud
+from iam.db import session as db_session
+from iam.db.session import async_session
+
+
+async def measure(operation, iterations: int, repeat: int) -> dict:
+    """Time an operation.
+
+    Args:
+        operation: Function to call; a returned awaitable is awaited
+        iterations (int): Calls per repeat
+        repeat (int): Number of repeats
+
+    Returns:
+        dict: Best and mean microseconds per call, and calls per second
+    """
+    is_async = inspect.isawaitable(result := operation())
+    if is_async:
+        await result
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            if is_async:
+                await operation()
+            else:
+                operation()
+        timings.append((time.perf_counter() - start) / iterations)
+    best = min(timings)
+    return {
+        "best_us": best * 1e6,
+        "mean_us": statistics.fmean(timings) * 1e6,
+        "ops_per_sec": 1 / best,
+    }
+
+
+async def crud_cases(session) -> dict:
+    """Operations of :mod:`iam.crud.user` on a warm cache."""
+    ids = list(range(1, 101))
+    await user_crud.get_users_json(session, ids)
+    db_user = (await user_crud.list_users(session, None, 1))[0]
+
+    async def get_user_miss():
+        await cache.redis_client.delete(user_crud.user_cache_key(1))
+        await user_crud.get_user_json(session, 1)
+
+    return {
+        "crud.serialize_user": lambda: user_crud.serialize_user(db_user),
+        "crud.get_user_json (hit)": lambda: user_crud.get_user_json(session, 1),
+        "crud.get_user_json (miss)": get_user_miss,
+        "crud.get_users_json (100 hits)": lambda: user_crud.get_users_json(
+            session, ids
+        ),
+        "crud.list_users (100)": lambda: user_crud.list_users(session, None, 100),
+    }
+
+
+def cache_cases() -> dict:
+    """Operations of :mod:`iam.core.cache`."""
+    value = b'{"username":"bench","email":"bench@example.com","role_id":1}'
+    keys = [f"bench:{i}" for i in range(100)]
+    mapping = dict.fromkeys(keys, value)
+    local = LocalCache(max_entries=10000, max_bytes=1 << 24, ttl=60)
+    local.set("bench", value)
+
+    async def loader():
+        return value
+
+    return {
+        "cache.set_cache": lambda: cache.set_cache("bench", value),
+        "cache.get_cache": lambda: cache.get_cache("bench"),
+        "cache.get_or_load (hit)": lambda: cache.get_or_load("bench", loader),
+        "cache.set_many_cache (100)": lambda: cache.set_many_cache(mapping),
+        "cache.get_many_cache (100)": lambda: cache.get_many_cache(keys),
+        "cache.LocalCache.get": lambda: local.get("bench"),
+        "cache.LocalCache.set": lambda: local.set("bench", value),
+    }
+
+
+async def messaging_cases() -> dict:
+    """Operations of :mod:`iam.core.messaging` against a fake broker."""
+    publisher = EventPublisher("amqp://bench", pool_size=4, batch_size=100)
+    await publisher.start()
+    batch = [("user.created", f"User bench{i} created.") for i in range(100)]
+
+    async def publish_100():
+        for queue, message in batch:
+            await publisher.publish(queue, message)
+        await publisher._buffer.join()
+
+    return {
+        "messaging.publish_batch (100)": lambda: publisher.publish_batch(batch),
+        "messaging.publish + flush (100)": publish_100,
+    }, publisher
+
+
+async def run(args) -> dict:
+    """Seed the database and run every case.
+
+    Args:
+        args: The parsed command line arguments
+
+    Returns:
+        dict: Metrics by case
+    """
+    fakes.install(args.redis_latency, args.amqp_latency)
+    db_session.init_engines()
+    await seed(roles=5, users=args.users)
+    report = {}
+    async with async_session() as session:
+        cases = {**await crud_cases(session), **cache_cases()}
+        messaging, publisher = await messaging_cases()
+        cases.update(messaging)
+        for name, operation in cases.items():
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            report[name] = await measure(operation, args.iterations, args.repeat)
+        await publisher.close()
+    await db_session.dispose_engines()
+    return report
+
+
+def main():
+    """Parse arguments, run the microbenchmarks, print and store the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--redis-latency", type=float, default=0.0)
+    parser.add_argument("--amqp-latency", type=float, default=0.0)
+    parser.add_argument(
+        "--only", action="append", help="Run only cases starting with this prefix"
+    )
+    parser.add_argument("--output", help="JSON results file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(f"{'case':<34} {'best µs':>10} {'mean µs':>10} {'ops/s':>10}")
+    for name, metrics in report.items():
+        print(
+            f"{name:<34} {metrics['best_us']:>10.1f} {metrics['mean_us']:>10.1f} "
+            f"{metrics['ops_per_sec']:>10.0f}"
+        )
+    parameters = {key: value for key, value in vars(args).items() if key != "output"}
+    print("Results written to", results.write("micro", parameters, report, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Benchmark of the request middleware overhead on ``/health``.
+
+Serves ``/health`` from three otherwise identical applications: one without
+middleware, one with the two ``@app.middleware("http")`` functions the service
+used to register (request metrics and the request deadline, each a
+``BaseHTTPMiddleware`` layer), and one with the pure-ASGI
+:class:`~iam.core.middleware.RequestInstrumentationMiddleware`. Requests are
+sent straight to the ASGI application, so the figures are the per-request
+cost of the application and its middleware, without any client or socket.
+
+Run from the project root::
+
+    python -m benchmarks.middleware --iterations 5000
+"""
+
+import argparse
+import asyncio
+import time
+
+import benchmarks  # noqa: F401  (configures the environment)
+from benchmarks import results
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from iam.core.config import settings
+from iam.core.metrics import observe_request, route_label
+from iam.core.middleware import RequestInstrumentationMiddleware
+from iam.core.resilience import reset_deadline, set_deadline
+from iam.main import health_check
+
+
+def _bare() -> FastAPI:
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.get("/health")(health_check)
+    return app
+
+
+def _base_http_middleware() -> FastAPI:
+    app = _bare()
+
+    @app.middleware("http")
+    async def track_requests(request, call_next):
+        start = time.perf_counter()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            observe_request(
+                request.method,
+                route_label(request.scope),
+                status_code,
+                time.perf_counter() - start,
+            )
+
+    @app.middleware("http")
+    async def request_deadline(request, call_next):
+        token = set_deadline(settings.REQUEST_TIMEOUT)
+        try:
+            return await call_next(request)
+        finally:
+            reset_deadline(token)
+
+    return app
+
+
+def _pure_asgi(sample_rate: float) -> FastAPI:
+    app = _bare()
+    app.add_middleware(RequestInstrumentationMiddleware, sample_rate=sample_rate)
+    return app
+
+
+async def _request(app):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/health",
+        "raw_path": b"/health",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def _per_request(app, iterations: int) -> tuple[float, float]:
+    for _ in range(100):
+        await _request(app)
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(iterations):
+        await _request(app)
+    return (
+        (time.perf_counter() - wall) / iterations,
+        (time.process_time() - cpu) / iterations,
+    )
+
+
+async def _run(iterations: int, sample_rate: float) -> dict:
+    apps = {
+        "no_middleware": _bare(),
+        "base_http_middleware": _base_http_middleware(),
+        "pure_asgi": _pure_asgi(sample_rate),
+    }
+    report = {}
+    for name, app in apps.items():
+        wall, cpu = await _per_request(app, iterations)
+        report[name] = {"wall_us": wall * 1e6, "cpu_us": cpu * 1e6}
+    baseline = report["no_middleware"]["wall_us"]
+    for entry in report.values():
+        entry["overhead_us"] = entry["wall_us"] - baseline
+    return report
+
+
+def main():
+    """Run the benchmark, print and store the time per request."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--sample-rate", type=float, default=1.0)
+    parser.add_argument("--output", help="JSON results file")
+    args = parser.parse_args()
+
+    report = asyncio.run(_run(args.iterations, args.sample_rate))
+    print(f"{'stack':<22} {'wall µs':>10} {'cpu µs':>10} {'overhead µs':>12}")
+    for name, entry in report.items():
+        print(
+            f"{name:<22} {entry['wall_us']:>10.1f} {entry['cpu_us']:>10.1f}"
+            f" {entry['overhead_us']:>12.1f}"
+        )
+    parameters = {key: value for key, value in vars(args).items() if key != "output"}
+    path = results.write("middleware", parameters, report, args.output)
+    print("Results written to", path)
+
+
+if __name__ == "__main__":
+    main()
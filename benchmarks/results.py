@@ -0,0 +1,76 @@
+"""Helpers shared by the benchmark scripts: statistics and JSON results."""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    """Summarise latency samples in milliseconds.
+
+    Args:
+        samples (list[float]): Latencies in seconds
+
+    Returns:
+        dict[str, float]: Mean, p50, p95 and p99 in milliseconds
+    """
+    ordered = sorted(samples)
+
+    def at(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": at(0.50),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+    }
+
+
+def commit() -> str:
+    """The current git commit, or "unknown" outside a checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write(name: str, parameters: dict, results: dict, path: str | None = None) -> str:
+    """Store benchmark results as JSON.
+
+    Args:
+        name (str): The benchmark name
+        parameters (dict): The parameters the benchmark ran with
+        results (dict): Metrics by case
+        path (str, optional): Output file. Defaults to
+            ``benchmarks/results/<name>-<commit>.json``.
+
+    Returns:
+        str: The path written
+    """
+    revision = commit()
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{name}-{revision}.json")
+    document = {
+        "benchmark": name,
+        "commit": revision,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": parameters,
+        "results": results,
+    }
+    with open(path, "w") as file:
+        json.dump(document, file, indent=2)
+    return path
@@ -0,0 +1,110 @@
+"""Benchmark of response rendering on the hot user endpoints.
+
+Compares, per request, the CPU time spent turning a result into a response
+body the way FastAPI does by default (``response_model`` validation or
+``jsonable_encoder`` followed by ``JSONResponse``) with the orjson path used by
+the endpoints, which embeds cached bytes as they are.
+
+Run from the project root::
+
+    python -m benchmarks.serialization --iterations 2000
+"""
+
+import argparse
+import time
+
+import benchmarks  # noqa: F401  (configures the environment)
+import orjson
+from benchmarks import results
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from iam.crud.user import serialize_user
+from iam.models.role import Role
+from iam.models.user import User
+from iam.schemas.user import User as UserSchema
+
+
+def _users(count: int) -> list[User]:
+    role = Role(id=1, name="admin")
+    return [
+        User(
+            id=user_id,
+            username=f"user{user_id}",
+            email=f"user{user_id}@example.com",
+            role_id=1,
+            role=role,
+        )
+        for user_id in range(1, count + 1)
+    ]
+
+
+def _cases(page_size: int) -> dict:
+    users = _users(page_size)
+    cached = [serialize_user(user) for user in users]
+    one = cached[0]
+    return {
+        "get_user": (
+            lambda: JSONResponse(jsonable_encoder({"user": orjson.loads(one)})),
+            lambda: ORJSONResponse({"user": orjson.Fragment(one)}),
+        ),
+        f"lookup_{page_size}": (
+            lambda: JSONResponse(
+                jsonable_encoder(
+                    {
+                        "users": [
+                            {"id": i, "found": True, "user": orjson.loads(data)}
+                            for i, data in enumerate(cached)
+                        ]
+                    }
+                )
+            ),
+            lambda: ORJSONResponse(
+                {
+                    "users": [
+                        {"id": i, "found": True, "user": orjson.Fragment(data)}
+                        for i, data in enumerate(cached)
+                    ]
+                }
+            ),
+        ),
+        f"list_page_{page_size}": (
+            lambda: JSONResponse(
+                jsonable_encoder([UserSchema.model_validate(user) for user in users])
+            ),
+            lambda: ORJSONResponse(
+                [orjson.Fragment(serialize_user(user)) for user in users]
+            ),
+        ),
+    }
+
+
+def _cpu_per_call(render, iterations: int) -> float:
+    render()
+    start = time.process_time()
+    for _ in range(iterations):
+        render()
+    return (time.process_time() - start) / iterations
+
+
+def main():
+    """Run the benchmark, print and store the CPU time per request."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--output", help="JSON results file")
+    args = parser.parse_args()
+
+    report = {}
+    print(f"{'case':<16} {'default µs':>12} {'orjson µs':>12} {'saved':>8}")
+    for name, (default, fast) in _cases(args.page_size).items():
+        before = _cpu_per_call(default, args.iterations) * 1e6
+        after = _cpu_per_call(fast, args.iterations) * 1e6
+        report[name] = {"default_cpu_us": before, "orjson_cpu_us": after}
+        print(f"{name:<16} {before:>12.1f} {after:>12.1f} {1 - after / before:>8.0%}")
+    parameters = {key: value for key, value in vars(args).items() if key != "output"}
+    path = results.write("serialization", parameters, report, args.output)
+    print("Results written to", path)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ alembic upgrade head
 
 echo "Start app..."
 if [ "$ENVIRONMENT" = "production" ]; then
-  exec uvicorn iam.main:app --host 0.0.0.0 --port 8000
+  exec python -m iam.server
 else
   exec uvicorn iam.main:app --host 0.0.0.0 --port 8000 --reload
 fi
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""Authorization decision endpoints for the IAM system.
+
+This module answers whether a user may take an action on a resource, one
+check at a time or in batches. Decisions are made against the permission
+sets compiled into the role catalogue and the user cache, so a warm worker
+decides without touching the database.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from iam.core.config import settings
+from iam.db.session import get_read_session
+from iam.schemas.permission import AuthorizationBatch, AuthorizationCheck
+from iam.crud import permission as permission_crud
+
+router = APIRouter()
+
+
+@router.post("/")
+async def authorize(
+    check: AuthorizationCheck, db: AsyncSession = Depends(get_read_session)
+):
+    """Decide whether a user may take an action on a resource.
+
+    Unknown users are denied.
+
+    Args:
+        check (AuthorizationCheck): The user, action and resource
+        db (AsyncSession): The database session dependency, used on cache misses
+
+    Returns:
+        dict: ``{"allowed": bool}``
+    """
+    (allowed,) = await permission_crud.authorize(db, [check])
+    return ORJSONResponse({"allowed": allowed})
+
+
+@router.post("/batch")
+async def authorize_batch(
+    batch: AuthorizationBatch, db: AsyncSession = Depends(get_read_session)
+):
+    """Decide several authorization checks in one request.
+
+    Args:
+        batch (AuthorizationBatch): The checks to decide
+        db (AsyncSession): The database session dependency, used on cache misses
+
+    Returns:
+        dict: ``{"decisions": [bool, ...]}`` in the order of the checks
+
+    Raises:
+        HTTPException: If more than ``settings.AUTHORIZE_BATCH_MAX`` checks
+            are given (422)
+    """
+    if len(batch.checks) > settings.AUTHORIZE_BATCH_MAX:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {settings.AUTHORIZE_BATCH_MAX} checks per request",
+        )
+    decisions = await permission_crud.authorize(db, batch.checks)
+    return ORJSONResponse({"decisions": decisions})
@@ -2,16 +2,35 @@
 
 This module provides API endpoints for managing roles, including:
 - Creating new roles
-- Listing existing roles
+- Listing existing roles, paginated or streamed as NDJSON
+- Granting permissions to roles and listing them
+- Listing the users in a role and counting them
 
-The endpoints use FastAPI for routing and dependency injection.
+The endpoints use FastAPI for routing and dependency injection. Role listings
+and permissions are served from the in-memory role catalogue without touching
+the database. Member counts come from counters kept in Redis.
 """
 
-from fastapi import APIRouter, Depends, status
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from iam.db.session import get_session
+from iam.core.config import settings
+from iam.core.etag import ETAG_HEADER, etag_matches, not_modified
+from iam.core.pagination import (
+    NDJSON_MEDIA_TYPE,
+    NEXT_CURSOR_HEADER,
+    encode_cursor,
+    parse_cursor,
+    wants_ndjson,
+)
+from iam.db.session import get_read_session, get_session
+from iam.schemas.permission import Permission, PermissionBase, PermissionCreate
 from iam.schemas.role import Role, RoleCreate
+from iam.crud import permission as permission_crud
 from iam.crud import role as role_crud
+from iam.crud import user as user_crud
 
 router = APIRouter()
 
@@ -33,13 +52,185 @@ async def create_role(
 
 
 @router.get("/", response_model=list[Role], status_code=status.HTTP_200_OK)
-async def list_roles(db: AsyncSession = Depends(get_session)) -> list[Role]:
-    """Retrieve a list of all roles.
+async def list_roles(
+    request: Request,
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1, le=settings.PAGE_SIZE_MAX),
+) -> list[Role]:
+    """Retrieve a list of roles.
+
+    Without ``limit`` every role is returned. With ``limit`` the roles are
+    paginated by ID and the ``X-Next-Cursor`` response header carries the
+    cursor for the next page. Clients sending ``Accept: application/x-ndjson``
+    receive every role one per line instead. Roles come from the role
+    catalogue, whose full listings are serialized once per reload.
+
+    Responses carry an ETag derived from the catalogue version; a request
+    whose ``If-None-Match`` matches it gets ``304 Not Modified``.
+
+    Args:
+        request (Request): The incoming request.
+        cursor (str, optional): The cursor returned with the previous page.
+        limit (int, optional): The maximum number of roles to return.
+
+    Returns:
+        list[Role]: A list of Role objects.
+    """
+    snapshot = await role_crud.role_catalogue.get()
+    after_id = parse_cursor(cursor)
+    if wants_ndjson(request):
+        variant = "ndjson"
+    elif cursor is None and limit is None:
+        variant = "json"
+    else:
+        variant = f"page-{after_id}-{limit}"
+    etag = f'"{snapshot.tag}-{variant}"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    headers = {ETAG_HEADER: etag}
+    if variant == "ndjson":
+        return Response(snapshot.ndjson, media_type=NDJSON_MEDIA_TYPE, headers=headers)
+    if variant == "json":
+        return Response(snapshot.body, media_type="application/json", headers=headers)
+
+    roles = snapshot.page(after_id, limit)
+    if limit is not None and len(roles) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(roles[-1]["id"])
+    return ORJSONResponse(roles, headers=headers)
+
+
+@router.get("/member-counts")
+async def member_counts(db: AsyncSession = Depends(get_read_session)):
+    """Return the number of users in every role.
+
+    Args:
+        db (AsyncSession): The database session dependency, only used if the
+            counts must be rebuilt.
+
+    Returns:
+        dict: User counts keyed by role ID.
+    """
+    return ORJSONResponse(
+        {
+            str(role_id): count
+            for role_id, count in (await role_crud.get_member_counts(db)).items()
+        }
+    )
+
+
+@router.get("/{role_id}/users")
+async def list_role_members(
+    role_id: int,
+    cursor: str | None = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_read_session),
+):
+    """List the users in a role, page by page.
+
+    Users are ordered by ID, and the ``X-Next-Cursor`` response header
+    carries the cursor for the next page when the page is full.
+
+    Args:
+        role_id (int): The role whose members are listed.
+        cursor (str, optional): The cursor returned with the previous page.
+        limit (int, optional): The maximum number of users per page.
+        db (AsyncSession): The database session dependency.
+
+    Returns:
+        list[User]: A page of users.
+
+    Raises:
+        HTTPException: If the role does not exist (404).
+    """
+    if not await role_crud.role_catalogue.resolve({role_id}):
+        raise HTTPException(status_code=404, detail="Role not found")
+    users = await user_crud.list_role_members(db, role_id, parse_cursor(cursor), limit)
+    headers = {}
+    if len(users) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(users[-1].id)
+    return ORJSONResponse(
+        [orjson.Fragment(user_crud.serialize_user(user)) for user in users],
+        headers=headers,
+    )
+
+
+@router.get("/{role_id}/users/count")
+async def count_role_members(
+    role_id: int, db: AsyncSession = Depends(get_read_session)
+):
+    """Return the number of users in a role.
 
     Args:
+        role_id (int): The role whose members are counted.
+        db (AsyncSession): The database session dependency, only used if the
+            counts must be rebuilt.
+
+    Returns:
+        dict: The role ID and its user count.
+
+    Raises:
+        HTTPException: If the role does not exist (404).
+    """
+    if not await role_crud.role_catalogue.resolve({role_id}):
+        raise HTTPException(status_code=404, detail="Role not found")
+    counts = await role_crud.get_member_counts(db)
+    return ORJSONResponse({"role_id": role_id, "count": counts.get(role_id, 0)})
+
+
+@router.post(
+    "/{role_id}/permissions",
+    response_model=Permission,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_permission(
+    role_id: int, permission: PermissionCreate, db: AsyncSession = Depends(get_session)
+) -> Permission:
+    """Grant a permission to a role.
+
+    Every worker recompiles its permission sets within
+    ``settings.ROLE_CATALOGUE_CHECK_INTERVAL`` seconds.
+
+    Args:
+        role_id (int): The role to grant the permission to.
+        permission (PermissionCreate): The action and resource.
         db (AsyncSession): The database session dependency.
 
     Returns:
-        list[Role]: A list of Role objects containing all roles in the database.
+        Permission: The newly created permission.
+
+    Raises:
+        HTTPException: If the role does not exist (404) or already has the
+            permission (409).
+    """
+    if not await role_crud.role_catalogue.resolve({role_id}, db):
+        raise HTTPException(status_code=404, detail="Role not found")
+    try:
+        return await permission_crud.create_permission(db, role_id, permission)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Permission already granted")
+
+
+@router.get("/{role_id}/permissions", response_model=list[PermissionBase])
+async def list_permissions(role_id: int) -> list[PermissionBase]:
+    """List the permissions granted to a role.
+
+    Args:
+        role_id (int): The role whose permissions are listed.
+
+    Returns:
+        list[PermissionBase]: The actions and resources, sorted.
+
+    Raises:
+        HTTPException: If the role does not exist (404).
     """
-    return await role_crud.get_roles(db)
+    if not await role_crud.role_catalogue.resolve({role_id}):
+        raise HTTPException(status_code=404, detail="Role not found")
+    snapshot = await role_crud.role_catalogue.get()
+    return ORJSONResponse(
+        [
+            {"action": action, "resource": resource}
+            for action, resource in sorted(snapshot.permissions.get(role_id, ()))
+        ]
+    )
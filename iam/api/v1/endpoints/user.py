@@ -3,12 +3,43 @@
 This module provides FastAPI endpoints for user management operations including:
 - Creating new users
 - Retrieving user information
+- Updating users, including their role
+- Looking up many users in one request
+- Creating many users from a JSON array or NDJSON stream
+- Listing users, paginated or streamed as NDJSON
+
+Responses are rendered with orjson and returned directly, so FastAPI neither
+re-validates them against ``response_model`` nor runs ``jsonable_encoder``.
+Cached users are embedded in the response as the bytes read from Redis.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from collections import Counter
+from typing import AsyncIterator
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from iam.db.session import get_session
-from iam.schemas.user import User, UserCreate
+from sqlalchemy.orm import sessionmaker
+from iam.core.config import settings
+from iam.core.etag import ETAG_HEADER, etag_matches, not_modified
+from iam.core.pagination import (
+    NDJSON_MEDIA_TYPE,
+    NEXT_CURSOR_HEADER,
+    encode_cursor,
+    parse_cursor,
+    wants_ndjson,
+)
+from iam.db.session import (
+    get_read_session,
+    get_session,
+    read_sessionmaker,
+    send_session_cookies,
+)
+from iam.schemas.user import User, UserCreate, UserLookup, UserUpdate
+from iam.crud import role as role_crud
 from iam.crud import user as user_crud
 
 router = APIRouter()
@@ -23,29 +54,277 @@ async def create_user(user: UserCreate, db: AsyncSession = Depends(get_session))
         db (AsyncSession): The database session dependency
 
     Returns:
-        User: The created user object
+        ORJSONResponse: The created user
+
+    Raises:
+        HTTPException: If the role does not exist (422)
+    """
+    if not await role_crud.role_catalogue.resolve({user.role_id}, db):
+        raise HTTPException(status_code=422, detail="Unknown role_id")
+    db_user = await user_crud.create_user(db, user)
+    return send_session_cookies(
+        db,
+        ORJSONResponse(
+            orjson.Fragment(user_crud.serialize_user(db_user)),
+            status_code=status.HTTP_201_CREATED,
+        ),
+    )
+
+
+@router.post("/bulk")
+async def create_users_bulk(request: Request, db: AsyncSession = Depends(get_session)):
+    """Create many users in one request.
+
+    The body is either a JSON array of users or, with an
+    ``application/x-ndjson`` content type, one user per line; NDJSON bodies
+    are processed as they stream in. Users are inserted in chunks of
+    ``settings.USER_BULK_CHUNK_SIZE`` and each item is reported on its own,
+    so conflicts and invalid items don't abort the batch.
+
+    Args:
+        request (Request): The incoming request carrying the users
+        db (AsyncSession): The database session dependency
+
+    Returns:
+        ORJSONResponse: Per-status counts and one result per item, in input
+            order
+
+    Raises:
+        HTTPException: If a JSON body is not an array (422)
+    """
+    results = []
+    chunk: list[tuple[int, UserCreate]] = []
+
+    async def flush():
+        created = await user_crud.create_users(db, [user for _, user in chunk])
+        results.extend(
+            {"index": index, **result} for (index, _), result in zip(chunk, created)
+        )
+        chunk.clear()
+
+    async for index, item in _bulk_items(request):
+        try:
+            chunk.append((index, UserCreate.model_validate(item)))
+        except ValidationError as exc:
+            detail = exc.errors(include_url=False, include_context=False)
+            results.append({"index": index, "status": "invalid", "detail": detail})
+            continue
+        if len(chunk) >= settings.USER_BULK_CHUNK_SIZE:
+            await flush()
+    if chunk:
+        await flush()
+
+    results.sort(key=lambda result: result["index"])
+    return send_session_cookies(
+        db,
+        ORJSONResponse(
+            {
+                "summary": dict(Counter(result["status"] for result in results)),
+                "results": results,
+            }
+        ),
+    )
+
+
+async def _bulk_items(request: Request) -> AsyncIterator[tuple[int, object]]:
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith(("application/x-ndjson", "application/ndjson")):
+        index = 0
+        buffer = b""
+        async for data in request.stream():
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield index, _parse_line(line)
+                    index += 1
+        if buffer.strip():
+            yield index, _parse_line(buffer)
+        return
+
+    try:
+        items = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=422, detail="Body is not valid JSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=422, detail="Body must be a JSON array")
+    for index, item in enumerate(items):
+        yield index, item
+
+
+def _parse_line(line: bytes) -> object:
+    try:
+        return orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return line.decode(errors="replace")
+
+
+@router.get("/")
+async def list_users(
+    request: Request,
+    ids: list[str] | None = Query(None),
+    cursor: str | None = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_read_session),
+):
+    """List users, or retrieve several users by ID in one request.
+
+    With ``ids`` the given users are looked up; IDs may be comma-separated
+    (``?ids=1,2,3``), repeated (``?ids=1&ids=2``) or both. Otherwise users
+    are listed in pages of ``limit`` ordered by ID, with the cursor for the
+    next page in the ``X-Next-Cursor`` response header. Clients sending
+    ``Accept: application/x-ndjson`` receive every user streamed one per line
+    instead.
+
+    Args:
+        request (Request): The incoming request
+        ids (list[str], optional): The user IDs to retrieve
+        cursor (str, optional): The cursor returned with the previous page
+        limit (int, optional): The maximum number of users per page
+        db (AsyncSession): The database session dependency
+
+    Returns:
+        Response: The lookup results in request order, a page of users, or
+            the stream of every user
+
+    Raises:
+        HTTPException: If an ID is not an integer or too many IDs are given (422)
+    """
+    if ids is not None:
+        try:
+            user_ids = [int(part) for value in ids for part in value.split(",") if part]
+        except ValueError:
+            raise HTTPException(status_code=422, detail="ids must be integers")
+        return await _lookup(db, user_ids)
+
+    if wants_ndjson(request):
+        factory, _ = read_sessionmaker(request)
+        return StreamingResponse(_stream_users(factory), media_type=NDJSON_MEDIA_TYPE)
+
+    users = await user_crud.list_users(db, parse_cursor(cursor), limit)
+    headers = {}
+    if len(users) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(users[-1].id)
+    return ORJSONResponse(
+        [orjson.Fragment(user_crud.serialize_user(user)) for user in users],
+        headers=headers,
+    )
+
+
+async def _stream_users(factory: sessionmaker):
+    # The request's session is closed before the body is streamed, so the
+    # stream owns its own session for as long as it runs.
+    async with factory() as session:
+        async for user in user_crud.stream_users(session, settings.STREAM_BATCH_SIZE):
+            yield user_crud.serialize_user(user) + b"\n"
+
+
+@router.post("/lookup")
+async def lookup_users_by_body(
+    lookup: UserLookup, db: AsyncSession = Depends(get_read_session)
+):
+    """Retrieve several users by ID, with the IDs given in the request body.
+
+    Args:
+        lookup (UserLookup): The user IDs to retrieve
+        db (AsyncSession): The database session dependency
+
+    Returns:
+        ORJSONResponse: The lookup results in request order
 
     Raises:
-        HTTPException: If user creation fails
+        HTTPException: If too many IDs are given (422)
     """
-    return await user_crud.create_user(db, user)
+    return await _lookup(db, lookup.ids)
+
+
+async def _lookup(db: AsyncSession, user_ids: list[int]) -> ORJSONResponse:
+    if not user_ids:
+        raise HTTPException(status_code=422, detail="At least one id is required")
+    if len(user_ids) > settings.USER_LOOKUP_MAX_IDS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {settings.USER_LOOKUP_MAX_IDS} ids per request",
+        )
+    users = await user_crud.get_users_json(db, user_ids)
+    return ORJSONResponse(
+        {
+            "users": [
+                {
+                    "id": user_id,
+                    "found": data is not None,
+                    "user": None if data is None else orjson.Fragment(data),
+                }
+                for user_id, data in zip(user_ids, users)
+            ]
+        }
+    )
 
 
 @router.get("/{user_id}")
-async def get_user(user_id: int, db: AsyncSession = Depends(get_session)):
+async def get_user(
+    user_id: int, request: Request, db: AsyncSession = Depends(get_read_session)
+):
     """Retrieve a user by their ID.
 
+    The response carries an ETag built from the user's row version. When the
+    request's ``If-None-Match`` matches it, ``304 Not Modified`` is returned
+    from the cached entry, without loading the row or rendering a body.
+
     Args:
         user_id (int): The unique identifier of the user to retrieve
+        request (Request): The incoming request, checked for ``If-None-Match``
         db (AsyncSession): The database session dependency
 
     Returns:
-        dict: A dictionary containing the user information
+        Response: The user, or ``304 Not Modified`` when the ETag matches
 
     Raises:
         HTTPException: If the user is not found (404)
     """
-    user = await user_crud.get_user(db, user_id)
-    if not user:
+    data = await user_crud.get_user_json(db, user_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    etag = user_crud.user_etag(user_id, data)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return ORJSONResponse({"user": orjson.Fragment(data)}, headers={ETAG_HEADER: etag})
+
+
+@router.patch("/{user_id}", response_model=User)
+async def update_user(
+    user_id: int, changes: UserUpdate, db: AsyncSession = Depends(get_session)
+):
+    """Update a user's username, email or role.
+
+    Args:
+        user_id (int): The unique identifier of the user to update
+        changes (UserUpdate): The fields to change
+        db (AsyncSession): The database session dependency
+
+    Returns:
+        ORJSONResponse: The updated user, with its ETag
+
+    Raises:
+        HTTPException: If the user is not found (404), the role does not
+            exist (422) or the username or email is taken (409)
+    """
+    if changes.role_id is not None and not await role_crud.role_catalogue.resolve(
+        {changes.role_id}, db
+    ):
+        raise HTTPException(status_code=422, detail="Unknown role_id")
+    try:
+        db_user = await user_crud.update_user(db, user_id, changes)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Username or email already taken")
+    if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return {"user": user}
+    data = user_crud.serialize_user(db_user)
+    return send_session_cookies(
+        db,
+        ORJSONResponse(
+            orjson.Fragment(data),
+            headers={ETAG_HEADER: user_crud.user_etag(db_user.id, data)},
+        ),
+    )
@@ -0,0 +1,418 @@
+"""Command line interface for bulk transfers of users and roles.
+
+Installed as the ``iam`` command, or run as ``python -m iam.cli``::
+
+    iam export users -o users.ndjson.gz
+    iam export roles --format csv -o roles.csv
+    iam import roles roles.csv
+    iam import users users.ndjson.gz
+
+Exports stream rows from a server-side cursor straight to the output, as
+NDJSON or CSV, so memory use stays constant whatever the table size. Files
+whose name ends in ``.gz`` are gzip-compressed, and so is the output with
+``--gzip``. The format follows the file extension unless ``--format`` is
+given.
+
+Imports read the file in batches of ``--batch-size`` rows and insert each
+batch in its own transaction (see :mod:`iam.crud.transfer`), skipping rows
+that already exist or fail validation. Users reference their role by name,
+so files exported from another deployment import as is; the role names of
+each batch are resolved with one query. Once a batch is committed its users
+are cached with one pipeline per Redis shard, added to the role member counts
+and announced to the existence filters. Importing roles bumps the role
+catalogue version. No lifecycle events are published for imported rows.
+
+Progress and the final throughput, in rows per second, are reported on
+standard error.
+"""
+
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import sys
+import time
+from typing import Any, BinaryIO, Iterator
+
+import orjson
+from pydantic import ValidationError
+from iam.core.cache import close_redis
+from iam.core.config import settings
+from iam.crud import transfer
+from iam.crud import user as user_crud
+from iam.crud.role import role_catalogue
+from iam.db.session import async_session, dispose_engines, init_engines
+from iam.schemas.user import UserCreate
+
+FIELDS = {
+    "users": ("id", "username", "email", "role_id", "role"),
+    "roles": ("id", "name"),
+}
+FORMATS = ("ndjson", "csv")
+
+
+class Throughput:
+    """Count processed rows and report the rate on a stream.
+
+    A progress line is written at most every ``interval`` seconds, and a
+    summary by :meth:`finish`.
+    """
+
+    def __init__(self, label: str, stream=None, interval: float = 5.0):
+        self.label = label
+        self.stream = sys.stderr if stream is None else stream
+        self.interval = interval
+        self.rows = 0
+        self.counts: dict[str, int] = {}
+        self.started_at = self._reported_at = time.perf_counter()
+
+    def add(self, rows: int = 0, **counts: int):
+        """Count rows and outcomes, reporting progress when it is due.
+
+        Args:
+            rows (int, optional): Rows read or written. Defaults to 0.
+            **counts (int): Rows per outcome, such as ``imported=10``
+        """
+        self.rows += rows
+        for name, count in counts.items():
+            self.counts[name] = self.counts.get(name, 0) + count
+        now = time.perf_counter()
+        if now - self._reported_at >= self.interval:
+            self._reported_at = now
+            self._report(now)
+
+    def finish(self) -> float:
+        """Report the totals.
+
+        Returns:
+            float: The rows per second over the whole run
+        """
+        return self._report(time.perf_counter())
+
+    def _report(self, now: float) -> float:
+        elapsed = max(now - self.started_at, 1e-9)
+        rate = self.rows / elapsed
+        details = "".join(f", {count} {name}" for name, count in self.counts.items())
+        print(
+            f"{self.label}: {self.rows} rows in {elapsed:.1f}s "
+            f"({rate:,.0f} rows/s){details}",
+            file=self.stream,
+        )
+        return rate
+
+
+def detect_format(path: str, requested: str | None) -> str:
+    """Pick the file format from ``--format`` or the file name.
+
+    Args:
+        path (str): The file path, or ``-`` for standard input or output
+        requested (str | None): The format given on the command line
+
+    Returns:
+        str: ``ndjson`` or ``csv``
+    """
+    if requested:
+        return requested
+    name = path.removesuffix(".gz")
+    return "csv" if name.endswith(".csv") else "ndjson"
+
+
+def open_output(path: str, compress: bool) -> BinaryIO:
+    """Open the export destination for writing bytes.
+
+    Args:
+        path (str): The file path, or ``-`` for standard output
+        compress (bool): Gzip the output; implied by a ``.gz`` file name
+
+    Returns:
+        BinaryIO: The stream to write to; the caller closes it
+    """
+    compress = compress or path.endswith(".gz")
+    if path == "-":
+        raw = sys.stdout.buffer
+        return gzip.GzipFile(fileobj=raw, mode="wb") if compress else raw
+    return gzip.open(path, "wb") if compress else open(path, "wb")
+
+
+def open_input(path: str) -> BinaryIO:
+    """Open an import file for reading bytes, decompressing gzip files.
+
+    Gzip input is recognized by its magic number, whatever the file name.
+
+    Args:
+        path (str): The file path, or ``-`` for standard input
+
+    Returns:
+        BinaryIO: The stream to read from; the caller closes it
+    """
+    raw = sys.stdin.buffer if path == "-" else open(path, "rb")
+    buffered = io.BufferedReader(raw) if not hasattr(raw, "peek") else raw
+    if buffered.peek(2)[:2] == b"\x1f\x8b":
+        return gzip.GzipFile(fileobj=buffered, mode="rb")
+    return buffered
+
+
+def read_records(stream: BinaryIO, file_format: str) -> Iterator[dict[str, Any]]:
+    """Parse records one at a time from an NDJSON or CSV stream.
+
+    Args:
+        stream (BinaryIO): The input
+        file_format (str): ``ndjson`` or ``csv``
+
+    Yields:
+        dict[str, Any]: Each record; CSV values are strings
+    """
+    if file_format == "csv":
+        yield from csv.DictReader(
+            io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        )
+        return
+    for line in stream:
+        if line.strip():
+            yield orjson.loads(line)
+
+
+async def export_table(
+    table: str,
+    output: BinaryIO,
+    file_format: str,
+    batch_size: int = settings.STREAM_BATCH_SIZE,
+    throughput: Throughput | None = None,
+) -> int:
+    """Stream every row of a table to an NDJSON or CSV output.
+
+    Args:
+        table (str): ``users`` or ``roles``
+        output (BinaryIO): The destination
+        file_format (str): ``ndjson`` or ``csv``
+        batch_size (int, optional): Rows fetched per round-trip. Defaults to
+            ``settings.STREAM_BATCH_SIZE``.
+        throughput (Throughput, optional): Counter to report progress to.
+            Defaults to None.
+
+    Returns:
+        int: The number of rows written
+    """
+    fields = FIELDS[table]
+    stream_rows = (
+        transfer.stream_user_rows if table == "users" else transfer.stream_role_rows
+    )
+    text = writer = None
+    if file_format == "csv":
+        text = io.TextIOWrapper(output, encoding="utf-8", newline="")
+        writer = csv.writer(text)
+        writer.writerow(fields)
+
+    written = 0
+    async with async_session() as session:
+        async for row in stream_rows(session, batch_size):
+            if writer is not None:
+                writer.writerow(row)
+            else:
+                output.write(orjson.dumps(dict(zip(fields, row))) + b"\n")
+            written += 1
+            if throughput is not None and written % batch_size == 0:
+                throughput.add(batch_size)
+    if text is not None:
+        # Flush the text layer without closing the caller's stream.
+        text.detach()
+    if throughput is not None:
+        throughput.add(written % batch_size)
+    return written
+
+
+async def import_file(
+    table: str,
+    records: Iterator[dict[str, Any]],
+    batch_size: int = settings.IMPORT_BATCH_SIZE,
+    rebuild_cache: bool = True,
+    throughput: Throughput | None = None,
+) -> dict[str, int]:
+    """Insert records in batches, one transaction per batch.
+
+    Args:
+        table (str): ``users`` or ``roles``
+        records (Iterator[dict[str, Any]]): The parsed records
+        batch_size (int, optional): Records per transaction. Defaults to
+            ``settings.IMPORT_BATCH_SIZE``.
+        rebuild_cache (bool, optional): Cache the imported users after each
+            batch; their member counts and existence filters are updated
+            either way. Defaults to True.
+        throughput (Throughput, optional): Counter to report progress to.
+            Defaults to None.
+
+    Returns:
+        dict[str, int]: The number of records ``imported``, ``skipped``
+            because they already exist, and ``invalid`` or referencing a role
+            that doesn't exist
+    """
+    import_batch = _import_users if table == "users" else _import_roles
+    totals = {"imported": 0, "skipped": 0, "invalid": 0}
+    batch: list[dict[str, Any]] = []
+
+    async def flush():
+        counts = await import_batch(batch, rebuild_cache)
+        for name, count in counts.items():
+            totals[name] += count
+        if throughput is not None:
+            throughput.add(len(batch), **counts)
+        batch.clear()
+
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+    if table == "roles" and totals["imported"]:
+        await role_catalogue.invalidate()
+    return totals
+
+
+async def _import_users(records: list[dict[str, Any]], rebuild_cache: bool) -> dict:
+    users = []
+    for record in records:
+        role = record.get("role")
+        try:
+            # Records naming their role are validated once the name is resolved.
+            user = UserCreate.model_validate(
+                {
+                    "username": record.get("username"),
+                    "email": record.get("email"),
+                    "role_id": 0 if role else record.get("role_id"),
+                }
+            )
+        except ValidationError:
+            continue
+        users.append((user, role))
+
+    async with async_session() as session:
+        role_ids = await transfer.resolve_role_names(
+            session, {role for _, role in users if role}
+        )
+        role_names = {role_id: name for name, role_id in role_ids.items()}
+        role_names.update(
+            await transfer.resolve_role_ids(
+                session, {user.role_id for user, role in users if not role}
+            )
+        )
+        rows = []
+        for user, role in users:
+            role_id = role_ids.get(role) if role else user.role_id
+            if role_id in role_names:
+                rows.append((user.username, user.email, role_id))
+        inserted = await transfer.insert_users(session, rows)
+        await session.commit()
+
+    await user_crud.cache_created_users(
+        [tuple(row) for row in inserted], role_names, cache=rebuild_cache
+    )
+    return {
+        "imported": len(inserted),
+        "skipped": len(rows) - len(inserted),
+        "invalid": len(records) - len(rows),
+    }
+
+
+async def _import_roles(records: list[dict[str, Any]], rebuild_cache: bool) -> dict:
+    rows = [(record["name"],) for record in records if record.get("name")]
+    async with async_session() as session:
+        inserted = await transfer.insert_roles(session, rows)
+        await session.commit()
+    return {
+        "imported": len(inserted),
+        "skipped": len(rows) - len(inserted),
+        "invalid": len(records) - len(rows),
+    }
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Run a parsed command.
+
+    Args:
+        args (argparse.Namespace): The parsed command line
+
+    Returns:
+        int: The process exit status
+    """
+    init_engines()
+    try:
+        if args.command == "export":
+            throughput = Throughput(f"export {args.table}")
+            output = open_output(args.output, args.gzip)
+            try:
+                await export_table(
+                    args.table,
+                    output,
+                    detect_format(args.output, args.format),
+                    args.batch_size or settings.STREAM_BATCH_SIZE,
+                    throughput,
+                )
+            finally:
+                if output is not sys.stdout.buffer:
+                    output.close()
+                else:
+                    output.flush()
+        else:
+            throughput = Throughput(f"import {args.table}")
+            with open_input(args.input) as stream:
+                await import_file(
+                    args.table,
+                    read_records(stream, detect_format(args.input, args.format)),
+                    args.batch_size or settings.IMPORT_BATCH_SIZE,
+                    rebuild_cache=not args.no_cache,
+                    throughput=throughput,
+                )
+        throughput.finish()
+    finally:
+        await close_redis()
+        await dispose_engines()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser.
+
+    Returns:
+        argparse.ArgumentParser: The parser for the ``iam`` command
+    """
+    parser = argparse.ArgumentParser(
+        prog="iam", description="Bulk export and import of users and roles."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Stream a table to a file")
+    export.add_argument("table", choices=FIELDS)
+    export.add_argument("-o", "--output", default="-", help="File, or - for stdout")
+    export.add_argument("--format", choices=FORMATS)
+    export.add_argument("--gzip", action="store_true", help="Gzip the output")
+    export.add_argument("--batch-size", type=int, help="Rows fetched per round-trip")
+
+    load = commands.add_parser("import", help="Load a file into a table")
+    load.add_argument("table", choices=FIELDS)
+    load.add_argument("input", help="File, or - for stdin; gzip is detected")
+    load.add_argument("--format", choices=FORMATS)
+    load.add_argument("--batch-size", type=int, help="Rows per transaction")
+    load.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't cache imported users; they are cached on first read",
+    )
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Entry point of the ``iam`` command.
+
+    Args:
+        argv (list[str], optional): The arguments. Defaults to ``sys.argv``.
+
+    Returns:
+        int: The process exit status
+    """
+    return asyncio.run(run(build_parser().parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""Compact sets of non-negative integer IDs.
+
+Database IDs are allocated densely from a sequence, so a plain bitmap holds
+them exactly in one bit per ID up to the largest one: ten million users fit
+in 1.25 MB. Membership is a single index and shift, with no hashing and no
+false positives.
+"""
+
+
+class IdBitmap:
+    """Growable bitmap of non-negative integer IDs."""
+
+    __slots__ = ("_bits", "_count", "max_id")
+
+    def __init__(self, ids=()):
+        self._bits = bytearray()
+        self._count = 0
+        self.max_id = -1
+        for id_ in ids:
+            self.add(id_)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, id_: int) -> bool:
+        index = id_ >> 3
+        return (
+            0 <= id_
+            and index < len(self._bits)
+            and bool(self._bits[index] >> (id_ & 7) & 1)
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the bitmap in bytes."""
+        return len(self._bits)
+
+    def add(self, id_: int):
+        """Add an ID, growing the bitmap if needed.
+
+        Args:
+            id_ (int): The ID, which must not be negative
+
+        Raises:
+            ValueError: If the ID is negative
+        """
+        if id_ < 0:
+            raise ValueError(f"Negative ID {id_}")
+        index = id_ >> 3
+        if index >= len(self._bits):
+            # Grow geometrically so IDs added in increasing order stay cheap.
+            self._bits.extend(
+                bytes(max(index + 1, 2 * len(self._bits)) - len(self._bits))
+            )
+        mask = 1 << (id_ & 7)
+        if not self._bits[index] & mask:
+            self._bits[index] |= mask
+            self._count += 1
+            self.max_id = max(self.max_id, id_)
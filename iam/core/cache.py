@@ -2,32 +2,1126 @@
 
 This module provides a simple interface for interacting with Redis cache,
 including functions to get and set values with optional TTL (Time To Live).
+
+When ``settings.CACHE_L1_ENABLED`` is set, each worker also keeps a small
+in-process cache (L1) in front of Redis (L2). Writes and deletes publish the
+affected key on a Redis pub/sub channel so every other worker evicts its L1
+copy; a short L1 TTL bounds staleness if an invalidation is ever missed.
+
+:func:`get_or_load` adds read-through loading on top: concurrent misses for a
+key are coalesced per worker, an optional Redis lease lets a single worker
+across the fleet refill it, and an optional stale-while-revalidate window
+serves a just-expired value while it is refreshed in the background. When
+the loader finds nothing, :data:`NEGATIVE_VALUE` is cached for
+``settings.CACHE_NEGATIVE_TTL`` seconds, so repeated lookups of a missing key
+don't reach the loader either.
+
+Keys can be spread over several Redis deployments (shards). With
+``settings.REDIS_SHARD_URLS`` each key is placed on one of the listed servers
+by consistent hashing; with ``settings.REDIS_CLUSTER`` the ``REDIS_URL`` is a
+Redis Cluster endpoint and the cluster client routes keys itself. Multi-key
+operations are grouped per shard and sent as one pipeline per shard,
+concurrently. L1 invalidations are published on the shard holding the key,
+in the same pipeline as the write, and every worker subscribes on each
+shard.
+
+Redis calls made to serve reads and fill the cache go through the circuit
+breaker of their shard (``redis`` with a single shard, ``redis:<shard>``
+otherwise): when a shard fails or is slow its keys behave as misses and
+requests fall through to the database instead of failing, while keys on the
+other shards are still served.
 """
 
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+from urllib.parse import urlsplit
+
 import redis.asyncio as redis
+from prometheus_client import Counter, Gauge, Histogram
+from redis.asyncio.cluster import RedisCluster
+from redis.exceptions import NoScriptError, RedisError
 from iam.core.config import settings
+from iam.core.resilience import CircuitBreaker, get_breaker
+from iam.core.sharding import HashRing
+from iam.core.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+INSTANCE_ID = uuid.uuid4().hex
+
+_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 1)
+
+CACHE_REQUESTS = Counter(
+    "cache_tier_requests_total",
+    "Cache lookups by tier, result and key prefix",
+    ["tier", "result", "prefix"],
+)
+CACHE_REDIS_DURATION = Histogram(
+    "cache_redis_duration_seconds",
+    "Redis round-trip time by key prefix",
+    ["prefix"],
+    buckets=_LATENCY_BUCKETS,
+)
+CACHE_SHARD_DURATION = Histogram(
+    "cache_shard_duration_seconds",
+    "Redis round-trip time by shard",
+    ["shard"],
+    buckets=_LATENCY_BUCKETS,
+)
+CACHE_SHARD_KEYS = Counter(
+    "cache_shard_keys_total", "Keys routed to each Redis shard", ["shard"]
+)
+CACHE_L1_EVICTIONS = Counter(
+    "cache_l1_evictions_total", "Entries removed from the L1 cache", ["reason"]
+)
+CACHE_LOADS = Counter(
+    "cache_loads_total", "Read-through loads after a cache miss", ["mode"]
+)
+CACHE_L1_ENTRIES = Gauge(
+    "cache_l1_entries", "Entries held in the L1 cache", multiprocess_mode="livesum"
+)
+CACHE_L1_BYTES = Gauge(
+    "cache_l1_bytes",
+    "Approximate bytes held in the L1 cache",
+    multiprocess_mode="livesum",
+)
+
+
+class LocalCache:
+    """Bounded in-process LRU cache with per-entry TTL.
+
+    The cache is bounded both by the number of entries and by the approximate
+    size of keys and values in bytes; the least recently used entries are
+    evicted first when either bound is exceeded.
+
+    With ``report`` set, every change updates the ``cache_l1_entries`` and
+    ``cache_l1_bytes`` gauges. They are set directly rather than read through
+    a callback, because Prometheus multiprocess mode only exports values
+    written to its files.
+    """
+
+    def __init__(
+        self, max_entries: int, max_bytes: int, ttl: float, report: bool = False
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.report = report
+        self._entries: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate size of the cached keys and values in bytes."""
+        return self._bytes
+
+    def get(self, key: str) -> bytes | None:
+        """Return a live entry and mark it as recently used.
+
+        Args:
+            key (str): The key to look up
+
+        Returns:
+            bytes | None: The cached value, or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(key, "expired")
+            self._report()
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: bytes, ttl: float | None = None):
+        """Store a value, evicting least recently used entries if needed.
+
+        Args:
+            key (str): The key to store the value under
+            value (bytes): The value to store
+            ttl (float, optional): Time to live in seconds, capped at the
+                cache-wide TTL. Defaults to the cache-wide TTL.
+        """
+        size = len(key) + len(value)
+        if key in self._entries:
+            self._remove(key, None)
+        if size > self.max_bytes:
+            CACHE_L1_EVICTIONS.labels("oversize").inc()
+            self._report()
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)), "lru")
+        self._report()
+
+    def delete(self, key: str, reason: str = "invalidated"):
+        """Remove a key if present.
+
+        Args:
+            key (str): The key to remove
+            reason (str, optional): Eviction reason recorded in metrics.
+                Defaults to "invalidated".
+        """
+        if key in self._entries:
+            self._remove(key, reason)
+            self._report()
+
+    def delete_where(
+        self, predicate: Callable[[str], bool], reason: str = "invalidated"
+    ):
+        """Remove every key matching a predicate.
+
+        Args:
+            predicate (Callable[[str], bool]): Returns True for keys to remove
+            reason (str, optional): Eviction reason recorded in metrics.
+                Defaults to "invalidated".
+        """
+        for key in [key for key in self._entries if predicate(key)]:
+            self._remove(key, reason)
+        self._report()
+
+    def clear(self):
+        """Remove every entry."""
+        self._entries.clear()
+        self._bytes = 0
+        self._report()
+
+    def _report(self):
+        if self.report:
+            CACHE_L1_ENTRIES.set(len(self._entries))
+            CACHE_L1_BYTES.set(self._bytes)
+
+    def _remove(self, key: str, reason: str | None):
+        value, _ = self._entries.pop(key)
+        self._bytes -= len(key) + len(value)
+        if reason is not None:
+            CACHE_L1_EVICTIONS.labels(reason).inc()
+
+
+local_cache = (
+    LocalCache(
+        settings.CACHE_L1_MAX_ENTRIES,
+        settings.CACHE_L1_MAX_BYTES,
+        settings.CACHE_L1_TTL,
+        report=True,
+    )
+    if settings.CACHE_L1_ENABLED
+    else None
+)
+
+_UNAVAILABLE = object()
+
+# Cached in place of a value that doesn't exist. Real values are never empty,
+# since they are JSON documents.
+NEGATIVE_VALUE = b""
+
+
+@dataclass(eq=False)
+class Shard:
+    """A Redis deployment holding part of the keys.
+
+    Attributes:
+        name (str): Identifies the shard in metrics and on the hash ring
+        client (redis.Redis | RedisCluster): Client for the shard's keys
+        pubsub_client (redis.Redis): Client for pub/sub on the shard; the
+            same as ``client`` except for a cluster, whose client has no
+            pub/sub support
+        breaker (CircuitBreaker): Breaker guarding calls to the shard
+    """
+
+    name: str
+    client: redis.Redis | RedisCluster
+    pubsub_client: redis.Redis
+    breaker: CircuitBreaker
+    keys_routed: Any = field(init=False, repr=False)
+    duration: Any = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.keys_routed = CACHE_SHARD_KEYS.labels(self.name)
+        self.duration = CACHE_SHARD_DURATION.labels(self.name)
+
+    @property
+    def cluster(self) -> bool:
+        """Whether the shard is a Redis Cluster."""
+        return isinstance(self.client, RedisCluster)
+
+
+def _client_options() -> dict:
+    return {
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_CONNECT_TIMEOUT,
+    }
+
+
+def _shard_name(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.hostname}:{parts.port or 6379}{parts.path.rstrip('/')}"
+
+
+def _connect(clients: list | None = None) -> list[Shard]:
+    if clients is not None:
+        names = [f"shard{index}" for index in range(len(clients))]
+        pairs = list(zip(names, clients))
+    elif settings.REDIS_CLUSTER:
+        client = RedisCluster.from_url(settings.REDIS_URL, **_client_options())
+        pubsub_client = redis.from_url(settings.REDIS_URL, **_client_options())
+        return [Shard("cluster", client, pubsub_client, get_breaker("redis"))]
+    else:
+        urls = settings.REDIS_SHARD_URLS or [settings.REDIS_URL]
+        pairs = [
+            (_shard_name(url), redis.from_url(url, **_client_options())) for url in urls
+        ]
+    if len(pairs) == 1:
+        name, client = pairs[0]
+        return [Shard(name, client, client, get_breaker("redis"))]
+    return [
+        Shard(name, client, client, get_breaker(f"redis:{name}"))
+        for name, client in pairs
+    ]
+
+
+def _use(new_shards: list[Shard]):
+    global shards, redis_client, _ring
+    shards = new_shards
+    redis_client = shards[0].client
+    _ring = HashRing(
+        shards, [shard.name for shard in shards], settings.REDIS_SHARD_VNODES
+    )
+
+
+# No connection is opened until the first command; servers replace these
+# clients with ones owned by the worker process in :func:`open_redis`.
+# ``redis_client`` is the first shard's client.
+shards: list[Shard]
+redis_client: redis.Redis | RedisCluster
+_ring: HashRing[Shard]
+_use(_connect())
+
+
+def open_redis(clients: list | None = None):
+    """Give the current process its own Redis clients.
+
+    Args:
+        clients (list, optional): Clients to use as the shards instead of
+            connecting to the configured servers, for tests and benchmarks.
+            Defaults to None.
+    """
+    _use(_connect(clients))
+
+
+async def ping_redis() -> bool:
+    """Open a connection to every shard ahead of the first request.
+
+    Returns:
+        bool: True if every shard answered
+    """
+    answers = await asyncio.gather(
+        *(
+            call_redis("ping", lambda client: client.ping(), default=False, shard=shard)
+            for shard in shards
+        )
+    )
+    return all(answers)
 
-redis_client = redis.from_url(settings.REDIS_URL)
+
+async def close_redis():
+    """Close the current process's Redis connections."""
+    for shard in shards:
+        await shard.client.aclose()
+        if shard.pubsub_client is not shard.client:
+            await shard.pubsub_client.aclose()
+
+
+def key_prefix(key: str) -> str:
+    """Return the part of a key before its first colon, used as metric label.
+
+    Args:
+        key (str): A cache key such as ``user:v1:42``
+
+    Returns:
+        str: The prefix, such as ``user``
+    """
+    return key.split(":", 1)[0]
+
+
+def shard_for(key: str) -> Shard:
+    """Return the shard holding a key, counting the key in its metrics.
+
+    Args:
+        key (str): The key
+
+    Returns:
+        Shard: The shard the key is hashed to
+    """
+    shard = _ring.node_for(key)
+    shard.keys_routed.inc()
+    return shard
+
+
+def group_by_shard(keys: list[str]) -> dict[Shard, list[int]]:
+    """Group keys by the shard holding them.
+
+    Args:
+        keys (list[str]): The keys
+
+    Returns:
+        dict[Shard, list[int]]: The positions in ``keys`` of each shard's keys
+    """
+    groups = defaultdict(list)
+    for index, key in enumerate(keys):
+        groups[shard_for(key)].append(index)
+    return groups
+
+
+async def call_redis(
+    prefix: str,
+    operation: Callable[[redis.Redis | RedisCluster], Awaitable[Any]],
+    default: Any = None,
+    shard: Shard | None = None,
+):
+    """Run a Redis operation behind its shard's circuit breaker.
+
+    Args:
+        prefix (str): The key prefix the operation works on, for metrics
+        operation (Callable[[redis.Redis | RedisCluster], Awaitable[Any]]):
+            Coroutine function issuing the Redis command or pipeline with the
+            client it is given
+        default (Any, optional): Returned when the shard is unavailable.
+            Defaults to None.
+        shard (Shard, optional): The shard to call. Defaults to the first
+            shard.
+
+    Returns:
+        Any: The operation's result, or ``default`` if the breaker is open or
+            the operation failed
+    """
+    shard = shards[0] if shard is None else shard
+    breaker = shard.breaker
+    if not breaker.allow():
+        CACHE_REQUESTS.labels("l2", "unavailable", prefix).inc()
+        return default
+    start = time.perf_counter()
+    try:
+        result = await operation(shard.client)
+    except asyncio.CancelledError:
+        breaker.abandon()
+        raise
+    except (RedisError, OSError):
+        breaker.record_failure()
+        CACHE_REQUESTS.labels("l2", "error", prefix).inc()
+        logger.warning("Redis call to %s failed", shard.name, exc_info=True)
+        return default
+    finally:
+        elapsed = time.perf_counter() - start
+        CACHE_REDIS_DURATION.labels(prefix).observe(elapsed)
+        shard.duration.observe(elapsed)
+    breaker.record_success()
+    return result
+
+
+async def _pipeline(
+    shard: Shard,
+    prefix: str,
+    queue: Callable[[Any], None],
+    invalidate: list[str] | None = None,
+    default: Any = None,
+):
+    # Runs the commands queued by ``queue`` as one pipeline on the shard. The
+    # L1 invalidation of ``invalidate`` is sent in the same pipeline, except
+    # on a cluster, whose pipelines can't publish.
+    message = None if invalidate is None else " ".join([INSTANCE_ID, *invalidate])
+
+    async def run(client):
+        async with client.pipeline(transaction=False) as pipe:
+            queue(pipe)
+            if message is not None and shard.pubsub_client is client:
+                pipe.publish(settings.CACHE_INVALIDATION_CHANNEL, message)
+            results = await pipe.execute()
+        if message is not None and shard.pubsub_client is not client:
+            await shard.pubsub_client.publish(
+                settings.CACHE_INVALIDATION_CHANNEL, message
+            )
+        return results
+
+    return await call_redis(prefix, run, default=default, shard=shard)
+
+
+class LuaScript:
+    """Lua script run with ``EVALSHA`` on whichever client it is given.
+
+    Nothing is sent to Redis when the script is defined, so scripts can be
+    declared at import time, before :func:`open_redis` picks the clients. A
+    server that doesn't know the script yet gets its source with ``EVAL``,
+    which also caches it there for the next ``EVALSHA``.
+
+    Args:
+        source (str): The script's Lua source
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.sha = hashlib.sha1(source.encode()).hexdigest()
+
+    async def __call__(self, client, keys: list[str], args: list) -> Any:
+        """Run the script.
+
+        Args:
+            client: The Redis client of the keys' shard
+            keys (list[str]): The keys the script accesses
+            args (list): The script's other arguments
+
+        Returns:
+            Any: The script's reply
+        """
+        try:
+            return await client.evalsha(self.sha, len(keys), *keys, *args)
+        except NoScriptError:
+            return await client.eval(self.source, len(keys), *keys, *args)
 
 
 async def get_cache(key: str):
     """Get a value from the Redis cache by key.
 
+    The L1 cache is consulted first when enabled, and filled from Redis on an
+    L1 miss.
+
     Args:
         key (str): The key to retrieve the value for
 
     Returns:
         The value stored under the key, or None if the key doesn't exist
     """
-    return await redis_client.get(key)
+    prefix = key_prefix(key)
+    if local_cache is not None:
+        value = local_cache.get(key)
+        if value is not None:
+            CACHE_REQUESTS.labels("l1", "hit", prefix).inc()
+            return value
+        CACHE_REQUESTS.labels("l1", "miss", prefix).inc()
+
+    value = await call_redis(
+        prefix, lambda client: client.get(key), shard=shard_for(key)
+    )
+    CACHE_REQUESTS.labels("l2", "miss" if value is None else "hit", prefix).inc()
+    if value is not None and local_cache is not None:
+        local_cache.set(key, value)
+    return value
 
 
 async def set_cache(key: str, value: str, ttl: int = 300):
     """Set a key-value pair in the Redis cache with optional TTL.
 
+    Other workers are told to drop their L1 copy of the key.
+
     Args:
         key (str): The key to store the value under
         value (str): The value to store in the cache
         ttl (int, optional): Time to live in seconds. Defaults to 300.
     """
-    await redis_client.set(key, value, ex=ttl)
+    shard = shard_for(key)
+    if local_cache is None:
+        await call_redis(
+            key_prefix(key), lambda client: client.set(key, value, ex=ttl), shard=shard
+        )
+        return
+
+    await _pipeline(
+        shard, key_prefix(key), lambda pipe: pipe.set(key, value, ex=ttl), [key]
+    )
+    local_cache.set(key, value.encode() if isinstance(value, str) else value, ttl)
+
+
+async def get_many_cache(keys: list[str]) -> list[bytes | None]:
+    """Get several values at once with one MGET per shard.
+
+    Keys found in the L1 cache are not sent to Redis. The shards are queried
+    concurrently, and a shard that is unavailable only turns its own keys
+    into misses.
+
+    Args:
+        keys (list[str]): The keys to retrieve the values for
+
+    Returns:
+        list[bytes | None]: The values in the order of ``keys``, with None for
+            keys that aren't cached and :data:`NEGATIVE_VALUE` for keys
+            cached as missing
+    """
+    prefix = key_prefix(keys[0]) if keys else ""
+    values: list[bytes | None] = [None] * len(keys)
+    pending = list(range(len(keys)))
+    if local_cache is not None:
+        pending = []
+        for index, key in enumerate(keys):
+            values[index] = local_cache.get(key)
+            if values[index] is None:
+                pending.append(index)
+        CACHE_REQUESTS.labels("l1", "hit", prefix).inc(len(keys) - len(pending))
+        CACHE_REQUESTS.labels("l1", "miss", prefix).inc(len(pending))
+    if not pending:
+        return values
+
+    groups = group_by_shard([keys[index] for index in pending])
+    fetched = await asyncio.gather(
+        *(
+            call_redis(
+                prefix,
+                lambda client, shard=shard, group=group: _mget(
+                    shard, client, [keys[pending[position]] for position in group]
+                ),
+                default=[None] * len(group),
+                shard=shard,
+            )
+            for shard, group in groups.items()
+        )
+    )
+    hits = 0
+    for group, group_values in zip(groups.values(), fetched):
+        for position, value in zip(group, group_values):
+            if value is not None:
+                hits += 1
+                index = pending[position]
+                values[index] = value
+                if local_cache is not None:
+                    local_cache.set(keys[index], value)
+    CACHE_REQUESTS.labels("l2", "hit", prefix).inc(hits)
+    CACHE_REQUESTS.labels("l2", "miss", prefix).inc(len(pending) - hits)
+    return values
+
+
+def _mget(shard: Shard, client, keys: list[str]):
+    # A cluster only accepts MGET within one hash slot; its client splits a
+    # non-atomic MGET per node instead.
+    if shard.cluster:
+        return client.mget_nonatomic(keys)
+    return client.mget(keys)
+
+
+async def set_many_cache(mapping: dict[str, str | bytes], ttl: int = 300):
+    """Set several key-value pairs with one pipeline per shard.
+
+    Args:
+        mapping (dict[str, str | bytes]): The values to store, by key
+        ttl (int, optional): Time to live in seconds. Defaults to 300.
+    """
+    if not mapping:
+        return
+
+    keys = list(mapping)
+
+    def queue(group):
+        def add(pipe):
+            for index in group:
+                pipe.set(keys[index], mapping[keys[index]], ex=ttl)
+
+        return add
+
+    await asyncio.gather(
+        *(
+            _pipeline(
+                shard,
+                key_prefix(keys[0]),
+                queue(group),
+                None if local_cache is None else [keys[index] for index in group],
+            )
+            for shard, group in group_by_shard(keys).items()
+        )
+    )
+    if local_cache is not None:
+        for key, value in mapping.items():
+            local_cache.set(
+                key, value.encode() if isinstance(value, str) else value, ttl
+            )
+
+
+async def delete_many_cache(keys: list[str]):
+    """Remove several keys with one pipeline per shard.
+
+    The keys are also evicted from every worker's L1 cache. Like fills, and
+    unlike :func:`delete_cache`, the deletes are guarded by the circuit
+    breaker.
+
+    Args:
+        keys (list[str]): The keys to remove
+    """
+    if not keys:
+        return
+
+    def queue(group):
+        def add(pipe):
+            for index in group:
+                pipe.delete(keys[index])
+
+        return add
+
+    await asyncio.gather(
+        *(
+            _pipeline(
+                shard,
+                key_prefix(keys[0]),
+                queue(group),
+                None if local_cache is None else [keys[index] for index in group],
+            )
+            for shard, group in group_by_shard(keys).items()
+        )
+    )
+    if local_cache is not None:
+        for key in keys:
+            local_cache.delete(key)
+
+
+async def set_negative_cache(keys: list[str], ttl: int | None = None):
+    """Cache keys as missing, unless they already hold a value.
+
+    The entries are only written where the key is absent, so a value stored
+    by a concurrent write is never replaced by a stale miss.
+
+    Args:
+        keys (list[str]): The keys whose values don't exist
+        ttl (int, optional): Time to live in seconds. Defaults to
+            ``settings.CACHE_NEGATIVE_TTL``; nothing is cached when it is 0.
+    """
+    ttl = settings.CACHE_NEGATIVE_TTL if ttl is None else ttl
+    if not keys or ttl <= 0:
+        return
+
+    def queue(group):
+        def add(pipe):
+            for index in group:
+                pipe.set(keys[index], NEGATIVE_VALUE, ex=ttl, nx=True)
+
+        return add
+
+    groups = group_by_shard(keys)
+    written = await asyncio.gather(
+        *(
+            _pipeline(shard, key_prefix(keys[0]), queue(group), default=())
+            for shard, group in groups.items()
+        )
+    )
+    if local_cache is not None:
+        for group, stored in zip(groups.values(), written):
+            for index, ok in zip(group, stored):
+                if ok:
+                    local_cache.set(keys[index], NEGATIVE_VALUE, ttl)
+
+
+async def publish(channel: str, message: str):
+    """Publish a message on a Redis pub/sub channel of the first shard.
+
+    Args:
+        channel (str): The channel to publish on
+        message (str): The message
+    """
+    pubsub_client = shards[0].pubsub_client
+    await call_redis(
+        key_prefix(channel), lambda client: pubsub_client.publish(channel, message)
+    )
+
+
+def open_pubsub() -> redis.client.PubSub:
+    """Open a pub/sub connection on the first shard.
+
+    Returns:
+        PubSub: The connection, ignoring subscription confirmations
+    """
+    return shards[0].pubsub_client.pubsub(ignore_subscribe_messages=True)
+
+
+async def delete_cache(key: str):
+    """Remove a key from Redis and from every worker's L1 cache.
+
+    Unlike reads and fills, deletes are not guarded by the circuit breaker:
+    a failed delete raises, so the caller can retry it.
+
+    Args:
+        key (str): The key to remove
+    """
+    shard = shard_for(key)
+    if local_cache is None:
+        await shard.client.delete(key)
+        return
+
+    local_cache.delete(key)
+    message = f"{INSTANCE_ID} {key}"
+    if shard.pubsub_client is not shard.client:
+        await shard.client.delete(key)
+        await shard.pubsub_client.publish(settings.CACHE_INVALIDATION_CHANNEL, message)
+        return
+    async with shard.client.pipeline(transaction=False) as pipe:
+        pipe.delete(key)
+        pipe.publish(settings.CACHE_INVALIDATION_CHANNEL, message)
+        await pipe.execute()
+
+
+async def get_counter(key: str) -> int | None:
+    """Read a counter straight from Redis, bypassing the L1 cache.
+
+    Args:
+        key (str): The counter's key
+
+    Returns:
+        int | None: The counter, 0 if it was never incremented, or None if
+            Redis is unavailable
+    """
+    value = await call_redis(
+        key_prefix(key),
+        lambda client: client.get(key),
+        default=_UNAVAILABLE,
+        shard=shard_for(key),
+    )
+    if value is _UNAVAILABLE:
+        return None
+    return 0 if value is None else int(value)
+
+
+async def incr_counter(key: str) -> int | None:
+    """Increment a counter in Redis.
+
+    Args:
+        key (str): The counter's key
+
+    Returns:
+        int | None: The new value, or None if Redis is unavailable
+    """
+    return await call_redis(
+        key_prefix(key), lambda client: client.incr(key), shard=shard_for(key)
+    )
+
+
+# A hash of counters is only trusted once it holds the ``__built`` field.
+# Increments that find it unbuilt count themselves in ``__changes`` instead,
+# and a rebuild is only written if no change happened while it counted.
+_BUILT_FIELD = b"__built"
+_CHANGES_FIELD = b"__changes"
+
+_INCR_HASH_IF_BUILT = LuaScript("""
+    if redis.call("hexists", KEYS[1], "__built") == 0 then
+        redis.call("hincrby", KEYS[1], "__changes", 1)
+        if redis.call("ttl", KEYS[1]) < 0 then
+            redis.call("expire", KEYS[1], ARGV[1])
+        end
+        return 0
+    end
+    for i = 2, #ARGV, 2 do
+        redis.call("hincrby", KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+    return 1
+    """)
+
+_BUILD_HASH = LuaScript("""
+    if redis.call("hexists", KEYS[1], "__built") == 1 then
+        return 0
+    end
+    if (redis.call("hget", KEYS[1], "__changes") or "0") ~= ARGV[1] then
+        return 0
+    end
+    redis.call("del", KEYS[1])
+    redis.call("hset", KEYS[1], "__built", 1)
+    for i = 3, #ARGV, 2 do
+        redis.call("hset", KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+    redis.call("expire", KEYS[1], ARGV[2])
+    return 1
+    """)
+
+
+async def get_hash_counters(key: str) -> tuple[dict[str, int] | None, int | None]:
+    """Read every counter of a Redis hash, bypassing the L1 cache.
+
+    Args:
+        key (str): The hash's key
+
+    Returns:
+        tuple[dict[str, int] | None, int | None]: The counters by field, or
+            None if the hash must be rebuilt; and the number of changes it
+            missed so far, to pass to :func:`set_hash_counters`. Both are
+            None if Redis is unavailable.
+    """
+    values = await call_redis(
+        key_prefix(key), lambda client: client.hgetall(key), shard=shard_for(key)
+    )
+    if values is None:
+        return None, None
+    if _BUILT_FIELD not in values:
+        return None, int(values.get(_CHANGES_FIELD, 0))
+    return {
+        field.decode(): int(value)
+        for field, value in values.items()
+        if field not in (_BUILT_FIELD, _CHANGES_FIELD)
+    }, 0
+
+
+async def set_hash_counters(
+    key: str, counters: dict[str, int], changes: int, ttl: int
+) -> bool:
+    """Store a rebuilt hash of counters, unless it changed meanwhile.
+
+    The hash is only written if no other worker built it first and no
+    increment was missed since ``changes`` was read, so the counters never
+    lose a change made while they were being counted. It expires after
+    ``ttl`` seconds, bounding how long a count can stay wrong.
+
+    Args:
+        key (str): The hash's key
+        counters (dict[str, int]): The counters by field
+        changes (int): The missed changes read with the counters
+        ttl (int): Time to live in seconds
+
+    Returns:
+        bool: True if the hash was written
+    """
+    written = await call_redis(
+        key_prefix(key),
+        lambda client: _BUILD_HASH(
+            client,
+            [key],
+            [changes, ttl, *(item for pair in counters.items() for item in pair)],
+        ),
+        shard=shard_for(key),
+    )
+    return bool(written)
+
+
+async def incr_hash_counters(key: str, deltas: dict[str, int], ttl: int):
+    """Atomically adjust counters of a Redis hash, if the hash is built.
+
+    An unbuilt hash is left unbuilt, so a reader knows to rebuild it in full
+    rather than trust counters that only saw part of the changes. If the
+    increment fails the hash is deleted for the same reason.
+
+    Args:
+        key (str): The hash's key
+        deltas (dict[str, int]): The amount to add to each field
+        ttl (int): Seconds an unbuilt hash keeps its count of missed changes
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    prefix, shard = key_prefix(key), shard_for(key)
+    result = await call_redis(
+        prefix,
+        lambda client: _INCR_HASH_IF_BUILT(
+            client, [key], [ttl, *(item for pair in deltas.items() for item in pair)]
+        ),
+        default=_UNAVAILABLE,
+        shard=shard,
+    )
+    if result is _UNAVAILABLE:
+        await call_redis(prefix, lambda client: client.delete(key), shard=shard)
+
+
+async def listen_for_invalidations():
+    """Evict L1 entries changed by other workers until cancelled.
+
+    Every shard is subscribed to separately. Messages published by this
+    worker are ignored, since its own L1 already holds the new value. When a
+    shard's subscription is lost, and again once it is re-established, the
+    L1 entries of that shard's keys are dropped, because invalidations may
+    have been missed while disconnected.
+    """
+    if local_cache is None:
+        return
+    await asyncio.gather(*(_listen_for_invalidations(shard) for shard in shards))
+
+
+async def _listen_for_invalidations(shard: Shard):
+    lost = False
+    while True:
+        pubsub = shard.pubsub_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+            if lost:
+                _evict_shard(shard)
+                lost = False
+            async for message in pubsub.listen():
+                origin, *keys = message["data"].decode().split(" ")
+                if origin != INSTANCE_ID:
+                    for key in keys:
+                        local_cache.delete(key)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning(
+                "Cache invalidation subscription to %s lost", shard.name, exc_info=True
+            )
+            if not lost:
+                _evict_shard(shard)
+                lost = True
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+
+def _evict_shard(shard: Shard):
+    if len(shards) == 1:
+        local_cache.clear()
+    else:
+        local_cache.delete_where(lambda key: _ring.node_for(key) is shard)
+
+
+Loader = Callable[[], Awaitable[str | bytes | None]]
+
+_flight = SingleFlight()
+_background_refreshes: set[asyncio.Task] = set()
+
+_RELEASE_LOCK = LuaScript("""
+    if redis.call("get", KEYS[1]) == ARGV[1] then
+        return redis.call("del", KEYS[1])
+    end
+    return 0
+    """)
+
+
+async def get_or_load(
+    key: str, loader: Loader, ttl: int = 300, refresher: Loader | None = None
+) -> bytes | None:
+    """Get a value from the cache, loading and storing it on a miss.
+
+    Concurrent misses for the same key in this worker share one call to
+    ``loader``. With ``settings.CACHE_LOCK_ENABLED`` the loading worker also
+    takes a short Redis lease so other workers wait for its result instead of
+    loading too. With ``settings.CACHE_STALE_TTL`` set, values are kept that
+    many seconds past ``ttl`` and served stale while ``refresher`` reloads
+    them in the background.
+
+    Args:
+        key (str): The key to retrieve the value for
+        loader (Loader): Coroutine function returning the value to cache, or
+            None when there is nothing to cache
+        ttl (int, optional): Time to live in seconds. Defaults to 300.
+        refresher (Loader, optional): Loader used for background refreshes,
+            for loaders bound to request-scoped resources. Defaults to
+            ``loader``.
+
+    Returns:
+        bytes | None: The cached or loaded value, or None if the loader found
+            nothing now or when the key was cached as missing
+    """
+    prefix = key_prefix(key)
+    if local_cache is not None:
+        value = local_cache.get(key)
+        if value == NEGATIVE_VALUE:
+            CACHE_REQUESTS.labels("l1", "negative", prefix).inc()
+            return None
+        if value is not None:
+            CACHE_REQUESTS.labels("l1", "hit", prefix).inc()
+            return value
+        CACHE_REQUESTS.labels("l1", "miss", prefix).inc()
+
+    async def read(client):
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.pttl(key)
+            return await pipe.execute()
+
+    stale_ttl = settings.CACHE_STALE_TTL
+    value, remaining_ms = await call_redis(
+        prefix, read, default=(None, -2), shard=shard_for(key)
+    )
+
+    if value == NEGATIVE_VALUE:
+        CACHE_REQUESTS.labels("l2", "negative", prefix).inc()
+        if local_cache is not None and remaining_ms > 0:
+            local_cache.set(key, value, remaining_ms / 1000)
+        return None
+    if value is not None:
+        if stale_ttl and 0 <= remaining_ms < stale_ttl * 1000:
+            CACHE_REQUESTS.labels("l2", "stale", prefix).inc()
+            _refresh_in_background(key, refresher or loader, ttl)
+            return value
+        CACHE_REQUESTS.labels("l2", "hit", prefix).inc()
+        if local_cache is not None:
+            fresh_for = remaining_ms / 1000 - stale_ttl if remaining_ms >= 0 else None
+            local_cache.set(key, value, fresh_for)
+        return value
+
+    CACHE_REQUESTS.labels("l2", "miss", prefix).inc()
+    if _flight.in_flight(key):
+        CACHE_LOADS.labels("coalesced").inc()
+    return await _flight.do(key, lambda: _load(key, loader, ttl))
+
+
+async def _load(key: str, loader: Loader, ttl: int) -> bytes | None:
+    # The lease is kept on the shard of the key it protects.
+    shard = _ring.node_for(key)
+    lock_key = f"lock:{key}"
+    token = uuid.uuid4().hex
+    locked = False
+    if settings.CACHE_LOCK_ENABLED:
+        acquired = await call_redis(
+            "lock",
+            lambda client: client.set(
+                lock_key, token, nx=True, px=int(settings.CACHE_LOCK_TTL * 1000)
+            ),
+            default=_UNAVAILABLE,
+            shard=shard,
+        )
+        locked = acquired is True
+        if acquired is None:
+            value = await _wait_for_fill(key, shard)
+            if value is not None:
+                CACHE_LOADS.labels("leased").inc()
+                return None if value == NEGATIVE_VALUE else value
+
+    try:
+        CACHE_LOADS.labels("loader").inc()
+        value = await loader()
+        if value is None:
+            await set_negative_cache([key])
+            return None
+        if isinstance(value, str):
+            value = value.encode()
+        await set_cache(key, value, ttl + settings.CACHE_STALE_TTL)
+        return value
+    finally:
+        if locked:
+            await call_redis(
+                "lock",
+                lambda client: _RELEASE_LOCK(client, [lock_key], [token]),
+                shard=shard,
+            )
+
+
+async def _wait_for_fill(key: str, shard: Shard) -> bytes | None:
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(settings.CACHE_LOCK_POLL_INTERVAL)
+        value = await call_redis(
+            key_prefix(key),
+            lambda client: client.get(key),
+            default=_UNAVAILABLE,
+            shard=shard,
+        )
+        if value is _UNAVAILABLE:
+            return None
+        if value is not None:
+            return value
+    return None
+
+
+def _refresh_in_background(key: str, loader: Loader, ttl: int):
+    if _flight.in_flight(key):
+        return
+
+    async def refresh():
+        try:
+            await _flight.do(key, lambda: _load(key, loader, ttl))
+        except Exception:
+            logger.warning("Background refresh of %s failed", key, exc_info=True)
+
+    task = asyncio.create_task(refresh())
+    _background_refreshes.add(task)
+    task.add_done_callback(_background_refreshes.discard)
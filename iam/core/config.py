@@ -4,6 +4,8 @@ This module provides configuration management using Pydantic BaseSettings
 to handle environment variables and configuration values.
 """
 
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
@@ -20,6 +22,88 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     REDIS_URL: str
     RABBITMQ_URL: str
+    DATABASE_REPLICA_URLS: list[str] = []
+    DB_REPLICA_STRATEGY: Literal["round_robin", "least_loaded"] = "round_robin"
+    DB_REPLICA_RETRY_INTERVAL: float = 30.0
+    DB_READ_YOUR_WRITES_WINDOW: float = 5.0
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 1
+    SERVER_GRACEFUL_SHUTDOWN_TIMEOUT: float = 30.0
+    FORWARDED_ALLOW_IPS: str = "127.0.0.1"
+    WARMUP_RETRY_INTERVAL: float = 2.0
+    DB_POOL_SIZE: int = 10
+    DB_POOL_WARMUP: int = 2
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 5.0
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    DB_CONNECT_TIMEOUT: float = 5.0
+    DB_STATEMENT_TIMEOUT: float = 10.0
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_JIT: bool = False
+    DB_ECHO: bool = False
+    DB_ECHO_POOL: bool = False
+    RABBITMQ_CHANNEL_POOL_SIZE: int = 4
+    RABBITMQ_PUBLISH_BATCH_SIZE: int = 100
+    RABBITMQ_BUFFER_SIZE: int = 10000
+    RABBITMQ_PUBLISH_TIMEOUT: float = 5.0
+    OUTBOX_BATCH_SIZE: int = 500
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    EVENT_CONSUMER_QUEUES: list[str] = ["user.created", "user.updated", "user.deleted"]
+    EVENT_CONSUMER_PREFETCH: int = 200
+    EVENT_CONSUMER_CONCURRENCY: int = 4
+    EVENT_CONSUMER_BATCH_SIZE: int = 100
+    EVENT_CONSUMER_ACK_INTERVAL: float = 0.5
+    EVENT_CONSUMER_MAX_RETRIES: int = 5
+    EVENT_CONSUMER_RETRY_BACKOFF: float = 1.0
+    REQUEST_TIMEOUT: float = 5.0
+    METRICS_SAMPLE_RATE: float = 1.0
+    BREAKER_FAIL_MAX: int = 5
+    BREAKER_RESET_TIMEOUT: float = 10.0
+    RETRY_MAX_ATTEMPTS: int = 3
+    RETRY_BACKOFF_BASE: float = 0.05
+    RETRY_BACKOFF_MAX: float = 1.0
+    RETRY_BUDGET_RATIO: float = 0.2
+    RETRY_BUDGET_MIN_PER_SECOND: float = 5.0
+    RETRY_BUDGET_MAX_TOKENS: float = 50.0
+    REDIS_SOCKET_TIMEOUT: float = 1.0
+    REDIS_CONNECT_TIMEOUT: float = 1.0
+    REDIS_SHARD_URLS: list[str] = []
+    REDIS_SHARD_VNODES: int = 160
+    REDIS_CLUSTER: bool = False
+    CACHE_L1_ENABLED: bool = False
+    CACHE_L1_MAX_ENTRIES: int = 10000
+    CACHE_L1_MAX_BYTES: int = 32 * 1024 * 1024
+    CACHE_L1_TTL: float = 5.0
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    CACHE_STALE_TTL: int = 0
+    USER_CACHE_TTL: int = 300
+    CACHE_LOCK_ENABLED: bool = False
+    CACHE_LOCK_TTL: float = 5.0
+    CACHE_LOCK_WAIT: float = 1.0
+    CACHE_LOCK_POLL_INTERVAL: float = 0.05
+    CACHE_NEGATIVE_TTL: int = 30
+    USER_FILTER_ENABLED: bool = False
+    USER_FILTER_CHANNEL: str = "users:created"
+    ROLE_CATALOGUE_CHECK_INTERVAL: float = 1.0
+    ROLE_MEMBER_COUNTS_TTL: int = 3600
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMITS: dict[str, str] = {
+        "POST /api/v1/users/": "10/second",
+        "POST /api/v1/users/bulk": "1/second",
+        "GET /api/v1/users/": "50/second",
+        "POST /api/v1/users/lookup": "50/second",
+        "GET /api/v1/users/{user_id}": "100/second",
+    }
+    RATE_LIMIT_LOCAL_MAX_CLIENTS: int = 10000
+    USER_LOOKUP_MAX_IDS: int = 1000
+    AUTHORIZE_BATCH_MAX: int = 1000
+    USER_BULK_CHUNK_SIZE: int = 500
+    PAGE_SIZE_DEFAULT: int = 100
+    PAGE_SIZE_MAX: int = 1000
+    STREAM_BATCH_SIZE: int = 1000
+    IMPORT_BATCH_SIZE: int = 5000
 
     class Config:
         """Inner configuration class for Settings.
@@ -0,0 +1,45 @@
+"""Conditional GET helpers.
+
+Endpoints tag their responses with an ETag derived from a row or catalogue
+version. A client sending the tag back in ``If-None-Match`` gets a bodiless
+``304 Not Modified`` when nothing changed.
+"""
+
+from fastapi import Request, Response, status
+
+ETAG_HEADER = "ETag"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's ``If-None-Match`` header matches an ETag.
+
+    Weak comparison is used, as for any ``If-None-Match``: ``W/"x"`` matches
+    ``"x"``.
+
+    Args:
+        request (Request): The incoming request
+        etag (str): The current ETag, quoted
+
+    Returns:
+        bool: True if the client already has the current representation
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    """Build a ``304 Not Modified`` response.
+
+    Args:
+        etag (str): The current ETag
+
+    Returns:
+        Response: The bodiless response, carrying the ETag
+    """
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED, headers={ETAG_HEADER: etag}
+    )
@@ -1,15 +1,233 @@
 """
 This module provides functionality for publishing messages to RabbitMQ queues.
 It uses aio_pika for asynchronous message queue operations.
+
+A single long-lived publisher is shared by the whole process: it keeps one
+robust connection, a pool of confirm-mode channels and a cache of the queues it
+has already declared. Events are buffered in a bounded in-memory queue and
+flushed in batches, so many messages share one round of publisher confirms.
+Batches go through the ``broker`` circuit breaker, so an unreachable broker
+fails publishes immediately instead of stalling every flush.
 """
 
+import asyncio
+import logging
+import time
+
 import aio_pika
+from aio_pika.abc import AbstractChannel, AbstractRobustConnection
+from aio_pika.pool import Pool
+from prometheus_client import Counter, Histogram
 from iam.core.config import settings
+from iam.core.resilience import CircuitOpenError, get_breaker
+
+logger = logging.getLogger(__name__)
+
+EVENT_PUBLISH_LATENCY = Histogram(
+    "event_publish_batch_seconds", "Time to publish and confirm a batch of events"
+)
+EVENT_PUBLISH_BATCH_SIZE = Histogram(
+    "event_publish_batch_size",
+    "Number of events published per batch",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+EVENT_PUBLISH_ERRORS = Counter(
+    "event_publish_errors_total", "Events that could not be published", ["reason"]
+)
+
+
+class EventPublisher:
+    """Pooled RabbitMQ publisher with batched publisher confirms.
+
+    Messages handed to :meth:`publish` are placed in a bounded buffer and a
+    background task drains it in batches. When the buffer is full, callers wait
+    up to ``publish_timeout`` seconds for room before the publish fails, which
+    applies backpressure instead of growing memory without bound.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        pool_size: int = 4,
+        batch_size: int = 100,
+        buffer_size: int = 10000,
+        publish_timeout: float = 5.0,
+    ):
+        self._url = url
+        self._pool_size = pool_size
+        self._batch_size = batch_size
+        self._buffer_size = buffer_size
+        self._publish_timeout = publish_timeout
+        self._connection: AbstractRobustConnection | None = None
+        self._channels: Pool | None = None
+        self._declared: set[str] = set()
+        self._buffer: asyncio.Queue | None = None
+        self._flusher: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def started(self) -> bool:
+        """Whether the connection, channel pool and flusher are running."""
+        return self._flusher is not None and not self._flusher.done()
+
+    async def start(self):
+        """Open the connection and start the background flusher.
+
+        Calling this more than once is a no-op while the publisher is running.
+        """
+        async with self._lock:
+            if self.started:
+                return
+            self._connection = await aio_pika.connect_robust(self._url)
+            self._channels = Pool(self._open_channel, max_size=self._pool_size)
+            self._buffer = asyncio.Queue(maxsize=self._buffer_size)
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self, timeout: float = 10.0):
+        """Flush buffered events and close channels and the connection.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the buffer to drain.
+                Defaults to 10.0.
+        """
+        async with self._lock:
+            if self._buffer is not None and self.started:
+                try:
+                    await asyncio.wait_for(self._buffer.join(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    dropped = self._buffer.qsize()
+                    EVENT_PUBLISH_ERRORS.labels("shutdown").inc(dropped)
+                    logger.warning("Dropping %d buffered events on shutdown", dropped)
+            if self._flusher is not None:
+                self._flusher.cancel()
+                try:
+                    await self._flusher
+                except asyncio.CancelledError:
+                    pass
+            if self._channels is not None:
+                await self._channels.close()
+            if self._connection is not None:
+                await self._connection.close()
+            self._connection = self._channels = self._buffer = self._flusher = None
+            self._declared.clear()
+
+    async def publish(self, queue: str, message: str):
+        """Buffer a message for publishing, starting the publisher if needed.
+
+        Args:
+            queue (str): The name of the queue to publish to.
+            message (str): The message content to be published.
+
+        Raises:
+            asyncio.TimeoutError: If the buffer stays full for longer than the
+                configured publish timeout.
+        """
+        if not self.started:
+            await self.start()
+        try:
+            await asyncio.wait_for(
+                self._buffer.put((queue, message)), timeout=self._publish_timeout
+            )
+        except asyncio.TimeoutError:
+            EVENT_PUBLISH_ERRORS.labels("buffer_full").inc()
+            raise
+
+    async def publish_batch(self, events: list[tuple[str, str]]):
+        """Publish a batch of messages and wait for all broker confirms.
+
+        The messages are pipelined on a single pooled channel and their
+        confirms are awaited together, so the batch costs roughly one broker
+        round-trip.
+
+        Args:
+            events (list[tuple[str, str]]): ``(queue, message)`` pairs.
+
+        Raises:
+            CircuitOpenError: If the ``broker`` circuit breaker is open.
+            Exception: The first publish failure, after every message in the
+                batch has been attempted.
+        """
+        if not events:
+            return
+        breaker = get_breaker("broker")
+        if not breaker.allow():
+            EVENT_PUBLISH_ERRORS.labels("circuit_open").inc(len(events))
+            raise CircuitOpenError("Circuit for broker is open")
+        try:
+            if not self.started:
+                await self.start()
+            start = time.perf_counter()
+            async with self._channels.acquire() as channel:
+                for queue in {queue for queue, _ in events}:
+                    await self._declare(channel, queue)
+                results = await asyncio.gather(
+                    *(
+                        channel.default_exchange.publish(
+                            aio_pika.Message(body=message.encode()),
+                            routing_key=queue,
+                            timeout=self._publish_timeout,
+                        )
+                        for queue, message in events
+                    ),
+                    return_exceptions=True,
+                )
+        except asyncio.CancelledError:
+            breaker.abandon()
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        EVENT_PUBLISH_LATENCY.observe(time.perf_counter() - start)
+        EVENT_PUBLISH_BATCH_SIZE.observe(len(events))
+
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            breaker.record_failure()
+            EVENT_PUBLISH_ERRORS.labels("broker").inc(len(errors))
+            raise errors[0]
+        breaker.record_success()
+
+    async def _open_channel(self) -> AbstractChannel:
+        return await self._connection.channel(publisher_confirms=True)
+
+    async def _declare(self, channel: AbstractChannel, queue: str):
+        if queue in self._declared:
+            return
+        await channel.declare_queue(queue, durable=True)
+        self._declared.add(queue)
+
+    async def _flush_loop(self):
+        while True:
+            batch = [await self._buffer.get()]
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._buffer.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                await self.publish_batch(batch)
+            except Exception:
+                logger.exception("Failed to publish a batch of %d events", len(batch))
+            finally:
+                for _ in batch:
+                    self._buffer.task_done()
+
+
+publisher = EventPublisher(
+    settings.RABBITMQ_URL,
+    pool_size=settings.RABBITMQ_CHANNEL_POOL_SIZE,
+    batch_size=settings.RABBITMQ_PUBLISH_BATCH_SIZE,
+    buffer_size=settings.RABBITMQ_BUFFER_SIZE,
+    publish_timeout=settings.RABBITMQ_PUBLISH_TIMEOUT,
+)
 
 
 async def publish_event(queue: str, message: str):
     """Publishes a message to a RabbitMQ queue.
 
+    The message is handed to the shared :data:`publisher`, which confirms it
+    in a batch with other pending events.
+
     Args:
         queue (str): The name of the queue to publish to.
         message (str): The message content to be published.
@@ -17,14 +235,4 @@ async def publish_event(queue: str, message: str):
     Returns:
         None
     """
-    connection = await aio_pika.connect_robust(
-        settings.RABBITMQ_URL,
-    )
-    channel = await connection.channel()
-    await channel.declare_queue(queue, durable=True)
-    await channel.default_exchange.publish(
-        aio_pika.Message(
-            body=message.encode(),
-        ),
-        routing_key=queue,
-    )
+    await publisher.publish(queue, message)
@@ -0,0 +1,55 @@
+"""HTTP request metrics.
+
+Requests are counted and timed per route template, method and status code,
+so ``/api/v1/users/{user_id}`` is one series however many users are read.
+Durations are measured with a monotonic clock. Requests that match no route
+are grouped under a single ``unmatched`` route to keep cardinality bounded.
+When ``settings.METRICS_SAMPLE_RATE`` is below 1, only that fraction of
+requests is timed, so the histogram's count is lower than the counter's.
+"""
+
+from prometheus_client import Counter, Histogram
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "route", "status"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_label(scope: dict) -> str:
+    """Return the route template a request was matched to.
+
+    Args:
+        scope (dict): The ASGI scope, after routing
+
+    Returns:
+        str: The route's path template, or ``unmatched``
+    """
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+def observe_request(
+    method: str, route: str, status: int, duration: float, timed: bool = True
+):
+    """Record a finished request.
+
+    Args:
+        method (str): The HTTP method
+        route (str): The route template, from :func:`route_label`
+        status (int): The response status code
+        duration (float): Seconds spent handling the request
+        timed (bool, optional): Whether to record the duration as well as
+            count the request. Defaults to True.
+    """
+    status_label = str(status)
+    HTTP_REQUESTS.labels(method, route, status_label).inc()
+    if timed:
+        HTTP_REQUEST_DURATION.labels(method, route, status_label).observe(duration)
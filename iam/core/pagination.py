@@ -0,0 +1,81 @@
+"""Keyset pagination helpers.
+
+This module provides the opaque cursors used by paginated list endpoints. A
+cursor encodes the last primary key of the previous page, so the next page is
+fetched with ``id > :cursor ORDER BY id LIMIT :n`` whatever the page depth.
+"""
+
+import base64
+import binascii
+
+from fastapi import HTTPException, Request
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def encode_cursor(last_id: int) -> str:
+    """Encode the last ID of a page as an opaque cursor.
+
+    Args:
+        last_id (int): The primary key of the last row returned
+
+    Returns:
+        str: A URL-safe cursor for the next page
+    """
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    """Decode a cursor produced by :func:`encode_cursor`.
+
+    Args:
+        cursor (str): The cursor received from a client
+
+    Returns:
+        int: The primary key after which the next page starts
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    prefix, _, value = raw.partition(":")
+    if prefix != "id" or not value.isdigit():
+        raise ValueError("Invalid cursor")
+    return int(value)
+
+
+def parse_cursor(cursor: str | None) -> int | None:
+    """Decode an optional cursor query parameter.
+
+    Args:
+        cursor (str | None): The cursor received from a client, if any
+
+    Returns:
+        int | None: The primary key after which the page starts, or None for
+            the first page
+
+    Raises:
+        HTTPException: If the cursor is malformed (400)
+    """
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def wants_ndjson(request: Request) -> bool:
+    """Whether the client asked for a streamed NDJSON response.
+
+    Args:
+        request (Request): The incoming request
+
+    Returns:
+        bool: True if the Accept header names the NDJSON media type
+    """
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
@@ -0,0 +1,243 @@
+"""Per-client, per-route rate limiting.
+
+Limits are configured in ``settings.RATE_LIMITS`` as ``"N/period"`` strings
+keyed by ``"METHOD /route/template"``, for example
+``{"POST /api/v1/users/": "10/second"}``, and apply to each client address
+separately, as seen through the proxies in ``settings.FORWARDED_ALLOW_IPS``.
+Routes without an entry are not limited.
+
+Each request is checked in two steps:
+
+- A token bucket held by the worker, refilled at the configured rate, rejects
+  a client that has already used its whole limit on this worker alone. That
+  overload is obvious without asking Redis.
+- An atomic sliding-window script in Redis then counts the client's requests
+  across every worker and pod.
+
+If Redis is unavailable the sliding window is skipped and only the local
+buckets apply, so an outage degrades the limit instead of failing requests.
+"""
+
+import functools
+import ipaddress
+import math
+import time
+import uuid
+
+from fastapi import HTTPException, Request, status
+from prometheus_client import Counter
+from iam.core import cache
+from iam.core.config import settings
+from iam.core.metrics import route_label
+
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections_total",
+    "Requests rejected by a rate limit",
+    ["route", "tier"],
+)
+
+_HASH_TAG_BRACES = str.maketrans("", "", "{}")
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+_SLIDING_WINDOW = cache.LuaScript("""
+    local now = redis.call("TIME")
+    local now_ms = now[1] * 1000 + math.floor(now[2] / 1000)
+    local window = tonumber(ARGV[1])
+    local limit = tonumber(ARGV[2])
+    redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", now_ms - window)
+    if redis.call("ZCARD", KEYS[1]) < limit then
+        redis.call("ZADD", KEYS[1], now_ms, ARGV[3])
+        redis.call("PEXPIRE", KEYS[1], window)
+        return 0
+    end
+    local oldest = redis.call("ZRANGE", KEYS[1], 0, 0, "WITHSCORES")
+    return math.max(1, tonumber(oldest[2]) + window - now_ms)
+    """)
+
+
+def window_key(route: str, client: str) -> str:
+    """Build the Redis key of a client's sliding window on a route.
+
+    Route templates such as ``/users/{user_id}`` contain braces, which Redis
+    Cluster reads as a hash tag: every key of the route would hash the tag
+    alone and land on the same slot. The braces are dropped so the whole key
+    is hashed.
+
+    Args:
+        route (str): ``"METHOD /route/template"``
+        client (str): The client identifier, such as its address
+
+    Returns:
+        str: The key of the window
+    """
+    return f"ratelimit:{route}:{client}".translate(_HASH_TAG_BRACES)
+
+
+def parse_limit(limit: str) -> tuple[int, float]:
+    """Parse a limit such as ``"10/second"`` or ``"500/hour"``.
+
+    Args:
+        limit (str): The number of requests and the period, separated by ``/``
+
+    Returns:
+        tuple[int, float]: The number of requests and the window in seconds
+
+    Raises:
+        ValueError: If the limit is malformed
+    """
+    count, _, period = limit.partition("/")
+    if period.strip() not in _PERIODS or not count.strip().isdigit():
+        raise ValueError(f"Invalid rate limit {limit!r}")
+    return int(count), float(_PERIODS[period.strip()])
+
+
+class TokenBucket:
+    """Token bucket refilled continuously up to its capacity."""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated_at")
+
+    def __init__(self, capacity: int, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token if one is available.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until the
+                next token
+        """
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Rate limits for every configured route, per client.
+
+    At most ``max_local_clients`` buckets are kept per worker; the least
+    recently created ones are dropped first.
+    """
+
+    def __init__(self, limits: dict[str, str], max_local_clients: int):
+        self.limits = {route: parse_limit(limit) for route, limit in limits.items()}
+        self.max_local_clients = max_local_clients
+        self._buckets: dict[tuple[str, str], TokenBucket] = {}
+
+    async def hit(self, route: str, client: str) -> float:
+        """Count a request against the route's limit.
+
+        Args:
+            route (str): ``"METHOD /route/template"``
+            client (str): The client identifier, such as its address
+
+        Returns:
+            float: 0 if the request is allowed, otherwise the seconds the
+                client should wait before retrying
+        """
+        limit = self.limits.get(route)
+        if limit is None:
+            return 0.0
+        count, window = limit
+
+        bucket = self._buckets.get((route, client))
+        if bucket is None:
+            if len(self._buckets) >= self.max_local_clients:
+                del self._buckets[next(iter(self._buckets))]
+            bucket = self._buckets[route, client] = TokenBucket(count, count / window)
+        retry_after = bucket.take()
+        if retry_after:
+            RATE_LIMIT_REJECTIONS.labels(route, "local").inc()
+            return retry_after
+
+        key = window_key(route, client)
+        retry_after_ms = await cache.call_redis(
+            "ratelimit",
+            lambda connection: _SLIDING_WINDOW(
+                connection, [key], [int(window * 1000), count, uuid.uuid4().hex]
+            ),
+            default=0,
+            shard=cache.shard_for(key),
+        )
+        if retry_after_ms:
+            RATE_LIMIT_REJECTIONS.labels(route, "redis").inc()
+            return retry_after_ms / 1000
+        return 0.0
+
+
+def client_address(request: Request) -> str:
+    """Return the address of the client, seen through trusted proxies.
+
+    ``X-Forwarded-For`` is read from right to left for as long as the hop
+    that added the entry is listed in ``settings.FORWARDED_ALLOW_IPS``: the
+    first address added by an untrusted hop is the client. Without a trusted
+    proxy in front, the peer address is the client.
+
+    Args:
+        request (Request): The incoming request
+
+    Returns:
+        str: The client address
+    """
+    host = request.client.host if request.client else "unknown"
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded is None:
+        return host
+    for address in reversed(forwarded.split(",")):
+        if not _is_trusted_proxy(host, settings.FORWARDED_ALLOW_IPS):
+            break
+        host = address.strip()
+    return host
+
+
+def _is_trusted_proxy(host: str, allowed: str) -> bool:
+    if allowed.strip() == "*":
+        return True
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_networks(allowed))
+
+
+@functools.cache
+def _trusted_networks(allowed: str) -> tuple:
+    return tuple(
+        ipaddress.ip_network(entry.strip(), strict=False)
+        for entry in allowed.split(",")
+        if entry.strip()
+    )
+
+
+rate_limiter = RateLimiter(settings.RATE_LIMITS, settings.RATE_LIMIT_LOCAL_MAX_CLIENTS)
+
+
+async def enforce_rate_limit(request: Request):
+    """FastAPI dependency rejecting requests over their route's rate limit.
+
+    Args:
+        request (Request): The incoming request, after routing
+
+    Raises:
+        HTTPException: If the client is over the limit (429), with a
+            ``Retry-After`` header
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    route = f"{request.method} {route_label(request.scope)}"
+    retry_after = await rate_limiter.hit(route, client_address(request))
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
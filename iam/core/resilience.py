@@ -1,36 +1,279 @@
 """
 This module provides resilience patterns for handling transient failures in async functions.
 
-It implements circuit breaker and retry patterns using pybreaker and tenacity libraries
-to make async function calls more robust against temporary failures and outages.
+It implements asyncio-native circuit breakers, kept per dependency (database,
+Redis, broker), and retries that are bounded three ways: a maximum number of
+attempts, the deadline of the current request and a process-wide retry budget.
+A failing dependency therefore fails fast instead of holding requests open and
+piling up coroutines.
 """
 
-import pybreaker
-from tenacity import retry, wait_exponential, stop_after_attempt
+import asyncio
+import contextvars
+import functools
+import random
+import time
 
-breaker = pybreaker.CircuitBreaker(fail_max=3, reset_timeout=10)
+from prometheus_client import Counter, Gauge
+from iam.core.config import settings
 
+BREAKER_STATE = Gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["dependency"],
+    multiprocess_mode="max",
+)
+DEPENDENCY_RETRIES = Counter(
+    "dependency_retries_total", "Retried calls to a dependency", ["dependency"]
+)
+DEPENDENCY_REJECTIONS = Counter(
+    "dependency_rejections_total",
+    "Calls or retries refused without reaching a dependency",
+    ["dependency", "reason"],
+)
 
-def resilient(func):
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar(
+    "deadline", default=None
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because its circuit breaker is open."""
+
+
+def set_deadline(timeout: float) -> contextvars.Token:
+    """Set the deadline for the work running in the current context.
+
+    Args:
+        timeout (float): Seconds from now until the deadline
+
+    Returns:
+        contextvars.Token: Token to restore the previous deadline with
+            :func:`reset_deadline`
+    """
+    return _deadline.set(time.monotonic() + timeout)
+
+
+def reset_deadline(token: contextvars.Token):
+    """Restore the deadline that was active before :func:`set_deadline`.
+
+    Args:
+        token (contextvars.Token): The token returned by :func:`set_deadline`
+    """
+    _deadline.reset(token)
+
+
+def time_remaining() -> float | None:
+    """Seconds left until the current deadline.
+
+    Returns:
+        float | None: The remaining time, which may be negative, or None when
+            no deadline is set
+    """
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class CircuitBreaker:
+    """Asyncio-native circuit breaker for a single dependency.
+
+    After ``fail_max`` consecutive failures the breaker opens and refuses
+    calls for ``reset_timeout`` seconds. It then lets a single trial call
+    through (half-open): success closes it again, failure reopens it.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, name: str, fail_max: int, reset_timeout: float):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._set_state(self.CLOSED)
+
+    @property
+    def state(self) -> int:
+        """The current state, one of CLOSED, HALF_OPEN or OPEN."""
+        if (
+            self._state == self.OPEN
+            and time.monotonic() - self._opened_at >= self.reset_timeout
+        ):
+            self._set_state(self.HALF_OPEN)
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go through now.
+
+        In the half-open state only one trial call is allowed at a time.
+
+        Returns:
+            bool: True if the caller may proceed
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        """Record a successful call and close the breaker."""
+        self._failures = 0
+        self._trial_in_flight = False
+        if self._state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        """Record a failed call, opening the breaker if needed."""
+        self._failures += 1
+        self._trial_in_flight = False
+        if self._state == self.HALF_OPEN or self._failures >= self.fail_max:
+            self._opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    def abandon(self):
+        """Release a half-open trial slot without recording an outcome."""
+        self._trial_in_flight = False
+
+    def _set_state(self, state: int):
+        self._state = state
+        BREAKER_STATE.labels(self.name).set(state)
+
+
+class RetryBudget:
+    """Process-wide budget limiting retries to a fraction of calls.
+
+    Every call deposits ``ratio`` tokens and every retry withdraws one, so
+    retries stay below roughly ``ratio`` of the traffic. ``min_per_second``
+    tokens are added over time so low-traffic processes can still retry.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, max_tokens: float):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated_at = time.monotonic()
+
+    def deposit(self):
+        """Credit the budget for a new call."""
+        self._refill()
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        """Take one token for a retry.
+
+        Returns:
+            bool: True if the retry is within budget
+        """
+        self._refill()
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.max_tokens,
+            self._tokens + (now - self._updated_at) * self.min_per_second,
+        )
+        self._updated_at = now
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+retry_budget = RetryBudget(
+    settings.RETRY_BUDGET_RATIO,
+    settings.RETRY_BUDGET_MIN_PER_SECOND,
+    settings.RETRY_BUDGET_MAX_TOKENS,
+)
+
+
+def get_breaker(dependency: str) -> CircuitBreaker:
+    """Return the circuit breaker for a dependency, creating it on first use.
+
+    Args:
+        dependency (str): The dependency name, such as "db" or "redis"
+
+    Returns:
+        CircuitBreaker: The breaker shared by every caller of the dependency
+    """
+    breaker = _breakers.get(dependency)
+    if breaker is None:
+        breaker = _breakers[dependency] = CircuitBreaker(
+            dependency, settings.BREAKER_FAIL_MAX, settings.BREAKER_RESET_TIMEOUT
+        )
+    return breaker
+
+
+def _backoff(attempt: int) -> float:
+    delay = min(settings.RETRY_BACKOFF_MAX, settings.RETRY_BACKOFF_BASE * 2**attempt)
+    return random.uniform(delay / 2, delay)
+
+
+def resilient(func=None, *, dependency: str = "default"):
     """
     A decorator that adds resilience patterns to async functions.
 
     Combines circuit breaker and retry patterns to handle transient failures:
-    - Circuit breaker: Stops calling the function after 3 consecutive failures for 10 seconds
-    - Retry: Attempts the call up to 5 times with exponential backoff between 1-10 seconds
+    - Circuit breaker: One breaker per dependency; after
+      ``settings.BREAKER_FAIL_MAX`` consecutive failures calls fail fast with
+      CircuitOpenError for ``settings.BREAKER_RESET_TIMEOUT`` seconds
+    - Retry: Up to ``settings.RETRY_MAX_ATTEMPTS`` attempts with jittered
+      exponential backoff, never sleeping past the current deadline and only
+      while the process-wide retry budget allows it
+    - Deadline: Each attempt is cancelled when the current deadline expires
+
+    Can be used bare (``@resilient``) or with a dependency name
+    (``@resilient(dependency="db")``).
 
     Args:
         func: The async function to make resilient
+        dependency (str, optional): The dependency whose breaker guards the
+            call. Defaults to "default".
 
     Returns:
         The wrapped function with resilience patterns applied
     """
+    if func is None:
+        return functools.partial(resilient, dependency=dependency)
 
-    @breaker
-    @retry(
-        wait=wait_exponential(multiplier=1, min=1, max=10), stop=stop_after_attempt(5)
-    )
+    @functools.wraps(func)
     async def wrapper(*args, **kwargs):
-        return await func(*args, **kwargs)
+        breaker = get_breaker(dependency)
+        retry_budget.deposit()
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                DEPENDENCY_REJECTIONS.labels(dependency, "open").inc()
+                raise CircuitOpenError(f"Circuit for {dependency} is open")
+            try:
+                async with asyncio.timeout(time_remaining()):
+                    result = await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                breaker.abandon()
+                raise
+            except Exception:
+                breaker.record_failure()
+                attempt += 1
+                if attempt >= settings.RETRY_MAX_ATTEMPTS:
+                    raise
+                delay = _backoff(attempt)
+                remaining = time_remaining()
+                if remaining is not None and delay >= remaining:
+                    DEPENDENCY_REJECTIONS.labels(dependency, "deadline").inc()
+                    raise
+                if not retry_budget.try_withdraw():
+                    DEPENDENCY_REJECTIONS.labels(dependency, "budget").inc()
+                    raise
+                DEPENDENCY_RETRIES.labels(dependency).inc()
+                await asyncio.sleep(delay)
+            else:
+                breaker.record_success()
+                return result
 
     return wrapper
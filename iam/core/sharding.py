@@ -0,0 +1,54 @@
+"""Consistent hashing of keys onto shards.
+
+Each shard is placed on a hash ring at ``vnodes`` points, and a key belongs to
+the first shard point at or after the key's own hash. Adding or removing a
+shard therefore only moves the keys between it and its neighbours, about
+``1/n`` of them, instead of remapping almost every key as ``hash % n`` would.
+The virtual nodes spread each shard's share of the ring evenly.
+"""
+
+import bisect
+import hashlib
+from typing import Generic, Sequence, TypeVar
+
+T = TypeVar("T")
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), "big"
+    )
+
+
+class HashRing(Generic[T]):
+    """Consistent-hash ring mapping string keys to nodes.
+
+    Nodes are placed by name, so a node keeps its position, and its keys,
+    whatever other nodes are added, removed or reordered.
+    """
+
+    def __init__(self, nodes: Sequence[T], names: Sequence[str], vnodes: int = 160):
+        if not nodes or len(nodes) != len(names) or len(set(names)) != len(names):
+            raise ValueError("A hash ring needs nodes with distinct names")
+        points = sorted(
+            (_hash(f"{name}#{index}"), position)
+            for position, name in enumerate(names)
+            for index in range(vnodes)
+        )
+        self.nodes = tuple(nodes)
+        self._hashes = [point for point, _ in points]
+        self._owners = [nodes[position] for _, position in points]
+
+    def node_for(self, key: str) -> T:
+        """Return the node owning a key.
+
+        Args:
+            key (str): The key
+
+        Returns:
+            T: The node at or after the key's position on the ring
+        """
+        if len(self.nodes) == 1:
+            return self.nodes[0]
+        index = bisect.bisect_left(self._hashes, _hash(key))
+        return self._owners[index if index < len(self._owners) else 0]
@@ -0,0 +1,80 @@
+"""Request coalescing for concurrent loads of the same key.
+
+This module provides a small single-flight helper: while a load for a key is
+in progress, further callers for that key wait for its result instead of
+starting their own.
+
+The load runs in the leading caller's task, since it may use resources scoped
+to that caller, such as its database session. If the leader is cancelled,
+for example because its client disconnected, the callers waiting on it don't
+fail with it: one of them starts the load again.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class LeaderCancelled(Exception):
+    """The leading call was cancelled before it finished."""
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into a single execution.
+
+    Only callers running in the same event loop are coalesced; the result is
+    not cached once the leading call completes.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Future] = {}
+
+    def in_flight(self, key: str) -> bool:
+        """Whether a call for the key is currently running.
+
+        Args:
+            key (str): The key to check
+
+        Returns:
+            bool: True if a leading call is in progress
+        """
+        return key in self._calls
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``fn`` for the key, or wait for the call already running.
+
+        Args:
+            key (str): The key identifying the work
+            fn (Callable[[], Awaitable[Any]]): The coroutine function to run
+                when no call for the key is in progress
+
+        Returns:
+            Any: The result of the leading call
+
+        Raises:
+            Exception: Whatever the leading call raised
+        """
+        while (future := self._calls.get(key)) is not None:
+            try:
+                return await asyncio.shield(future)
+            except LeaderCancelled:
+                # The key is free again; the first waiter to resume leads.
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_exception(LeaderCancelled(key))
+            future.exception()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark the exception as retrieved when no caller was waiting.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
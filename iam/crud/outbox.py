@@ -0,0 +1,77 @@
+"""CRUD operations for the transactional outbox.
+
+This module provides functions for recording events alongside other database
+changes and for claiming and removing them once they have been published.
+"""
+
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from iam.models.outbox import OutboxEvent
+
+
+def add_event(db: AsyncSession, queue: str, payload: str) -> OutboxEvent:
+    """Record an event in the outbox as part of the current transaction.
+
+    The event is only flushed with the caller's next commit, so it is
+    published if and only if the surrounding change is committed.
+
+    Args:
+        db (AsyncSession): The database session.
+        queue (str): The queue the event is published to.
+        payload (str): The message body.
+
+    Returns:
+        OutboxEvent: The pending outbox row.
+    """
+    event = OutboxEvent(queue=queue, payload=payload)
+    db.add(event)
+    return event
+
+
+async def add_events(db: AsyncSession, events: list[tuple[str, str]]):
+    """Record several events in the outbox with one multi-row insert.
+
+    Like :func:`add_event`, the events are committed with the caller's
+    transaction.
+
+    Args:
+        db (AsyncSession): The database session.
+        events (list[tuple[str, str]]): ``(queue, payload)`` pairs.
+    """
+    if events:
+        await db.execute(
+            insert(OutboxEvent),
+            [{"queue": queue, "payload": payload} for queue, payload in events],
+        )
+
+
+async def claim_events(db: AsyncSession, limit: int) -> list[OutboxEvent]:
+    """Lock and return the oldest unpublished events.
+
+    On PostgreSQL rows are claimed with ``FOR UPDATE SKIP LOCKED`` so several
+    relays can drain the outbox concurrently. Other dialects fall back to a
+    plain polling read and expect a single relay.
+
+    Args:
+        db (AsyncSession): The database session, inside a transaction.
+        limit (int): The maximum number of events to claim.
+
+    Returns:
+        list[OutboxEvent]: The claimed events in publish order.
+    """
+    query = select(OutboxEvent).order_by(OutboxEvent.id).limit(limit)
+    if db.bind.dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=True)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+async def delete_events(db: AsyncSession, ids: list[int]):
+    """Remove published events from the outbox.
+
+    Args:
+        db (AsyncSession): The database session, inside a transaction.
+        ids (list[int]): The identifiers of the published events.
+    """
+    await db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(ids)))
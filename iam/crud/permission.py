@@ -0,0 +1,65 @@
+"""CRUD operations for permissions and authorization decisions.
+
+Permissions are granted to roles and compiled into the role catalogue, so
+deciding whether a user may take an action on a resource needs the user's
+role, read from the user cache, and a few set lookups. The database is only
+queried for users missing from the cache.
+"""
+
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+from iam.crud.role import role_catalogue
+from iam.crud.user import get_users_json
+from iam.models.permission import Permission
+from iam.schemas.permission import AuthorizationCheck, PermissionCreate
+
+
+async def create_permission(
+    db: AsyncSession, role_id: int, permission: PermissionCreate
+) -> Permission:
+    """Grant a permission to a role.
+
+    Args:
+        db (AsyncSession): The database session.
+        role_id (int): The role to grant the permission to.
+        permission (PermissionCreate): The action and resource.
+
+    Returns:
+        Permission: The newly created Permission object.
+
+    Raises:
+        IntegrityError: If the role already has the permission.
+    """
+    db_permission = Permission(role_id=role_id, **permission.model_dump())
+    db.add(db_permission)
+    await db.commit()
+    await db.refresh(db_permission)
+    await role_catalogue.invalidate()
+    return db_permission
+
+
+async def authorize(db: AsyncSession, checks: list[AuthorizationCheck]) -> list[bool]:
+    """Decide whether each user may take an action on a resource.
+
+    The users' roles are read from the user cache in one round-trip; unknown
+    users are denied.
+
+    Args:
+        db (AsyncSession): The database session, used for cache misses.
+        checks (list[AuthorizationCheck]): The checks to decide.
+
+    Returns:
+        list[bool]: The decisions, in the order of ``checks``.
+    """
+    snapshot = await role_catalogue.get()
+    user_ids = list(dict.fromkeys(check.user_id for check in checks))
+    roles = {
+        user_id: orjson.loads(data)["role_id"]
+        for user_id, data in zip(user_ids, await get_users_json(db, user_ids))
+        if data is not None
+    }
+    return [
+        check.user_id in roles
+        and snapshot.allows(roles[check.user_id], check.action, check.resource)
+        for check in checks
+    ]
@@ -2,13 +2,56 @@
 
 This module provides functions for creating and retrieving role records
 using SQLAlchemy's async session functionality.
+
+Roles change rarely, so each worker serves them from :data:`role_catalogue`,
+an immutable in-memory snapshot of the ``roles`` table. ``create_role`` bumps
+the ``roles:version`` counter in Redis, and workers compare it with their
+snapshot at most every ``settings.ROLE_CATALOGUE_CHECK_INTERVAL`` seconds,
+reloading the table only when it changed. Each snapshot also holds every
+role's permissions, compiled into frozensets so authorization decisions are
+set lookups; they are recompiled only when the catalogue is reloaded.
+
+The number of users in each role is kept in the ``roles:members`` Redis hash
+and adjusted as users are created or change role, so reading it never counts
+rows. The hash is rebuilt from the database with one grouped count when it is
+missing; deleting it forces a rebuild.
 """
 
+import bisect
+import hashlib
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import AsyncIterator, Mapping
+
+import orjson
+from prometheus_client import Counter
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from iam.core.cache import (
+    get_counter,
+    get_hash_counters,
+    incr_counter,
+    incr_hash_counters,
+    set_hash_counters,
+)
+from iam.core.config import settings
+from iam.core.singleflight import SingleFlight
+from iam.db.session import async_session
+from iam.models.permission import Permission
 from iam.models.role import Role
+from iam.models.user import User
 from iam.schemas.role import RoleCreate
 
+ROLES_VERSION_KEY = "roles:version"
+ROLE_MEMBERS_KEY = "roles:members"
+ANY = "*"
+
+ROLE_CATALOGUE_RELOADS = Counter(
+    "role_catalogue_reloads_total", "Reloads of the in-memory role catalogue"
+)
+
 
 async def create_role(db: AsyncSession, role: RoleCreate) -> Role:
     """Create a new role in the database.
@@ -24,17 +67,293 @@ async def create_role(db: AsyncSession, role: RoleCreate) -> Role:
     db.add(db_role)
     await db.commit()
     await db.refresh(db_role)
+    await role_catalogue.invalidate()
     return db_role
 
 
-async def get_roles(db: AsyncSession) -> list[Role]:
-    """Retrieve all roles from the database.
+async def get_roles(
+    db: AsyncSession, after_id: int | None = None, limit: int | None = None
+) -> list[Role]:
+    """Retrieve roles from the database in ID order.
 
     Args:
         db (AsyncSession): The database session.
+        after_id (int, optional): Only return roles with a greater ID
+            (keyset pagination). Defaults to None.
+        limit (int, optional): The maximum number of roles to return.
+            Defaults to None, which returns every role.
 
     Returns:
-        list[Role]: A list of all Role objects in the database.
+        list[Role]: A list of Role objects.
     """
-    result = await db.execute(select(Role))
+    query = select(Role).order_by(Role.id)
+    if after_id is not None:
+        query = query.where(Role.id > after_id)
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
     return result.scalars().all()
+
+
+async def stream_roles(db: AsyncSession, batch_size: int = 1000) -> AsyncIterator[Role]:
+    """Iterate over every role with a server-side cursor.
+
+    Args:
+        db (AsyncSession): The database session.
+        batch_size (int, optional): Rows fetched per round-trip. Defaults to 1000.
+
+    Yields:
+        Role: Each role, in ID order.
+    """
+    query = select(Role).order_by(Role.id).execution_options(yield_per=batch_size)
+    async for role in await db.stream_scalars(query):
+        yield role
+
+
+async def get_member_counts(db: AsyncSession) -> dict[int, int]:
+    """Return the number of users in each role.
+
+    Args:
+        db (AsyncSession): The database session, used to rebuild the counts
+            when they are missing from Redis.
+
+    Returns:
+        dict[int, int]: User counts by role ID, for every role.
+    """
+    snapshot = await role_catalogue.get()
+    counts, changes = await get_hash_counters(ROLE_MEMBERS_KEY)
+    if counts is None:
+        result = await db.execute(
+            select(User.role_id, func.count()).group_by(User.role_id)
+        )
+        counts = {str(role_id): 0 for role_id in snapshot.names}
+        counts.update({str(role_id): count for role_id, count in result.all()})
+        if changes is not None:
+            await set_hash_counters(
+                ROLE_MEMBERS_KEY, counts, changes, settings.ROLE_MEMBER_COUNTS_TTL
+            )
+    return {
+        role_id: counts.get(str(role_id), 0)
+        for role_id in sorted({*snapshot.names, *map(int, counts)})
+    }
+
+
+async def adjust_member_counts(deltas: dict[int, int]):
+    """Add to the member counts of roles after a committed change.
+
+    Args:
+        deltas (dict[int, int]): The change in users by role ID.
+    """
+    await incr_hash_counters(
+        ROLE_MEMBERS_KEY,
+        {str(role_id): delta for role_id, delta in deltas.items()},
+        settings.ROLE_MEMBER_COUNTS_TTL,
+    )
+
+
+@dataclass(frozen=True)
+class RoleSnapshot:
+    """Immutable copy of the ``roles`` table at a given catalogue version.
+
+    Attributes:
+        version (int): The ``roles:version`` counter the snapshot was loaded at
+        roles (tuple[dict, ...]): The roles in ID order, shaped like
+            :class:`iam.schemas.role.Role`
+        names (Mapping[int, str]): Role names by ID
+        body (bytes): ``roles`` encoded as a JSON array
+        ndjson (bytes): ``roles`` encoded as NDJSON, one role per line
+        permissions (Mapping[int, frozenset[tuple[str, str]]]): The
+            ``(action, resource)`` pairs granted to each role, by role ID
+        tag (str): Identifies the snapshot in ETags; built from the version
+            and a digest of ``body``, so it also changes if the version
+            counter is ever reset
+    """
+
+    version: int
+    roles: tuple[dict, ...]
+    names: Mapping[int, str]
+    body: bytes
+    ndjson: bytes
+    permissions: Mapping[int, frozenset[tuple[str, str]]]
+    tag: str
+
+    @classmethod
+    def build(
+        cls,
+        version: int,
+        roles: list[Role],
+        permissions: list[tuple[int, str, str]] = (),
+    ) -> "RoleSnapshot":
+        """Build a snapshot from roles loaded in ID order.
+
+        Args:
+            version (int): The catalogue version the roles were loaded at.
+            roles (list[Role]): The roles, in ID order.
+            permissions (list[tuple[int, str, str]], optional): The
+                ``(role_id, action, resource)`` grants. Defaults to none.
+
+        Returns:
+            RoleSnapshot: The snapshot, with its responses pre-serialized and
+                its permissions compiled.
+        """
+        items = tuple({"name": role.name, "id": role.id} for role in roles)
+        body = orjson.dumps(items)
+        grants: dict[int, set[tuple[str, str]]] = {item["id"]: set() for item in items}
+        for role_id, action, resource in permissions:
+            grants.setdefault(role_id, set()).add((action, resource))
+        return cls(
+            version=version,
+            roles=items,
+            names=MappingProxyType({item["id"]: item["name"] for item in items}),
+            body=body,
+            ndjson=b"".join(orjson.dumps(item) + b"\n" for item in items),
+            permissions=MappingProxyType(
+                {role_id: frozenset(pairs) for role_id, pairs in grants.items()}
+            ),
+            tag=f"roles-{version}-{hashlib.blake2b(body, digest_size=8).hexdigest()}",
+        )
+
+    def allows(self, role_id: int, action: str, resource: str) -> bool:
+        """Whether a role may take an action on a resource.
+
+        A grant matches when its action and resource are equal to the ones
+        asked for or are ``*``.
+
+        Args:
+            role_id (int): The role to check.
+            action (str): The action, such as "read".
+            resource (str): The resource, such as "invoices".
+
+        Returns:
+            bool: True if one of the role's permissions matches.
+        """
+        granted = self.permissions.get(role_id)
+        if not granted:
+            return False
+        return (
+            (action, resource) in granted
+            or (action, ANY) in granted
+            or (ANY, resource) in granted
+            or (ANY, ANY) in granted
+        )
+
+    def page(self, after_id: int | None, limit: int | None) -> tuple[dict, ...]:
+        """Return a page of roles in ID order.
+
+        Args:
+            after_id (int | None): Only return roles with a greater ID.
+            limit (int | None): The maximum number of roles, or None for all.
+
+        Returns:
+            tuple[dict, ...]: The roles on the page.
+        """
+        start = 0
+        if after_id is not None:
+            start = bisect.bisect_right(self.roles, after_id, key=lambda r: r["id"])
+        end = None if limit is None else start + limit
+        return self.roles[start:end]
+
+
+class RoleCatalogue:
+    """Per-worker cache of the ``roles`` table, refreshed by version.
+
+    The snapshot is checked against the ``roles:version`` counter in Redis
+    at most every ``check_interval`` seconds and reloaded from the primary
+    database when the version moved. While Redis is unavailable the current
+    snapshot is kept; unknown role IDs still trigger a reload, at most once
+    per interval, so new roles are never rejected for long.
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self._snapshot: RoleSnapshot | None = None
+        self._checked_at = 0.0
+        self._forced_at = 0.0
+        self._flight = SingleFlight()
+
+    async def get(self, db: AsyncSession | None = None) -> RoleSnapshot:
+        """Return the current snapshot, reloading it if the version moved.
+
+        Args:
+            db (AsyncSession, optional): A session on the primary database to
+                reload with. Defaults to None, which opens a new session.
+
+        Returns:
+            RoleSnapshot: The current snapshot.
+        """
+        snapshot = self._snapshot
+        if (
+            snapshot is not None
+            and time.monotonic() - self._checked_at < self.check_interval
+        ):
+            return snapshot
+        return await self._flight.do("roles", lambda: self._refresh(db, force=False))
+
+    async def resolve(
+        self, role_ids: set[int], db: AsyncSession | None = None
+    ) -> dict[int, str]:
+        """Look up the names of existing roles.
+
+        Args:
+            role_ids (set[int]): The role IDs to look up.
+            db (AsyncSession, optional): A session on the primary database to
+                reload with. Defaults to None, which opens a new session.
+
+        Returns:
+            dict[int, str]: The names of the roles that exist, by ID.
+        """
+        snapshot = await self.get(db)
+        if not role_ids <= snapshot.names.keys():
+            now = time.monotonic()
+            if now - self._forced_at >= self.check_interval:
+                self._forced_at = now
+                snapshot = await self._flight.do(
+                    "roles", lambda: self._refresh(db, force=True)
+                )
+        return {
+            role_id: snapshot.names[role_id]
+            for role_id in role_ids
+            if role_id in snapshot.names
+        }
+
+    async def invalidate(self):
+        """Bump the catalogue version after the ``roles`` table changed.
+
+        Every worker reloads within ``check_interval`` seconds; this worker
+        reloads on its next read.
+        """
+        await incr_counter(ROLES_VERSION_KEY)
+        self._snapshot = None
+
+    async def _refresh(self, db: AsyncSession | None, force: bool) -> RoleSnapshot:
+        version = await get_counter(ROLES_VERSION_KEY)
+        self._checked_at = time.monotonic()
+        snapshot = self._snapshot
+        if (
+            snapshot is not None
+            and not force
+            and (version is None or version == snapshot.version)
+        ):
+            return snapshot
+
+        if version is None:
+            version = -1 if snapshot is None else snapshot.version
+        if db is None:
+            async with async_session() as session:
+                snapshot = await self._load(session, version)
+        else:
+            snapshot = await self._load(db, version)
+        ROLE_CATALOGUE_RELOADS.inc()
+        self._snapshot = snapshot
+        return snapshot
+
+    @staticmethod
+    async def _load(db: AsyncSession, version: int) -> RoleSnapshot:
+        roles = await get_roles(db)
+        result = await db.execute(
+            select(Permission.role_id, Permission.action, Permission.resource)
+        )
+        return RoleSnapshot.build(version, roles, result.all())
+
+
+role_catalogue = RoleCatalogue(settings.ROLE_CATALOGUE_CHECK_INTERVAL)
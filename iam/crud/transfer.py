@@ -0,0 +1,188 @@
+"""Bulk transfer of users and roles in and out of the database.
+
+Exports stream rows with a server-side cursor, so memory use does not grow
+with the table. Imports insert one batch per call, skipping rows whose unique
+columns already exist. On PostgreSQL with asyncpg the batch is loaded with
+``COPY`` into a temporary staging table and moved into place with a single
+``INSERT ... SELECT ... ON CONFLICT DO NOTHING``; on other databases it is
+inserted with one ``executemany``. Either way the inserted rows are returned,
+so their cache entries can be rebuilt.
+"""
+
+from typing import AsyncIterator, Sequence
+
+from sqlalchemy import Table, insert, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from iam.models.role import Role
+from iam.models.user import User
+
+USER_COLUMNS = ("username", "email", "role_id")
+ROLE_COLUMNS = ("name",)
+
+
+async def stream_user_rows(
+    db: AsyncSession, batch_size: int = 1000
+) -> AsyncIterator[Row]:
+    """Iterate over every user with its role name, using a server-side cursor.
+
+    Args:
+        db (AsyncSession): The database session.
+        batch_size (int, optional): Rows fetched per round-trip. Defaults to 1000.
+
+    Yields:
+        Row: ``(id, username, email, role_id, role)`` for each user, in ID
+            order, with ``role`` the role's name.
+    """
+    query = (
+        select(
+            User.id, User.username, User.email, User.role_id, Role.name.label("role")
+        )
+        .outerjoin(Role, User.role_id == Role.id)
+        .order_by(User.id)
+        .execution_options(yield_per=batch_size)
+    )
+    async for row in await db.stream(query):
+        yield row
+
+
+async def stream_role_rows(
+    db: AsyncSession, batch_size: int = 1000
+) -> AsyncIterator[Row]:
+    """Iterate over every role, using a server-side cursor.
+
+    Args:
+        db (AsyncSession): The database session.
+        batch_size (int, optional): Rows fetched per round-trip. Defaults to 1000.
+
+    Yields:
+        Row: ``(id, name)`` for each role, in ID order.
+    """
+    query = (
+        select(Role.id, Role.name)
+        .order_by(Role.id)
+        .execution_options(yield_per=batch_size)
+    )
+    async for row in await db.stream(query):
+        yield row
+
+
+async def resolve_role_names(db: AsyncSession, names: set[str]) -> dict[str, int]:
+    """Look up the IDs of roles by name with one query.
+
+    Args:
+        db (AsyncSession): The database session.
+        names (set[str]): The role names.
+
+    Returns:
+        dict[str, int]: The IDs of the roles that exist, by name.
+    """
+    if not names:
+        return {}
+    result = await db.execute(select(Role.name, Role.id).where(Role.name.in_(names)))
+    return dict(result.all())
+
+
+async def resolve_role_ids(db: AsyncSession, role_ids: set[int]) -> dict[int, str]:
+    """Look up the names of roles by ID with one query.
+
+    Args:
+        db (AsyncSession): The database session.
+        role_ids (set[int]): The role IDs.
+
+    Returns:
+        dict[int, str]: The names of the roles that exist, by ID.
+    """
+    if not role_ids:
+        return {}
+    result = await db.execute(select(Role.id, Role.name).where(Role.id.in_(role_ids)))
+    return dict(result.all())
+
+
+async def insert_users(db: AsyncSession, rows: Sequence[tuple]) -> list[Row]:
+    """Insert a batch of users, skipping existing usernames and emails.
+
+    Args:
+        db (AsyncSession): The database session; the caller commits.
+        rows (Sequence[tuple]): ``(username, email, role_id)`` tuples.
+
+    Returns:
+        list[Row]: ``(id, username, email, role_id)`` for each inserted user.
+    """
+    return await bulk_insert(db, User.__table__, USER_COLUMNS, rows)
+
+
+async def insert_roles(db: AsyncSession, rows: Sequence[tuple]) -> list[Row]:
+    """Insert a batch of roles, skipping existing names.
+
+    Args:
+        db (AsyncSession): The database session; the caller commits.
+        rows (Sequence[tuple]): ``(name,)`` tuples.
+
+    Returns:
+        list[Row]: ``(id, name)`` for each inserted role.
+    """
+    return await bulk_insert(db, Role.__table__, ROLE_COLUMNS, rows)
+
+
+async def bulk_insert(
+    db: AsyncSession, table: Table, columns: Sequence[str], rows: Sequence[tuple]
+) -> list[Row]:
+    """Insert rows into a table, skipping rows that violate a unique constraint.
+
+    Args:
+        db (AsyncSession): The database session; the caller commits.
+        table (Table): The table to insert into.
+        columns (Sequence[str]): The columns given for each row.
+        rows (Sequence[tuple]): The rows, as tuples in ``columns`` order.
+
+    Returns:
+        list[Row]: ``(id, *columns)`` for each inserted row.
+    """
+    if not rows:
+        return []
+    dialect = db.bind.dialect
+    if dialect.name == "postgresql" and dialect.driver == "asyncpg":
+        return await _copy_insert(db, table, columns, rows)
+
+    if dialect.name == "postgresql":
+        statement = postgresql.insert(table).on_conflict_do_nothing()
+    elif dialect.name == "sqlite":
+        statement = sqlite.insert(table).on_conflict_do_nothing()
+    else:
+        statement = insert(table)
+    result = await db.execute(
+        statement.returning(table.c.id, *(table.c[column] for column in columns)),
+        [dict(zip(columns, row)) for row in rows],
+    )
+    return result.all()
+
+
+async def _copy_insert(
+    db: AsyncSession, table: Table, columns: Sequence[str], rows: Sequence[tuple]
+) -> list[Row]:
+    # The staging table only has the loaded columns, without constraints, so
+    # COPY never fails on a duplicate; it is dropped when the batch commits.
+    staging = f"import_{table.name}"
+    column_list = ", ".join(columns)
+    await db.execute(
+        text(
+            f"CREATE TEMPORARY TABLE {staging} ON COMMIT DROP AS "
+            f"SELECT {column_list} FROM {table.name} WITH NO DATA"
+        )
+    )
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        staging, records=rows, columns=list(columns)
+    )
+    result = await db.execute(
+        text(
+            f"INSERT INTO {table.name} ({column_list}) "
+            f"SELECT {column_list} FROM {staging} "
+            f"ON CONFLICT DO NOTHING RETURNING id, {column_list}"
+        )
+    )
+    return result.all()
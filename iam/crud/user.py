@@ -2,20 +2,172 @@
 
 This module provides functions for creating and retrieving user records,
 with support for caching and event publishing.
+
+Users are cached whole, role included, as orjson-encoded bytes under
+``user:v{USER_CACHE_VERSION}:{id}``. Bump ``USER_CACHE_VERSION`` whenever the
+cached shape changes: new deployments then read and write fresh keys while the
+old ones expire on their own, with no need to flush Redis.
+
+Lifecycle events are published to the ``user.created``, ``user.updated`` and
+``user.deleted`` queues with a JSON payload holding the user's ID and
+username; the event consumer uses them to warm and invalidate the cache.
+
+Lookups that find no user are cached as missing for
+``settings.CACHE_NEGATIVE_TTL`` seconds. With ``settings.USER_FILTER_ENABLED``
+each worker also holds :data:`user_filter`, a bitmap of the existing user IDs,
+and answers lookups of IDs missing from it without querying Redis or the
+database.
 """
 
+import asyncio
+import logging
+import re
+from collections import Counter
+from typing import AsyncIterator, Iterable, Mapping
+
+import orjson
+from prometheus_client import Counter as MetricCounter
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from iam.models.user import User
-from iam.schemas.user import UserCreate
-from iam.core.cache import get_cache, set_cache
-from iam.core.messaging import publish_event
+from iam.schemas.user import UserCreate, UserUpdate
+from iam.core.bitmap import IdBitmap
+from iam.core.cache import (
+    NEGATIVE_VALUE,
+    delete_cache,
+    delete_many_cache,
+    get_many_cache,
+    get_or_load,
+    open_pubsub,
+    publish,
+    set_cache,
+    set_many_cache,
+    set_negative_cache,
+)
+from iam.core.config import settings
 from iam.core.resilience import resilient
+from iam.crud.outbox import add_event, add_events
+from iam.crud.role import adjust_member_counts, role_catalogue
+from iam.db.session import async_session
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_VERSION = 2
+
+# Server default of ``users.version`` for rows inserted without the ORM.
+NEW_USER_VERSION = 1
+
+_VERSION_PATTERN = re.compile(rb'"version":(\d+)')
+
+USER_FILTER_REJECTIONS = MetricCounter(
+    "user_filter_rejections_total",
+    "User lookups answered as missing by the existence filter",
+)
+
+
+def user_cache_key(user_id: int) -> str:
+    """Build the cache key of a user for the current cache version.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        str: The cache key.
+    """
+    return f"user:v{USER_CACHE_VERSION}:{user_id}"
+
+
+def user_event(user_id: int, username: str) -> str:
+    """Encode the payload of a user lifecycle event.
+
+    Args:
+        user_id (int): The ID of the user.
+        username (str): The user's username.
+
+    Returns:
+        str: The JSON payload.
+    """
+    return orjson.dumps({"user_id": user_id, "username": username}).decode()
+
+
+def user_etag(user_id: int, data: bytes) -> str:
+    """Build the ETag of a user from its cached representation.
+
+    The tag only depends on the cache version, the user's ID and its row
+    version, so it changes whenever the user or its cached shape does. The
+    version is matched in the raw bytes instead of decoding the whole user:
+    quotes inside JSON strings are escaped, so ``"version":`` can only be the
+    key itself.
+
+    Args:
+        user_id (int): The ID of the user.
+        data (bytes): The user encoded by :func:`serialize_user`.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    match = _VERSION_PATTERN.search(data)
+    version = match[1].decode() if match else orjson.loads(data)["version"]
+    return f'"user-{USER_CACHE_VERSION}-{user_id}-{version}"'
+
+
+def _user_cache_ttl() -> int:
+    # Users are fresh for USER_CACHE_TTL seconds, then served stale while
+    # get_or_load refreshes them.
+    return settings.USER_CACHE_TTL + settings.CACHE_STALE_TTL
+
+
+def serialize_user(user: User) -> bytes:
+    """Encode a user, role included, in its cached representation.
+
+    The fields match :class:`iam.schemas.user.User`, so a cache hit can be
+    returned as is without building ORM or Pydantic objects.
+
+    Args:
+        user (User): The user, with its role loaded.
+
+    Returns:
+        bytes: The orjson-encoded user.
+    """
+    return _encode_user(
+        user.id,
+        user.username,
+        user.email,
+        user.role_id,
+        user.version,
+        None if user.role is None else user.role.name,
+    )
+
+
+def _encode_user(
+    user_id: int,
+    username: str,
+    email: str,
+    role_id: int,
+    version: int,
+    role_name: str | None,
+) -> bytes:
+    return orjson.dumps(
+        {
+            "username": username,
+            "email": email,
+            "role_id": role_id,
+            "id": user_id,
+            "version": version,
+            "role": None if role_name is None else {"name": role_name, "id": role_id},
+        }
+    )
 
 
 async def create_user(db: AsyncSession, user: UserCreate) -> User:
     """Create a new user in the database.
 
+    The ``user.created`` event is written to the outbox in the same
+    transaction as the user, and published later by the outbox relay.
+
     Args:
         db (AsyncSession): The database session.
         user (UserCreate): The user data to create.
@@ -25,16 +177,300 @@ async def create_user(db: AsyncSession, user: UserCreate) -> User:
     """
     db_user = User(**user.dict())
     db.add(db_user)
+    await db.flush()
+    add_event(db, "user.created", user_event(db_user.id, db_user.username))
     await db.commit()
     await db.refresh(db_user)
 
-    await publish_event("user.created", f"User {db_user.username} created.")
-    await set_cache(f"user:{db_user.id}", db_user.username)
+    await set_cache(
+        user_cache_key(db_user.id), serialize_user(db_user), _user_cache_ttl()
+    )
+    await adjust_member_counts({db_user.role_id: 1})
+    await announce_users([db_user.id])
 
     return db_user
 
 
-@resilient
+async def update_user(
+    db: AsyncSession, user_id: int, changes: UserUpdate
+) -> User | None:
+    """Update a user's username, email or role.
+
+    The row is locked while it is updated, so concurrent role changes adjust
+    the role member counts exactly once each. The ``user.updated`` event is
+    written to the outbox in the same transaction.
+
+    Args:
+        db (AsyncSession): The database session.
+        user_id (int): The ID of the user to update.
+        changes (UserUpdate): The fields to change; unset fields are kept.
+
+    Returns:
+        User | None: The updated user, or None if the user doesn't exist.
+
+    Raises:
+        IntegrityError: If the new username or email is already taken.
+    """
+    db_user = await db.get(User, user_id, with_for_update=True)
+    if db_user is None:
+        return None
+    old_role_id = db_user.role_id
+    for field, value in changes.model_dump(exclude_none=True).items():
+        setattr(db_user, field, value)
+    add_event(db, "user.updated", user_event(db_user.id, db_user.username))
+    await db.commit()
+    await db.refresh(db_user)
+
+    await set_cache(
+        user_cache_key(db_user.id), serialize_user(db_user), _user_cache_ttl()
+    )
+    if db_user.role_id != old_role_id:
+        await adjust_member_counts({old_role_id: -1, db_user.role_id: 1})
+    return db_user
+
+
+async def create_users(db: AsyncSession, users: list[UserCreate]) -> list[dict]:
+    """Create many users with a single multi-row insert.
+
+    Rows whose username or email already exists, in the database or earlier
+    in ``users``, are skipped instead of aborting the batch, and so are rows
+    referencing a role missing from the role catalogue. The ``user.created``
+    events are written to the outbox in the same transaction, and the created
+    users are cached with one pipeline after the commit.
+
+    The multi-row insert relies on ``ON CONFLICT DO NOTHING``, which only
+    PostgreSQL and SQLite support; other databases insert the rows one by
+    one, each in a savepoint.
+
+    Args:
+        db (AsyncSession): The database session.
+        users (list[UserCreate]): The users to create.
+
+    Returns:
+        list[dict]: One result per input user, in order, with a ``status`` of
+            ``created`` (with the new ``id``), ``conflict`` or ``invalid``
+            (with a ``detail``).
+    """
+    results: list[dict | None] = [None] * len(users)
+    known_roles = await role_catalogue.resolve({user.role_id for user in users}, db)
+
+    pending: dict[str, int] = {}
+    seen_emails: set[str] = set()
+    for index, user in enumerate(users):
+        if user.role_id not in known_roles:
+            results[index] = {"status": "invalid", "detail": "Unknown role_id"}
+        elif user.username in pending or user.email in seen_emails:
+            results[index] = {"status": "conflict"}
+        else:
+            pending[user.username] = index
+            seen_emails.add(user.email)
+
+    created: dict[str, int] = {}
+    if pending:
+        rows = [users[index].dict() for index in pending.values()]
+        created = {
+            username: user_id
+            for user_id, username in await _insert_ignoring_conflicts(db, rows)
+        }
+        await add_events(
+            db,
+            [
+                ("user.created", user_event(user_id, username))
+                for username, user_id in created.items()
+            ],
+        )
+    await db.commit()
+
+    for username, index in pending.items():
+        if username in created:
+            results[index] = {"status": "created", "id": created[username]}
+        else:
+            results[index] = {"status": "conflict"}
+
+    await cache_created_users(
+        [
+            (
+                user_id,
+                username,
+                users[pending[username]].email,
+                users[pending[username]].role_id,
+            )
+            for username, user_id in created.items()
+        ],
+        known_roles,
+    )
+    return results
+
+
+async def cache_created_users(
+    rows: list[tuple[int, str, str, int]],
+    role_names: Mapping[int, str],
+    cache: bool = True,
+):
+    """Cache newly inserted users and account for them in the shared state.
+
+    The users are written to the cache with one pipeline per shard, added
+    to their roles' member counts and announced to the existence filters.
+
+    Args:
+        rows (list[tuple[int, str, str, int]]): ``(id, username, email,
+            role_id)`` of each user inserted.
+        role_names (Mapping[int, str]): Role names by ID, covering every
+            ``role_id`` in ``rows``.
+        cache (bool, optional): Write the users to the cache. Otherwise
+            their keys are deleted instead, so that misses cached before the
+            import don't hide them. The member counts and existence filters
+            are updated either way, since they would otherwise miss the users
+            until they are rebuilt. Defaults to True.
+    """
+    if not rows:
+        return
+    if cache:
+        await set_many_cache(
+            {
+                user_cache_key(user_id): _encode_user(
+                    user_id,
+                    username,
+                    email,
+                    role_id,
+                    NEW_USER_VERSION,
+                    role_names[role_id],
+                )
+                for user_id, username, email, role_id in rows
+            },
+            ttl=_user_cache_ttl(),
+        )
+    else:
+        await delete_many_cache([user_cache_key(user_id) for user_id, *_ in rows])
+    await adjust_member_counts(Counter(role_id for *_, role_id in rows))
+    await announce_users([user_id for user_id, *_ in rows])
+
+
+async def cache_users(db: AsyncSession, user_ids: list[int]):
+    """Reload users from the database and overwrite their cache entries.
+
+    Users that no longer exist are removed from the cache instead.
+
+    Args:
+        db (AsyncSession): The database session.
+        user_ids (list[int]): The IDs of the users to reload.
+    """
+    result = await db.execute(select(User).where(User.id.in_(user_ids)))
+    loaded = {user.id: serialize_user(user) for user in result.scalars()}
+    await set_many_cache(
+        {user_cache_key(user_id): data for user_id, data in loaded.items()},
+        ttl=_user_cache_ttl(),
+    )
+    await evict_users([user_id for user_id in user_ids if user_id not in loaded])
+
+
+async def evict_users(user_ids: list[int]):
+    """Remove users from Redis and from every worker's L1 cache.
+
+    Args:
+        user_ids (list[int]): The IDs of the users to remove.
+    """
+    for user_id in user_ids:
+        await delete_cache(user_cache_key(user_id))
+
+
+async def _insert_ignoring_conflicts(
+    db: AsyncSession, rows: list[dict]
+) -> list[tuple[int, str]]:
+    # PostgreSQL and SQLite skip conflicting rows within one multi-row insert.
+    # Other databases have no portable equivalent, so there each row is
+    # inserted in its own savepoint and a duplicate only rolls back that row.
+    dialect = db.bind.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        result = await db.execute(
+            dialect_insert(User)
+            .on_conflict_do_nothing()
+            .values(rows)
+            .returning(User.id, User.username)
+        )
+        return result.all()
+    return await _insert_rows_one_by_one(db, rows)
+
+
+async def _insert_rows_one_by_one(
+    db: AsyncSession, rows: list[dict]
+) -> list[tuple[int, str]]:
+    inserted = []
+    for row in rows:
+        try:
+            async with db.begin_nested():
+                result = await db.execute(insert(User).values(row))
+        except IntegrityError:
+            continue
+        inserted.append((result.inserted_primary_key[0], row["username"]))
+    return inserted
+
+
+async def list_users(db: AsyncSession, after_id: int | None, limit: int) -> list[User]:
+    """Retrieve a page of users in ID order.
+
+    Args:
+        db (AsyncSession): The database session.
+        after_id (int | None): Only return users with a greater ID (keyset
+            pagination), or None for the first page.
+        limit (int): The maximum number of users to return.
+
+    Returns:
+        list[User]: The users on the page.
+    """
+    query = select(User).order_by(User.id).limit(limit)
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+async def list_role_members(
+    db: AsyncSession, role_id: int, after_id: int | None, limit: int
+) -> list[User]:
+    """Retrieve a page of the users in a role, in ID order.
+
+    The query is served by the ``(role_id, id)`` index.
+
+    Args:
+        db (AsyncSession): The database session.
+        role_id (int): The role whose members are listed.
+        after_id (int | None): Only return users with a greater ID (keyset
+            pagination), or None for the first page.
+        limit (int): The maximum number of users to return.
+
+    Returns:
+        list[User]: The users on the page.
+    """
+    query = select(User).where(User.role_id == role_id).order_by(User.id).limit(limit)
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+async def stream_users(db: AsyncSession, batch_size: int = 1000) -> AsyncIterator[User]:
+    """Iterate over every user with a server-side cursor.
+
+    Args:
+        db (AsyncSession): The database session.
+        batch_size (int, optional): Rows fetched per round-trip. Defaults to 1000.
+
+    Yields:
+        User: Each user, with its role, in ID order.
+    """
+    query = select(User).order_by(User.id).execution_options(yield_per=batch_size)
+    async for user in await db.stream_scalars(query):
+        yield user
+
+
+async def _load_user(db: AsyncSession, user_id: int) -> bytes | None:
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
+    return None if user is None else serialize_user(user)
+
+
 async def get_user(db: AsyncSession, user_id: int) -> dict | None:
     """Retrieve a user by their ID from the database or cache.
 
@@ -43,19 +479,214 @@ async def get_user(db: AsyncSession, user_id: int) -> dict | None:
         user_id (int): The ID of the user to retrieve.
 
     Returns:
-        dict | None: A dictionary containing the user's ID and username if found,
-                    None if the user doesn't exist.
+        dict | None: The user with its role, shaped like
+                    :class:`iam.schemas.user.User`, or None if the user
+                    doesn't exist.
     """
-    cache_key = f"user:{user_id}"
-    cached = await get_cache(cache_key)
-    if cached:
-        return {"id": user_id, "username": cached}
+    data = await get_user_json(db, user_id)
+    return None if data is None else orjson.loads(data)
 
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
 
-    if user:
-        await set_cache(cache_key, user.username)
-        return {"id": user.id, "username": user.username}
+async def get_user_json(db: AsyncSession, user_id: int) -> bytes | None:
+    """Retrieve a user's cached JSON encoding, loading it on a miss.
+
+    IDs rejected by :data:`user_filter` are answered straight away. Concurrent
+    cache misses for the same user are coalesced into a single query.
+    Background refreshes for stale entries use their own session, since the
+    request's session may be closed by the time they run.
+
+    Args:
+        db (AsyncSession): The database session.
+        user_id (int): The ID of the user to retrieve.
+
+    Returns:
+        bytes | None: The user encoded by :func:`serialize_user`, exactly as
+            cached, or None if the user doesn't exist.
+    """
+    if user_filter is not None and not user_filter.might_exist(user_id):
+        USER_FILTER_REJECTIONS.inc()
+        return None
+    return await _get_user_json(db, user_id)
+
+
+@resilient(dependency="db")
+async def _get_user_json(db: AsyncSession, user_id: int) -> bytes | None:
+    async def load():
+        return await _load_user(db, user_id)
+
+    async def refresh():
+        async with async_session() as session:
+            return await _load_user(session, user_id)
+
+    return await get_or_load(
+        user_cache_key(user_id), load, settings.USER_CACHE_TTL, refresher=refresh
+    )
+
+
+async def get_users(db: AsyncSession, user_ids: list[int]) -> list[dict | None]:
+    """Retrieve several users by ID from the cache and the database.
+
+    Args:
+        db (AsyncSession): The database session.
+        user_ids (list[int]): The IDs of the users to retrieve.
+
+    Returns:
+        list[dict | None]: The users in the order of ``user_ids``, each shaped
+            like :class:`iam.schemas.user.User`, or None where a user doesn't
+            exist.
+    """
+    return [
+        None if data is None else orjson.loads(data)
+        for data in await get_users_json(db, user_ids)
+    ]
+
+
+async def get_users_json(db: AsyncSession, user_ids: list[int]) -> list[bytes | None]:
+    """Retrieve several users' cached JSON encodings by ID.
+
+    IDs rejected by :data:`user_filter` are skipped. The others are looked up
+    with one cache round-trip; the misses are loaded with a single ``IN``
+    query and written back to the cache in one pipeline, and the IDs the
+    query didn't find are cached as missing.
+
+    Args:
+        db (AsyncSession): The database session.
+        user_ids (list[int]): The IDs of the users to retrieve.
+
+    Returns:
+        list[bytes | None]: The users in the order of ``user_ids``, each
+            encoded by :func:`serialize_user`, or None where a user doesn't
+            exist.
+    """
+    candidates = user_ids
+    if user_filter is not None:
+        candidates = [
+            user_id for user_id in user_ids if user_filter.might_exist(user_id)
+        ]
+        USER_FILTER_REJECTIONS.inc(len(user_ids) - len(candidates))
+    found = await _get_users_json(db, candidates) if candidates else {}
+    return [found.get(user_id) for user_id in user_ids]
+
+
+@resilient(dependency="db")
+async def _get_users_json(db: AsyncSession, user_ids: list[int]) -> dict[int, bytes]:
+    cached = await get_many_cache([user_cache_key(user_id) for user_id in user_ids])
+    found = {}
+    missing = set()
+    for user_id, value in zip(user_ids, cached):
+        if value is None:
+            missing.add(user_id)
+        elif value != NEGATIVE_VALUE:
+            found[user_id] = value
+
+    if missing:
+        result = await db.execute(select(User).where(User.id.in_(missing)))
+        loaded = {user.id: serialize_user(user) for user in result.scalars()}
+        await set_many_cache(
+            {user_cache_key(user_id): data for user_id, data in loaded.items()},
+            ttl=_user_cache_ttl(),
+        )
+        await set_negative_cache(
+            [user_cache_key(user_id) for user_id in missing if user_id not in loaded]
+        )
+        found.update(loaded)
+    return found
+
+
+async def announce_users(user_ids: list[int]):
+    """Add newly created users to the existence filter of every worker.
+
+    Args:
+        user_ids (list[int]): The IDs of the users created.
+    """
+    if user_filter is None or not user_ids:
+        return
+    user_filter.add(user_ids)
+    await publish(settings.USER_FILTER_CHANNEL, " ".join(map(str, user_ids)))
+
+
+class UserIdFilter:
+    """Per-worker bitmap of existing user IDs, rejecting unknown IDs.
+
+    The bitmap is rebuilt from the database each time the subscription to
+    ``channel`` is established, and IDs announced on the channel by
+    :func:`announce_users` are added as they arrive. Until the first rebuild
+    completes, and whenever the subscription is lost, every ID passes. IDs
+    above the largest known one pass too, since they may belong to a user
+    created moments ago whose announcement hasn't arrived yet; the negative
+    cache absorbs repeated lookups of those. Deleted users keep their bit,
+    which only lets their lookups through to the cache.
+    """
+
+    def __init__(self, channel: str, batch_size: int = 10000):
+        self.channel = channel
+        self.batch_size = batch_size
+        self._bitmap: IdBitmap | None = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether the filter holds a complete set of IDs."""
+        return self._bitmap is not None
+
+    def might_exist(self, user_id: int) -> bool:
+        """Whether a user with this ID may exist.
+
+        Args:
+            user_id (int): The ID to check.
+
+        Returns:
+            bool: False only if the user certainly doesn't exist.
+        """
+        bitmap = self._bitmap
+        return bitmap is None or user_id > bitmap.max_id or user_id in bitmap
+
+    def add(self, user_ids: Iterable[int]):
+        """Record users that exist.
+
+        Args:
+            user_ids (Iterable[int]): The IDs of the users.
+        """
+        bitmap = self._bitmap
+        if bitmap is not None:
+            for user_id in user_ids:
+                bitmap.add(user_id)
+
+    async def rebuild(self, db: AsyncSession):
+        """Replace the bitmap with every user ID in the database.
+
+        Args:
+            db (AsyncSession): The database session.
+        """
+        bitmap = IdBitmap()
+        query = select(User.id).execution_options(yield_per=self.batch_size)
+        async for user_id in await db.stream_scalars(query):
+            bitmap.add(user_id)
+        self._bitmap = bitmap
+
+    async def run(self):
+        """Keep the filter up to date until cancelled.
+
+        The channel is subscribed to before the rebuild, so IDs announced
+        while it runs are applied once it is done.
+        """
+        while True:
+            pubsub = open_pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async with async_session() as session:
+                    await self.rebuild(session)
+                async for message in pubsub.listen():
+                    self.add(map(int, message["data"].split()))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("User filter subscription lost", exc_info=True)
+                self._bitmap = None
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
 
-    return None
+user_filter = (
+    UserIdFilter(settings.USER_FILTER_CHANNEL) if settings.USER_FILTER_ENABLED else None
+)
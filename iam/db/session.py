@@ -3,22 +3,398 @@
 This module provides functionality for creating and managing async SQLAlchemy
 database sessions. It includes the engine configuration and session factory
 setup for async database operations.
+
+The engine is configured from the ``DB_*`` settings: pool sizing, pre-ping and
+recycling, connect and statement timeouts, the asyncpg prepared statement
+cache and SQL logging. Pooled engines record how long each checkout waits for
+a free connection, and every engine records the latency of each statement by
+database and operation.
+
+When ``settings.DATABASE_REPLICA_URLS`` is set, read-only sessions from
+:func:`get_read_session` are routed to a replica. Replicas that fail are
+skipped for a while, reads fall back to the primary when none is healthy, and
+a client that has just written is pinned to the primary for a short window so
+it always reads its own writes.
+
+Engines are created per process by :func:`init_engines`, called from the
+application lifespan or a worker's entry point, and closed with
+:func:`dispose_engines`.
 """
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+import asyncio
+import itertools
+import math
+import time
+
+from fastapi import Request, Response
+from prometheus_client import Counter, Histogram
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from iam.core.config import settings
 
-engine = create_async_engine(settings.DATABASE_URL, echo=True)
-async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up waiting for a free connection",
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Statement execution time",
+    ["database", "operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+DB_QUERY_ERRORS = Counter(
+    "db_query_errors_total", "Statements that raised an error", ["database"]
+)
+DB_READ_ROUTES = Counter(
+    "db_read_sessions_total", "Read-only sessions by target", ["target"]
+)
+
+_OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE"})
+
+READ_YOUR_WRITES_COOKIE = "iam_primary_until"
+# Session info key holding when a committed session's client may read
+# from replicas again.
+PRIMARY_UNTIL = "primary_until"
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long checkouts wait for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            DB_POOL_CHECKOUT_TIMEOUTS.inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+
+def instrument_engine(engine: AsyncEngine, database: str) -> AsyncEngine:
+    """Record the latency and errors of every statement run by an engine.
+
+    Args:
+        engine (AsyncEngine): The engine to instrument
+        database (str): The ``database`` label, such as "primary"
+
+    Returns:
+        AsyncEngine: The same engine
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        context.query_started_at = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        operation = statement.lstrip()[:6].upper()
+        DB_QUERY_DURATION.labels(
+            database, operation if operation in _OPERATIONS else "OTHER"
+        ).observe(time.perf_counter() - context.query_started_at)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _error(exception_context):
+        DB_QUERY_ERRORS.labels(database).inc()
+
+    return engine
+
+
+def engine_options(url: str) -> dict:
+    """Build the ``create_async_engine`` keyword arguments for a database URL.
+
+    SQLite keeps SQLAlchemy's default pool; other backends get a sized,
+    instrumented queue pool, and asyncpg additionally gets its timeouts,
+    statement cache size and server settings.
+
+    Args:
+        url (str): The database URL
+
+    Returns:
+        dict: Keyword arguments for ``create_async_engine``
+    """
+    options = {"echo": settings.DB_ECHO, "echo_pool": settings.DB_ECHO_POOL}
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        return options
+
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    if parsed.get_driver_name() == "asyncpg":
+        options["connect_args"] = {
+            "timeout": settings.DB_CONNECT_TIMEOUT,
+            "command_timeout": settings.DB_STATEMENT_TIMEOUT,
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "server_settings": {
+                "jit": "on" if settings.DB_JIT else "off",
+                "statement_timeout": str(int(settings.DB_STATEMENT_TIMEOUT * 1000)),
+            },
+        }
+    return options
+
+
+class ReplicaRouter:
+    """Choose a healthy read replica for each read-only session.
+
+    Replicas are picked round-robin or by fewest checked-out connections. A
+    replica that fails with a connection error is skipped for
+    ``retry_interval`` seconds.
+    """
+
+    def __init__(
+        self, engines: list[AsyncEngine], strategy: str, retry_interval: float
+    ):
+        self.engines = engines
+        self.strategy = strategy
+        self.retry_interval = retry_interval
+        self._sessionmakers = [
+            sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+            for engine in engines
+        ]
+        self._unhealthy_until = [0.0] * len(engines)
+        self._turn = itertools.count()
+
+    def choose(self) -> int | None:
+        """Pick a replica for the next session.
+
+        Returns:
+            int | None: The replica index, or None if no replica is healthy
+        """
+        now = time.monotonic()
+        healthy = [i for i, until in enumerate(self._unhealthy_until) if until <= now]
+        if not healthy:
+            return None
+        if self.strategy == "least_loaded":
+            return min(healthy, key=lambda i: self.engines[i].pool.checkedout())
+        return healthy[next(self._turn) % len(healthy)]
+
+    def sessionmaker(self, index: int) -> sessionmaker:
+        """Return the session factory for a replica.
+
+        Args:
+            index (int): The replica index returned by :meth:`choose`
+
+        Returns:
+            sessionmaker: A factory for sessions bound to the replica
+        """
+        return self._sessionmakers[index]
+
+    def mark_unhealthy(self, index: int):
+        """Stop routing to a replica for the retry interval.
+
+        Args:
+            index (int): The replica index
+        """
+        self._unhealthy_until[index] = time.monotonic() + self.retry_interval
+
+
+engine: AsyncEngine | None = None
+async_session = sessionmaker(class_=AsyncSession, expire_on_commit=False)
+replica_router: ReplicaRouter | None = None
 
 
-async def get_session() -> AsyncSession:
+def init_engines():
+    """Create the primary and replica engines for the current process.
+
+    Engines are created by the application lifespan, or by the entry point of
+    a worker process, rather than at import, so every server process owns its
+    connection pools. :data:`async_session` is bound to the primary engine.
+    Calling this again while the engines exist is a no-op.
+    """
+    global engine, replica_router
+    if engine is not None:
+        return
+    engine = instrument_engine(
+        create_async_engine(
+            settings.DATABASE_URL, **engine_options(settings.DATABASE_URL)
+        ),
+        "primary",
+    )
+    async_session.configure(bind=engine)
+    if settings.DATABASE_REPLICA_URLS:
+        replica_router = ReplicaRouter(
+            [
+                instrument_engine(
+                    create_async_engine(url, **engine_options(url)), f"replica{index}"
+                )
+                for index, url in enumerate(settings.DATABASE_REPLICA_URLS)
+            ],
+            settings.DB_REPLICA_STRATEGY,
+            settings.DB_REPLICA_RETRY_INTERVAL,
+        )
+
+
+async def warm_up_engines(connections: int):
+    """Open pooled connections ahead of the first requests.
+
+    Args:
+        connections (int): Connections to open on each engine; they are
+            returned to the pool once they have run a trivial query
+    """
+    engines = [engine, *(replica_router.engines if replica_router else [])]
+
+    async def ping(target: AsyncEngine):
+        async with target.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(
+        *(ping(target) for target in engines for _ in range(max(1, connections)))
+    )
+
+
+async def dispose_engines():
+    """Close every pooled connection and forget the engines."""
+    global engine, replica_router
+    if replica_router is not None:
+        for replica in replica_router.engines:
+            await replica.dispose()
+    if engine is not None:
+        await engine.dispose()
+    engine = replica_router = None
+    async_session.configure(bind=None)
+
+
+@event.listens_for(Session, "after_commit")
+def _pin_reads_to_primary(session: Session):
+    """Send the client's reads to the primary for a while after it writes."""
+    response = session.info.pop("response", None)
+    if response is None or replica_router is None:
+        return
+    session.info[PRIMARY_UNTIL] = time.time() + settings.DB_READ_YOUR_WRITES_WINDOW
+    _set_read_your_writes_cookie(response, session.info[PRIMARY_UNTIL])
+
+
+def _set_read_your_writes_cookie(response: Response, until: float):
+    response.set_cookie(
+        READ_YOUR_WRITES_COOKIE,
+        f"{until:.3f}",
+        max_age=math.ceil(settings.DB_READ_YOUR_WRITES_WINDOW),
+        httponly=True,
+    )
+
+
+def send_session_cookies(db: AsyncSession, response: Response) -> Response:
+    """Set the read-your-writes cookie of a session's commits on a response.
+
+    FastAPI only sends the cookies set on the ``Response`` dependency of
+    :func:`get_session` when it renders the endpoint's return value itself.
+    Endpoints that return a response object pass it through here instead.
+
+    Args:
+        db (AsyncSession): The session from :func:`get_session`
+        response (Response): The response the endpoint returns
+
+    Returns:
+        Response: ``response``, with the cookie if the session committed
+    """
+    until = db.info.get(PRIMARY_UNTIL)
+    if until is not None:
+        _set_read_your_writes_cookie(response, until)
+    return response
+
+
+async def get_session(response: Response) -> AsyncSession:
     """Get a new database session.
 
+    The time the session waits for a pooled connection is recorded in the
+    ``db_pool_checkout_wait_seconds`` histogram when it first runs a query.
+    When replicas are configured, committing through this session pins the
+    client's reads to the primary for ``settings.DB_READ_YOUR_WRITES_WINDOW``
+    seconds.
+
+    Args:
+        response (Response): The response, used to set the pinning cookie
+
     Returns:
         AsyncSession: An async SQLAlchemy session instance that can be used
         for database operations.
     """
     async with async_session() as session:
+        session.info["response"] = response
         yield session
+
+
+def read_sessionmaker(request: Request) -> tuple[sessionmaker, int | None]:
+    """Choose where a read-only request should run its queries.
+
+    Args:
+        request (Request): The incoming request
+
+    Returns:
+        tuple[sessionmaker, int | None]: The session factory, and the replica
+        index or None when the primary was chosen
+    """
+    if replica_router is None:
+        return async_session, None
+    try:
+        pinned = float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time()
+    except ValueError:
+        pinned = False
+    index = None if pinned else replica_router.choose()
+    DB_READ_ROUTES.labels("primary" if index is None else f"replica{index}").inc()
+    if index is None:
+        return async_session, None
+    return replica_router.sessionmaker(index), index
+
+
+async def get_read_session(request: Request) -> AsyncSession:
+    """Get a database session for read-only work.
+
+    The session is bound to a read replica when one is configured and
+    healthy, and to the primary otherwise. A connection failure on a replica
+    takes it out of rotation for ``settings.DB_REPLICA_RETRY_INTERVAL``
+    seconds. The replica connection is checked out before the session is
+    handed over, so a replica that can't be reached costs no request: the
+    session is opened on the primary instead. Only a replica failing in the
+    middle of a request fails that request.
+
+    Args:
+        request (Request): The incoming request, checked for the
+            read-your-writes cookie
+
+    Returns:
+        AsyncSession: A session that must only be used for reads.
+    """
+    factory, index = read_sessionmaker(request)
+    session = factory()
+    if index is not None:
+        try:
+            await session.connection()
+        except (DBAPIError, OSError) as exc:
+            await session.close()
+            if not _is_connection_error(exc):
+                raise
+            replica_router.mark_unhealthy(index)
+            DB_READ_ROUTES.labels("primary").inc()
+            session, index = async_session(), None
+    async with session:
+        try:
+            yield session
+        except (DBAPIError, OSError) as exc:
+            if index is not None and _is_connection_error(exc):
+                replica_router.mark_unhealthy(index)
+            raise
+
+
+def _is_connection_error(exc: Exception) -> bool:
+    if isinstance(exc, DBAPIError):
+        return exc.connection_invalidated or isinstance(
+            exc.orig, (OSError, ConnectionError)
+        )
+    return True
@@ -1,41 +1,115 @@
 """FastAPI application for Identity and Access Management (IAM).
 
 This module implements a REST API service for managing users and roles,
-with middleware for request tracking and Prometheus metrics collection.
+with a pure-ASGI middleware for request metrics, deadlines and request IDs,
+and Prometheus metrics collection.
+Responses are rendered with orjson by default.
+
+Database engines, the Redis client and the broker connection are created by
+the lifespan of each server process, and ``/ready`` only succeeds once that
+process has warmed them up. When ``PROMETHEUS_MULTIPROC_DIR`` is set,
+``/metrics`` aggregates the metrics of every worker process.
 """
 
-import time
-from fastapi import FastAPI, status
-from fastapi.responses import Response
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, Counter, Histogram
-from iam.api.v1.endpoints import role, user
-
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, status
+from fastapi.responses import ORJSONResponse, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
+from iam.api.v1.endpoints import authorize, role, user
+from iam.core.cache import close_redis, listen_for_invalidations, open_redis, ping_redis
+from iam.core.config import settings
+from iam.core.messaging import publisher
+from iam.core.middleware import RequestInstrumentationMiddleware
+from iam.core.ratelimit import enforce_rate_limit
+from iam.crud.role import role_catalogue
+from iam.crud.user import user_filter
+from iam.db.session import dispose_engines, init_engines, warm_up_engines
+
+logger = logging.getLogger(__name__)
 
 API_VERSION = "v1"
 
-app = FastAPI()
-
-app.include_router(role.router, prefix=f"/api/{API_VERSION}/roles", tags=["Roles"])
-app.include_router(user.router, prefix=f"/api/{API_VERSION}/users", tags=["Users"])
-
-REQUEST_COUNT = Counter("request_count", "Total HTTP requests")
-REQUEST_TIME = Histogram("request_time_seconds", "Tempo de requisição")
 
+async def warm_up(app: FastAPI):
+    """Open connections and load the role catalogue, then mark the app ready.
 
-@app.middleware("http")
-async def count_requests(request, call_next):
-    """Middleware to count total HTTP requests using Prometheus Counter.
+    The database is required: warm-up is retried every
+    ``settings.WARMUP_RETRY_INTERVAL`` seconds until it is reachable. Redis
+    and the broker are not, since the cache degrades to misses and the
+    publisher connects lazily on the next publish.
 
     Args:
-        request: The incoming HTTP request
-        call_next: The next middleware or route handler in the chain
+        app (FastAPI): The application being warmed up
+    """
+    while True:
+        try:
+            await warm_up_engines(settings.DB_POOL_WARMUP)
+            await role_catalogue.get()
+            break
+        except Exception:
+            logger.warning("Database warm-up failed, retrying", exc_info=True)
+            await asyncio.sleep(settings.WARMUP_RETRY_INTERVAL)
+    if not await ping_redis():
+        logger.warning("Redis unavailable at startup")
+    try:
+        await publisher.start()
+    except Exception:
+        logger.warning("Event publisher unavailable at startup", exc_info=True)
+    app.state.ready = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open long-lived resources on startup and release them on shutdown.
+
+    Each server process creates its own database engines and Redis client and
+    warms them up in the background; ``/ready`` reports 503 until the warm-up
+    is done. The L1 cache invalidation listener and, when enabled, the user
+    existence filter run for the lifetime of the worker, and are stopped
+    before the connections they use are closed.
 
-    Returns:
-        response: The HTTP response from subsequent handlers
+    Args:
+        app (FastAPI): The application being started
     """
-    REQUEST_COUNT.inc()
-    response = await call_next(request)
-    return response
+    app.state.ready = False
+    init_engines()
+    open_redis()
+    warming = asyncio.create_task(warm_up(app))
+    invalidations = asyncio.create_task(listen_for_invalidations())
+    filtering = None if user_filter is None else asyncio.create_task(user_filter.run())
+    yield
+    app.state.ready = False
+    tasks = [warming, invalidations, *([filtering] if filtering else [])]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await publisher.close()
+    await close_redis()
+    await dispose_engines()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+    dependencies=[Depends(enforce_rate_limit)],
+)
+
+app.add_middleware(RequestInstrumentationMiddleware)
+app.include_router(role.router, prefix=f"/api/{API_VERSION}/roles", tags=["Roles"])
+app.include_router(user.router, prefix=f"/api/{API_VERSION}/users", tags=["Users"])
+app.include_router(
+    authorize.router, prefix=f"/api/{API_VERSION}/authorize", tags=["Authorization"]
+)
 
 
 @app.get("/metrics")
@@ -45,6 +119,10 @@ def metrics():
     Returns:
         Response: FastAPI Response object containing Prometheus metrics in text format
     """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
@@ -58,18 +136,15 @@ async def health_check():
     return {"status": "healthy"}
 
 
-@app.middleware("http")
-async def track_request_time(request, call_next):
-    """Middleware to track HTTP request processing time using Prometheus Histogram.
-
-    Args:
-        request: The incoming HTTP request
-        call_next: The next middleware or route handler in the chain
+@app.get("/ready", status_code=status.HTTP_200_OK)
+async def readiness_check():
+    """Check whether this process has finished warming up.
 
     Returns:
-        response: The HTTP response from subsequent handlers
+        dict: The readiness status, with a 503 status code while warming up
     """
-    start_time = time.time()
-    response = await call_next(request)
-    REQUEST_TIME.observe(time.time() - start_time)
-    return response
+    if not getattr(app.state, "ready", False):
+        return ORJSONResponse(
+            {"status": "warming_up"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    return {"status": "ready"}
@@ -0,0 +1,31 @@
+"""Outbox model module for the IAM system.
+
+This module contains the SQLAlchemy OutboxEvent model which stores events that
+must be published to the message broker. Rows are written in the same
+transaction as the change they describe and removed once published.
+"""
+
+from datetime import datetime
+from sqlalchemy import DateTime, String, Text, func
+from sqlalchemy.orm import Mapped, mapped_column
+from iam.db.base import Base
+
+
+class OutboxEvent(Base):
+    """Outbox model representing an event waiting to be published.
+
+    Attributes:
+        id (int): Monotonic identifier, also used as the publish order
+        queue (str): The queue the event is published to
+        payload (str): The message body
+        created_at (datetime): When the event was recorded
+    """
+
+    __tablename__ = "outbox"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    queue: Mapped[str] = mapped_column(String(100))
+    payload: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
@@ -0,0 +1,29 @@
+"""Permission model module for the IAM system.
+
+This module contains the SQLAlchemy Permission model, which grants a role an
+action on a resource. A ``*`` in either column matches any action or resource.
+"""
+
+from sqlalchemy import ForeignKey, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from iam.db.base import Base
+
+
+class Permission(Base):
+    """Permission model representing an action a role may take on a resource.
+
+    Attributes:
+        id (int): The unique identifier for the permission
+        role_id (int): The role the permission is granted to
+        action (str): The action, such as "read", or ``*`` for any action
+        resource (str): The resource, such as "invoices", or ``*`` for any
+            resource
+    """
+
+    __tablename__ = "permissions"
+    __table_args__ = (UniqueConstraint("role_id", "action", "resource"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    role_id: Mapped[int] = mapped_column(ForeignKey("roles.id", ondelete="CASCADE"))
+    action: Mapped[str] = mapped_column(String(100))
+    resource: Mapped[str] = mapped_column(String(200))
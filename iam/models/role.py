@@ -4,7 +4,7 @@ This module contains the Role model class which represents user roles
 in the system's database schema using SQLAlchemy ORM.
 """
 
-from sqlalchemy import String
+from sqlalchemy import String, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from iam.db.base import Base
 
@@ -19,6 +19,7 @@ class Role(Base):
     Attributes:
         id (int): The unique identifier for the role
         name (str): The unique name of the role
+        version (int): Row version, incremented by every ORM update
         users (relationship): Relationship to associated User objects
     """
 
@@ -26,5 +27,8 @@ class Role(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(50), unique=True)
+    version: Mapped[int] = mapped_column(server_default=text("1"))
 
     users = relationship("User", back_populates="role")
+
+    __mapper_args__ = {"version_id_col": version}
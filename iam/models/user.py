@@ -4,7 +4,7 @@ This module contains the SQLAlchemy User model class which defines the database
 schema for storing user information and their role associations.
 """
 
-from sqlalchemy import ForeignKey, String
+from sqlalchemy import ForeignKey, Index, String, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from iam.db.base import Base
 
@@ -13,14 +13,23 @@ class User(Base):
     """User model representing a user in the system.
 
     This class defines the database schema for storing user information including
-    username, email and role associations.
+    username, email and role associations. Role membership is indexed on
+    ``(role_id, id)``, which serves both "users in role X" and keyset
+    pagination of those users by ID.
+
+    ``version`` starts at 1 and is incremented by every ORM update; it backs
+    the user's ETag.
     """
 
     __tablename__ = "users"
+    __table_args__ = (Index("ix_users_role_id", "role_id", "id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     username: Mapped[str] = mapped_column(String(50), unique=True)
     email: Mapped[str] = mapped_column(String(100), unique=True)
     role_id: Mapped[int] = mapped_column(ForeignKey("roles.id"))
+    version: Mapped[int] = mapped_column(server_default=text("1"))
 
     role = relationship("Role", lazy="joined", back_populates="users")
+
+    __mapper_args__ = {"version_id_col": version}
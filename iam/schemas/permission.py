@@ -0,0 +1,49 @@
+"""Permission and authorization schema models for the IAM system.
+
+This module defines the Pydantic models for granting permissions to roles and
+for asking whether a user may take an action on a resource.
+"""
+
+from pydantic import BaseModel, Field
+
+
+class PermissionBase(BaseModel):
+    """Base schema model for permissions.
+
+    ``*`` as the action or the resource matches any action or resource.
+    """
+
+    action: str = Field(min_length=1, max_length=100)
+    resource: str = Field(min_length=1, max_length=200)
+
+
+class PermissionCreate(PermissionBase):
+    """Schema model for granting a permission to a role."""
+
+    pass
+
+
+class Permission(PermissionBase):
+    """Schema model for a permission granted to a role."""
+
+    id: int
+    role_id: int
+
+    class Config:
+        """Configuration class for Pydantic model to enable ORM mode."""
+
+        from_attributes = True
+
+
+class AuthorizationCheck(BaseModel):
+    """Schema model asking whether a user may take an action on a resource."""
+
+    user_id: int
+    action: str
+    resource: str
+
+
+class AuthorizationBatch(BaseModel):
+    """Schema model for several authorization checks in one request."""
+
+    checks: list[AuthorizationCheck] = Field(min_length=1)
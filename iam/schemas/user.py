@@ -5,7 +5,7 @@ It includes models for basic user information, user creation, and database repre
 """
 
 from typing import Optional
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from iam.schemas.role import Role
 
 
@@ -23,13 +23,28 @@ class UserCreate(UserBase):
     pass
 
 
+class UserUpdate(BaseModel):
+    """Schema model for updating a user; fields left out are not changed."""
+
+    username: Optional[str] = None
+    email: Optional[EmailStr] = None
+    role_id: Optional[int] = None
+
+
 class User(UserBase):
     """User schema model that inherits from UserBase and includes additional fields for database representation."""
 
     id: int
+    version: int
     role: Optional[Role]
 
     class Config:
         """Configuration class for Pydantic model to enable ORM mode."""
 
         from_attributes = True
+
+
+class UserLookup(BaseModel):
+    """Schema model for looking up several users by ID in one request."""
+
+    ids: list[int] = Field(min_length=1)
@@ -0,0 +1,68 @@
+"""Production server entry point.
+
+Runs the application under uvicorn with ``settings.SERVER_WORKERS`` worker
+processes (0 means one per CPU)::
+
+    python -m iam.server
+
+Each worker creates its own database engines, Redis client and broker
+connection in the application lifespan. With more than one worker, Prometheus
+multiprocess mode is enabled so ``/metrics`` reports the metrics of every
+worker, whichever one serves the scrape: ``PROMETHEUS_MULTIPROC_DIR`` is used
+when set, and a fresh temporary directory otherwise.
+"""
+
+import glob
+import os
+import tempfile
+
+import uvicorn
+from iam.core.config import settings
+
+
+def worker_count() -> int:
+    """Number of worker processes to run.
+
+    Returns:
+        int: ``settings.SERVER_WORKERS``, or the CPU count when it is 0
+    """
+    return settings.SERVER_WORKERS or os.cpu_count() or 1
+
+
+def prepare_multiprocess_metrics(workers: int):
+    """Set up Prometheus multiprocess mode before the workers start.
+
+    Metric files left by a previous run are removed, since their counters
+    would otherwise be added to the new ones.
+
+    Args:
+        workers (int): Number of worker processes
+    """
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory is None:
+        if workers == 1:
+            return
+        directory = tempfile.mkdtemp(prefix="iam-metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = directory
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.db")):
+        os.remove(path)
+
+
+def main():
+    """Start the server."""
+    workers = worker_count()
+    prepare_multiprocess_metrics(workers)
+    uvicorn.run(
+        "iam.main:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=workers,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_SHUTDOWN_TIMEOUT,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.FORWARDED_ALLOW_IPS,
+    )
+
+
+if __name__ == "__main__":
+    main()
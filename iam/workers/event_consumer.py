@@ -0,0 +1,345 @@
+"""Event consumer worker.
+
+This module consumes user lifecycle events from RabbitMQ and keeps the user
+cache in step with them across the fleet. It runs as a separate process::
+
+    python -m iam.workers.event_consumer
+
+``user.created`` events warm the cache entries that are missing,
+``user.updated`` events reload and overwrite them and ``user.deleted`` events
+remove them. Overwrites and removals are broadcast to the L1 caches of every
+API worker.
+
+Each queue is consumed on its own channel with a prefetch of
+``settings.EVENT_CONSUMER_PREFETCH``. Deliveries are handled in batches by
+``settings.EVENT_CONSUMER_CONCURRENCY`` concurrent handlers, and acknowledged
+in batches once every earlier delivery on the channel is settled. A batch that
+fails is republished to a delay queue that dead-letters it back after an
+exponential backoff. Once ``settings.EVENT_CONSUMER_MAX_RETRIES`` retries
+have failed, or if the payload can't be parsed, the message goes to the
+``<queue>.dead`` queue. Delivery is at-least-once and every handler is
+idempotent.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, defaultdict
+from typing import Awaitable, Callable
+
+import aio_pika
+import orjson
+from aio_pika.abc import (
+    AbstractChannel,
+    AbstractIncomingMessage,
+    AbstractRobustConnection,
+)
+from prometheus_client import Counter, Histogram
+from sqlalchemy.ext.asyncio import AsyncSession
+from iam.core.cache import close_redis
+from iam.core.config import settings
+from iam.crud import user as user_crud
+from iam.db.session import async_session, dispose_engines, init_engines
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CONSUMED = Counter(
+    "events_consumed_total", "Consumed events by outcome", ["queue", "result"]
+)
+EVENT_BATCH_DURATION = Histogram(
+    "event_consume_batch_seconds", "Time to handle a batch of events", ["queue"]
+)
+
+RETRIES_HEADER = "x-retries"
+
+Handler = Callable[[AsyncSession, list[int]], Awaitable[None]]
+
+
+async def _warm(db: AsyncSession, user_ids: list[int]):
+    await user_crud.get_users_json(db, user_ids)
+
+
+async def _evict(db: AsyncSession, user_ids: list[int]):
+    await user_crud.evict_users(user_ids)
+
+
+HANDLERS: dict[str, Handler] = {
+    "user.created": _warm,
+    "user.updated": user_crud.cache_users,
+    "user.deleted": _evict,
+}
+
+
+def retry_delay(attempt: int) -> float:
+    """Seconds a message waits before its given retry.
+
+    Args:
+        attempt (int): The retry number, starting at 1
+
+    Returns:
+        float: ``settings.EVENT_CONSUMER_RETRY_BACKOFF`` doubled per attempt
+    """
+    return settings.EVENT_CONSUMER_RETRY_BACKOFF * 2 ** (attempt - 1)
+
+
+class AckTracker:
+    """Acknowledge a channel's deliveries in batches.
+
+    Deliveries are settled out of order by concurrent handlers, but a
+    ``multiple`` ack covers every earlier delivery tag on the channel. The
+    tracker therefore only acks up to the last delivery of the settled
+    prefix, once ``batch_size`` deliveries are ready or on :meth:`flush`.
+    """
+
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self._pending: OrderedDict[int, AbstractIncomingMessage] = OrderedDict()
+        self._settled: set[int] = set()
+        self._ready: AbstractIncomingMessage | None = None
+        self._ready_count = 0
+
+    def track(self, message: AbstractIncomingMessage):
+        """Register a delivery, in delivery order.
+
+        Args:
+            message (AbstractIncomingMessage): The delivered message
+        """
+        self._pending[message.delivery_tag] = message
+
+    async def settle(self, message: AbstractIncomingMessage):
+        """Mark a delivery as handled, acking a batch when one is ready.
+
+        Args:
+            message (AbstractIncomingMessage): The handled message
+        """
+        self._settled.add(message.delivery_tag)
+        await self._advance()
+
+    async def discard(self, message: AbstractIncomingMessage):
+        """Forget a delivery that was already rejected or requeued.
+
+        The delivery stops holding back the deliveries after it, but is never
+        the one a batch is acked with, since the broker no longer knows it.
+
+        Args:
+            message (AbstractIncomingMessage): The nacked message
+        """
+        self._pending.pop(message.delivery_tag, None)
+        await self._advance()
+
+    async def _advance(self):
+        while self._pending and next(iter(self._pending)) in self._settled:
+            tag, self._ready = self._pending.popitem(last=False)
+            self._settled.discard(tag)
+            self._ready_count += 1
+        if self._ready_count >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        """Ack every delivery of the settled prefix."""
+        ready, self._ready, self._ready_count = self._ready, None, 0
+        if ready is not None:
+            await ready.ack(multiple=True)
+
+
+class EventConsumer:
+    """Batched, concurrent consumer for the user lifecycle queues."""
+
+    def __init__(
+        self,
+        url: str,
+        queues: list[str],
+        prefetch: int = 200,
+        concurrency: int = 4,
+        batch_size: int = 100,
+        ack_interval: float = 0.5,
+        max_retries: int = 5,
+    ):
+        self._url = url
+        self._queues = queues
+        self._prefetch = prefetch
+        self._concurrency = concurrency
+        self._batch_size = batch_size
+        self._ack_interval = ack_interval
+        self._max_retries = max_retries
+        self._connection: AbstractRobustConnection | None = None
+        self._publish_channel: AbstractChannel | None = None
+        self._trackers: dict[str, AckTracker] = {}
+        self._buffer: asyncio.Queue = asyncio.Queue(maxsize=prefetch * len(queues))
+
+    async def run(self):
+        """Consume until cancelled, then ack what was handled and disconnect."""
+        self._connection = await aio_pika.connect_robust(self._url)
+        try:
+            self._publish_channel = await self._connection.channel(
+                publisher_confirms=True
+            )
+            tasks = [
+                *[asyncio.create_task(self._consume(queue)) for queue in self._queues],
+                *[asyncio.create_task(self._work()) for _ in range(self._concurrency)],
+                asyncio.create_task(self._flush_acks()),
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                for tracker in self._trackers.values():
+                    await tracker.flush()
+        finally:
+            await self._connection.close()
+
+    async def _consume(self, queue_name: str):
+        channel = await self._connection.channel()
+        await channel.set_qos(prefetch_count=self._prefetch)
+        queue = await self._declare(channel, queue_name)
+        tracker = self._trackers[queue_name] = AckTracker(self._batch_size)
+        async with queue.iterator() as messages:
+            async for message in messages:
+                tracker.track(message)
+                await self._buffer.put((queue_name, message))
+
+    async def _declare(self, channel: AbstractChannel, queue_name: str):
+        # The main queue is declared exactly as the publisher declares it.
+        queue = await channel.declare_queue(queue_name, durable=True)
+        for attempt in range(1, self._max_retries + 1):
+            delay_ms = int(retry_delay(attempt) * 1000)
+            await channel.declare_queue(
+                f"{queue_name}.retry.{delay_ms}",
+                durable=True,
+                arguments={
+                    "x-message-ttl": delay_ms,
+                    "x-dead-letter-exchange": "",
+                    "x-dead-letter-routing-key": queue_name,
+                },
+            )
+        await channel.declare_queue(f"{queue_name}.dead", durable=True)
+        return queue
+
+    async def _work(self):
+        while True:
+            batch = [await self._buffer.get()]
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._buffer.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            by_queue = defaultdict(list)
+            for queue_name, message in batch:
+                by_queue[queue_name].append(message)
+            for queue_name, messages in by_queue.items():
+                await self._handle(queue_name, messages)
+
+    async def _handle(self, queue_name: str, messages: list[AbstractIncomingMessage]):
+        tracker = self._trackers[queue_name]
+        valid = []
+        for message in messages:
+            try:
+                valid.append((message, int(orjson.loads(message.body)["user_id"])))
+            except (orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+                logger.warning("Dead-lettering malformed %s event", queue_name)
+                await self._forward(queue_name, message, f"{queue_name}.dead", "dead")
+        if not valid:
+            return
+
+        start = time.perf_counter()
+        try:
+            async with async_session() as session:
+                await HANDLERS[queue_name](
+                    session, list(dict.fromkeys(user_id for _, user_id in valid))
+                )
+        except Exception:
+            logger.exception("Failed to handle %d %s events", len(valid), queue_name)
+            for message, _ in valid:
+                await self._retry(queue_name, message)
+            return
+        finally:
+            EVENT_BATCH_DURATION.labels(queue_name).observe(time.perf_counter() - start)
+        EVENTS_CONSUMED.labels(queue_name, "ok").inc(len(valid))
+        for message, _ in valid:
+            await tracker.settle(message)
+
+    async def _retry(self, queue_name: str, message: AbstractIncomingMessage):
+        attempt = int((message.headers or {}).get(RETRIES_HEADER, 0)) + 1
+        if attempt > self._max_retries:
+            await self._forward(queue_name, message, f"{queue_name}.dead", "dead")
+            return
+        delay_ms = int(retry_delay(attempt) * 1000)
+        await self._forward(
+            queue_name,
+            message,
+            f"{queue_name}.retry.{delay_ms}",
+            "retry",
+            headers={RETRIES_HEADER: attempt},
+        )
+
+    async def _forward(
+        self,
+        queue_name: str,
+        message: AbstractIncomingMessage,
+        target: str,
+        result: str,
+        headers: dict | None = None,
+    ):
+        # The original is only acked once the copy is confirmed; if the copy
+        # can't be published the message is requeued instead.
+        try:
+            await self._publish_channel.default_exchange.publish(
+                aio_pika.Message(
+                    body=message.body,
+                    headers={
+                        **{
+                            key: value
+                            for key, value in (message.headers or {}).items()
+                            if key != "x-death"
+                        },
+                        **(headers or {}),
+                    },
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                ),
+                routing_key=target,
+            )
+        except Exception:
+            logger.exception("Failed to forward a %s event, requeueing", queue_name)
+            await message.nack(requeue=True)
+            EVENTS_CONSUMED.labels(queue_name, "requeued").inc()
+            await self._trackers[queue_name].discard(message)
+            return
+        EVENTS_CONSUMED.labels(queue_name, result).inc()
+        await self._trackers[queue_name].settle(message)
+
+    async def _flush_acks(self):
+        while True:
+            await asyncio.sleep(self._ack_interval)
+            for tracker in list(self._trackers.values()):
+                await tracker.flush()
+
+
+async def run():
+    """Consume the configured queues until cancelled."""
+    init_engines()
+    consumer = EventConsumer(
+        settings.RABBITMQ_URL,
+        settings.EVENT_CONSUMER_QUEUES,
+        prefetch=settings.EVENT_CONSUMER_PREFETCH,
+        concurrency=settings.EVENT_CONSUMER_CONCURRENCY,
+        batch_size=settings.EVENT_CONSUMER_BATCH_SIZE,
+        ack_interval=settings.EVENT_CONSUMER_ACK_INTERVAL,
+        max_retries=settings.EVENT_CONSUMER_MAX_RETRIES,
+    )
+    try:
+        await consumer.run()
+    finally:
+        await close_redis()
+        await dispose_engines()
+
+
+def main():
+    """Entry point for the event consumer process."""
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
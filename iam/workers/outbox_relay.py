@@ -0,0 +1,74 @@
+"""Outbox relay worker.
+
+This module drains the transactional outbox and publishes its events to
+RabbitMQ in batches. It runs as a separate process::
+
+    python -m iam.workers.outbox_relay
+
+Each batch is claimed, published with one round of publisher confirms and
+deleted in a single transaction. If publishing fails the transaction is rolled
+back and the events are retried, so delivery is at-least-once.
+"""
+
+import asyncio
+import logging
+
+from iam.core.config import settings
+from iam.core.messaging import publisher
+from iam.crud import outbox as outbox_crud
+from iam.db.session import async_session, dispose_engines, init_engines
+
+logger = logging.getLogger(__name__)
+
+
+async def relay_once(batch_size: int = settings.OUTBOX_BATCH_SIZE) -> int:
+    """Publish and remove one batch of outbox events.
+
+    Args:
+        batch_size (int, optional): The maximum number of events to relay.
+            Defaults to ``settings.OUTBOX_BATCH_SIZE``.
+
+    Returns:
+        int: The number of events published.
+    """
+    async with async_session() as session:
+        async with session.begin():
+            events = await outbox_crud.claim_events(session, batch_size)
+            if not events:
+                return 0
+            await publisher.publish_batch([(e.queue, e.payload) for e in events])
+            await outbox_crud.delete_events(session, [e.id for e in events])
+    return len(events)
+
+
+async def run():
+    """Relay outbox events until cancelled.
+
+    Full batches are followed immediately by the next one; the relay only
+    sleeps for ``settings.OUTBOX_POLL_INTERVAL`` once the outbox is drained or
+    after a failure.
+    """
+    init_engines()
+    await publisher.start()
+    try:
+        while True:
+            try:
+                relayed = await relay_once()
+            except Exception:
+                logger.exception("Outbox relay batch failed")
+                relayed = 0
+            if relayed < settings.OUTBOX_BATCH_SIZE:
+                await asyncio.sleep(settings.OUTBOX_POLL_INTERVAL)
+    finally:
+        await publisher.close()
+        await dispose_engines()
+
+
+def main():
+    """Entry point for the outbox relay process."""
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
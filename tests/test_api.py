@@ -4,9 +4,15 @@ This module contains test cases for verifying the functionality
 of the API endpoints, including health checks and other API operations.
 """
 
+import asyncio
+
 import pytest
-from httpx import AsyncClient
-from ..iam.main import app
+from httpx import ASGITransport, AsyncClient
+from iam.crud import role as role_crud
+from iam import main
+from iam.db import session as db_session
+from iam.main import app
+from iam.models.role import Role
 
 
 @pytest.mark.asyncio
@@ -17,7 +23,103 @@ async def test_health_check():
     - Returns 200 status code
     - Returns JSON response with status: 'healthy'
     """
-    async with AsyncClient(transport=app, base_url="http://test") as ac:
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
         response = await ac.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "healthy"}
+
+
+@pytest.mark.asyncio
+async def test_readiness_waits_for_warm_up(monkeypatch):
+    """Test that the readiness endpoint only succeeds after warm-up.
+
+    Verifies that /ready returns 503 while the process is warming up and
+    200 once warm-up has finished.
+    """
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        monkeypatch.setattr(app.state, "ready", False, raising=False)
+        assert (await ac.get("/ready")).status_code == 503
+        monkeypatch.setattr(app.state, "ready", True)
+        response = await ac.get("/ready")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready"}
+
+
+@pytest.mark.asyncio
+async def test_shutdown_stops_tasks_before_closing_connections(monkeypatch):
+    """Test that shutdown waits for the background tasks to stop.
+
+    Args:
+        monkeypatch: Fixture used to replace the connections and the tasks.
+
+    Verifies that the warm-up and the invalidation listener have finished
+    running before Redis and the database engines are closed.
+    """
+    events = []
+
+    async def run_forever(name):
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await asyncio.sleep(0)
+            events.append(f"{name} stopped")
+
+    async def close(name):
+        events.append(f"{name} closed")
+
+    monkeypatch.setattr(main, "init_engines", lambda: None)
+    monkeypatch.setattr(main, "open_redis", lambda: None)
+    monkeypatch.setattr(main, "warm_up", lambda app: run_forever("warm-up"))
+    monkeypatch.setattr(
+        main, "listen_for_invalidations", lambda: run_forever("listener")
+    )
+    monkeypatch.setattr(main, "user_filter", None)
+    monkeypatch.setattr(main.publisher, "close", lambda: close("publisher"))
+    monkeypatch.setattr(main, "close_redis", lambda: close("redis"))
+    monkeypatch.setattr(main, "dispose_engines", lambda: close("engines"))
+
+    async with main.lifespan(app):
+        await asyncio.sleep(0)
+    assert sorted(events[:2]) == ["listener stopped", "warm-up stopped"]
+    assert events[2:] == ["publisher closed", "redis closed", "engines closed"]
+
+
+@pytest.mark.asyncio
+async def test_writes_pin_the_client_to_the_primary(session_factory, monkeypatch):
+    """Test that creating and updating a user set the read-your-writes cookie.
+
+    Args:
+        session_factory: Session factory bound to the test database.
+        monkeypatch: Fixture used to configure a replica and the role lookup.
+
+    Verifies that the responses returned directly by the endpoints still carry
+    the cookie set when their session commits.
+    """
+    monkeypatch.setattr(db_session, "async_session", session_factory)
+    monkeypatch.setattr(db_session, "replica_router", object())
+
+    async def resolve(role_ids, db=None):
+        return {role_id: "admin" for role_id in role_ids}
+
+    monkeypatch.setattr(role_crud.role_catalogue, "resolve", resolve)
+    async with session_factory() as session:
+        session.add(Role(name="admin"))
+        await session.commit()
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        created = await ac.post(
+            "/api/v1/users/",
+            json={"username": "ann", "email": "ann@example.com", "role_id": 1},
+        )
+        updated = await ac.patch(
+            f"/api/v1/users/{created.json()['id']}", json={"username": "anne"}
+        )
+
+    for response in (created, updated):
+        assert response.status_code in (200, 201)
+        assert db_session.READ_YOUR_WRITES_COOKIE in response.headers["set-cookie"]
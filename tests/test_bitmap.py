@@ -0,0 +1,27 @@
+"""Tests for the ID bitmap.
+
+This module verifies membership, growth and counting in :class:`IdBitmap`.
+"""
+
+import pytest
+from iam.core.bitmap import IdBitmap
+
+
+def test_bitmap_membership_and_growth():
+    """Test that added IDs are members and the bitmap grows to hold them."""
+    bitmap = IdBitmap([1, 9, 9])
+    bitmap.add(1_000_000)
+    assert len(bitmap) == 3
+    assert bitmap.max_id == 1_000_000
+    assert [i in bitmap for i in (0, 1, 8, 9, 1_000_000, 1_000_001, -1)] == [
+        False,
+        True,
+        False,
+        True,
+        True,
+        False,
+        False,
+    ]
+    assert bitmap.nbytes >= 1_000_000 // 8 + 1
+    with pytest.raises(ValueError):
+        bitmap.add(-1)
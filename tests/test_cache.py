@@ -1,11 +1,17 @@
 """Tests for the cache module.
 
 This module contains tests for the cache functionality, including setting and
-retrieving values from the cache system.
+retrieving values from the cache system, and for the read-through loading of
+:func:`iam.core.cache.get_or_load` against an in-process Redis stand-in.
 """
 
+import asyncio
+import time
 import pytest
-from ..iam.core.cache import set_cache, get_cache
+from prometheus_client import REGISTRY
+from iam.core import cache
+from iam.core.cache import LocalCache, set_cache, get_cache
+from iam.core.config import settings
 
 
 @pytest.mark.asyncio
@@ -18,3 +24,158 @@ async def test_cache_set_get():
     await set_cache("test:key", "value")
     val = await get_cache("test:key")
     assert val == b"value"
+
+
+def test_local_cache_evicts_least_recently_used():
+    """Test that the L1 cache stays within its entry bound.
+
+    Reading a key marks it as recently used, so the oldest untouched key is
+    the one evicted when a new key exceeds the bound.
+    """
+    cache = LocalCache(max_entries=2, max_bytes=1024, ttl=60)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.get("a")
+    cache.set("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.get("c") == b"3"
+
+
+def test_local_cache_bounds_bytes_and_expires(monkeypatch):
+    """Test that the L1 cache honours its byte bound and entry TTLs."""
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = LocalCache(max_entries=100, max_bytes=10, ttl=60)
+    cache.set("a", b"12345")
+    cache.set("b", b"12345")
+    assert cache.get("a") is None
+    assert cache.nbytes == 6
+
+    cache.set("c", b"x", ttl=1)
+    now[0] += 2
+    assert cache.get("c") is None
+    assert cache.get("b") == b"12345"
+
+
+def test_local_cache_reports_its_size():
+    """Test that a reporting L1 cache sets its gauges as it changes."""
+    local = LocalCache(max_entries=100, max_bytes=1024, ttl=60, report=True)
+    local.set("a", b"123")
+    assert REGISTRY.get_sample_value("cache_l1_entries") == 1
+    assert REGISTRY.get_sample_value("cache_l1_bytes") == 4
+    local.delete("a")
+    assert REGISTRY.get_sample_value("cache_l1_entries") == 0
+    assert REGISTRY.get_sample_value("cache_l1_bytes") == 0
+
+
+@pytest.mark.asyncio
+async def test_stale_hit_is_served_while_one_refresh_runs(fake_redis, monkeypatch):
+    """Test stale-while-revalidate in :func:`get_or_load`.
+
+    Args:
+        fake_redis: The Redis stand-in backing the cache.
+        monkeypatch: Fixture used to enable the stale window.
+
+    Tests that:
+        - Every concurrent read of a stale entry gets the stale value at once
+        - A single background refresh reloads it with the full TTL
+    """
+    monkeypatch.setattr(settings, "CACHE_STALE_TTL", 60)
+    await fake_redis.set("user:1", b"old", px=30_000)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return b"new"
+
+    results = await asyncio.gather(
+        *(cache.get_or_load("user:1", loader, ttl=300) for _ in range(5))
+    )
+    assert results == [b"old"] * 5
+    await asyncio.gather(*cache._background_refreshes)
+
+    assert calls == 1
+    assert await fake_redis.get("user:1") == b"new"
+    assert fake_redis._pttl("user:1") > 300_000
+
+
+@pytest.mark.asyncio
+async def test_lease_holder_loads_and_waiter_reads_its_fill(fake_redis, monkeypatch):
+    """Test the Redis lease taken by :func:`get_or_load` on a miss.
+
+    Args:
+        fake_redis: The Redis stand-in backing the cache.
+        monkeypatch: Fixture used to enable the lease.
+
+    Tests that:
+        - A worker that gets the lease loads, fills and releases it
+        - A worker that finds the lease held waits for the holder's fill
+          instead of loading
+        - A waiter loads itself once the holder misses ``CACHE_LOCK_WAIT``
+    """
+    monkeypatch.setattr(settings, "CACHE_LOCK_ENABLED", True)
+    monkeypatch.setattr(settings, "CACHE_LOCK_WAIT", 0.2)
+    monkeypatch.setattr(settings, "CACHE_LOCK_POLL_INTERVAL", 0.01)
+    leases = []
+
+    async def loader():
+        leases.append(fake_redis._get("lock:user:1"))
+        return b"loaded"
+
+    assert await cache.get_or_load("user:1", loader) == b"loaded"
+    assert leases[0] is not None
+    assert fake_redis._get("lock:user:1") is None
+
+    # Another worker holds the lease for user:2 and fills it shortly.
+    await fake_redis.set("lock:user:2", "other-worker", px=5000)
+
+    async def fill():
+        await asyncio.sleep(0.05)
+        await fake_redis.set("user:2", b"filled")
+
+    async def must_not_load():
+        raise AssertionError("the waiter loaded a leased key")
+
+    filled, _ = await asyncio.gather(cache.get_or_load("user:2", must_not_load), fill())
+    assert filled == b"filled"
+
+    # The holder of user:3's lease never fills it.
+    await fake_redis.set("lock:user:3", "other-worker", px=5000)
+    assert await cache.get_or_load("user:3", loader) == b"loaded"
+    assert fake_redis._get("lock:user:3") == b"other-worker"
+
+
+@pytest.mark.asyncio
+async def test_hash_counters_never_lose_changes(fake_redis):
+    """Test the rebuild protocol of Redis hashes of counters.
+
+    Args:
+        fake_redis: The Redis stand-in backing the cache.
+
+    Tests that:
+        - Increments of an unbuilt hash are counted as missed changes
+        - A rebuild that missed a change, or lost the race to another
+          rebuild, is not written
+        - Increments apply once the hash is built, and a failed one deletes
+          the hash
+    """
+    assert await cache.get_hash_counters("counts") == (None, 0)
+    await cache.incr_hash_counters("counts", {"1": 1}, ttl=60)
+    assert await cache.get_hash_counters("counts") == (None, 1)
+    assert fake_redis._pttl("counts") > 0
+
+    assert not await cache.set_hash_counters("counts", {"1": 4}, changes=0, ttl=60)
+    assert await cache.set_hash_counters("counts", {"1": 5}, changes=1, ttl=60)
+    assert not await cache.set_hash_counters("counts", {"1": 9}, changes=1, ttl=60)
+    await cache.incr_hash_counters("counts", {"1": 2, "2": 1}, ttl=60)
+    assert await cache.get_hash_counters("counts") == ({"1": 7, "2": 1}, 0)
+
+    async def fail(*args):
+        raise ConnectionError("connection reset")
+
+    fake_redis.evalsha = fail
+    await cache.incr_hash_counters("counts", {"1": 1}, ttl=60)
+    assert fake_redis._get("counts") is None
@@ -0,0 +1,242 @@
+"""
+Test module for the bulk export and import command.
+
+This module checks that users and roles survive a round trip through NDJSON
+and gzipped CSV files, and that imports skip existing and invalid rows.
+"""
+
+import gzip
+
+import orjson
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from iam import cli
+from iam.core import cache
+from iam.crud import user as user_crud
+from iam.db.base import Base
+from iam.models.role import Role
+from iam.models.user import User
+
+
+async def _export(path, table):
+    with cli.open_output(str(path), compress=False) as output:
+        return await cli.export_table(
+            table, output, cli.detect_format(str(path), None), batch_size=2
+        )
+
+
+async def _import(path, table, batch_size=2):
+    with cli.open_input(str(path)) as stream:
+        return await cli.import_file(
+            table,
+            cli.read_records(stream, cli.detect_format(str(path), None)),
+            batch_size=batch_size,
+        )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("suffix", [".ndjson", ".csv.gz"])
+async def test_export_import_round_trip(session_factory, monkeypatch, tmp_path, suffix):
+    """
+    Test exporting users and roles and importing them into an empty database.
+
+    Args:
+        session_factory: Session factory bound to the source database.
+        monkeypatch: Fixture used to swap databases and record cache writes.
+        tmp_path: Directory for the exported files.
+        suffix: File extension selecting the format and compression.
+
+    Tests that:
+        - Every row is exported, gzip output is compressed
+        - Users are matched to their roles by name on import
+        - The imported users are cached with their role names
+    """
+    async with session_factory() as session:
+        session.add_all([Role(id=7, name="admin"), Role(id=9, name="viewer")])
+        session.add_all(
+            [
+                User(
+                    username=f"user{index}",
+                    email=f"user{index}@example.com",
+                    role_id=7 if index % 2 else 9,
+                )
+                for index in range(5)
+            ]
+        )
+        await session.commit()
+    monkeypatch.setattr(cli, "async_session", session_factory)
+
+    roles_path, users_path = tmp_path / f"roles{suffix}", tmp_path / f"users{suffix}"
+    assert await _export(roles_path, "roles") == 2
+    assert await _export(users_path, "users") == 5
+    if suffix.endswith(".gz"):
+        assert gzip.open(users_path).read().startswith(b"id,username")
+
+    target = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with target.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    target_factory = async_sessionmaker(target, expire_on_commit=False)
+    monkeypatch.setattr(cli, "async_session", target_factory)
+    invalidations, cached = [], []
+
+    async def invalidate():
+        invalidations.append(True)
+
+    async def cache_created_users(rows, role_names, cache=True):
+        assert cache
+        cached.extend((row[1], role_names[row[3]]) for row in rows)
+
+    monkeypatch.setattr(cli.role_catalogue, "invalidate", invalidate)
+    monkeypatch.setattr(user_crud, "cache_created_users", cache_created_users)
+
+    assert await _import(roles_path, "roles") == {
+        "imported": 2,
+        "skipped": 0,
+        "invalid": 0,
+    }
+    assert invalidations == [True]
+    assert await _import(users_path, "users") == {
+        "imported": 5,
+        "skipped": 0,
+        "invalid": 0,
+    }
+
+    async with session_factory() as source, target_factory() as copy:
+        query = (
+            select(User.username, User.email, Role.name)
+            .join(Role)
+            .order_by(User.username)
+        )
+        assert (await copy.execute(query)).all() == (await source.execute(query)).all()
+    assert sorted(cached) == sorted(
+        (f"user{index}", "admin" if index % 2 else "viewer") for index in range(5)
+    )
+    await target.dispose()
+
+
+@pytest.mark.asyncio
+async def test_import_skips_existing_and_invalid_users(
+    session_factory, monkeypatch, tmp_path
+):
+    """
+    Test that an import counts and skips rows it can't insert.
+
+    Args:
+        session_factory: Session factory bound to the test database.
+        monkeypatch: Fixture used to swap the database and the cache.
+        tmp_path: Directory for the import file.
+
+    Tests that:
+        - Users whose username or email exists are skipped
+        - Invalid emails and unknown role names or IDs are counted as invalid
+        - Records without a role name fall back to ``role_id``
+    """
+    async with session_factory() as session:
+        session.add(Role(id=1, name="admin"))
+        session.add(User(username="taken", email="taken@example.com", role_id=1))
+        await session.commit()
+    monkeypatch.setattr(cli, "async_session", session_factory)
+
+    async def cache_created_users(rows, role_names, cache=True):
+        pass
+
+    monkeypatch.setattr(user_crud, "cache_created_users", cache_created_users)
+    records = [
+        {"username": "taken", "email": "new@example.com", "role": "admin"},
+        {"username": "fresh", "email": "fresh@example.com", "role": "admin"},
+        {"username": "by-id", "email": "by-id@example.com", "role_id": 1},
+        {"username": "bad", "email": "not-an-email", "role": "admin"},
+        {"username": "ghost", "email": "ghost@example.com", "role": "nobody"},
+        {"username": "lost", "email": "lost@example.com", "role_id": 42},
+    ]
+    path = tmp_path / "users.ndjson"
+    path.write_bytes(b"".join(orjson.dumps(record) + b"\n" for record in records))
+
+    assert await _import(path, "users", batch_size=4) == {
+        "imported": 2,
+        "skipped": 1,
+        "invalid": 3,
+    }
+    async with session_factory() as session:
+        assert await session.scalar(select(func.count()).select_from(User)) == 3
+
+
+@pytest.mark.asyncio
+async def test_import_without_cache_still_counts_and_announces(
+    session_factory, monkeypatch
+):
+    """
+    Test that ``--no-cache`` only skips writing the imported users to the cache.
+
+    Args:
+        session_factory: Session factory bound to the test database.
+        monkeypatch: Fixture used to swap the database and the shared state.
+
+    Tests that:
+        - No user is written to the cache
+        - The roles' member counts still include the imported users
+        - The imported IDs are still announced to the existence filters
+    """
+    async with session_factory() as session:
+        session.add_all([Role(id=1, name="admin"), Role(id=2, name="viewer")])
+        await session.commit()
+    monkeypatch.setattr(cli, "async_session", session_factory)
+    cached, deltas, announced = [], [], []
+
+    async def set_many_cache(mapping, ttl=300):
+        cached.append(mapping)
+
+    async def adjust_member_counts(counts):
+        deltas.append(dict(counts))
+
+    async def announce_users(user_ids):
+        announced.extend(user_ids)
+
+    monkeypatch.setattr(user_crud, "set_many_cache", set_many_cache)
+    monkeypatch.setattr(user_crud, "adjust_member_counts", adjust_member_counts)
+    monkeypatch.setattr(user_crud, "announce_users", announce_users)
+    records = [
+        {"username": "a", "email": "a@example.com", "role": "admin"},
+        {"username": "b", "email": "b@example.com", "role": "admin"},
+        {"username": "c", "email": "c@example.com", "role": "viewer"},
+    ]
+
+    assert await cli.import_file(
+        "users", iter(records), batch_size=10, rebuild_cache=False
+    ) == {"imported": 3, "skipped": 0, "invalid": 0}
+    assert cached == []
+    assert deltas == [{1: 2, 2: 1}]
+    async with session_factory() as session:
+        user_ids = (await session.scalars(select(User.id))).all()
+    assert sorted(announced) == sorted(user_ids)
+
+
+@pytest.mark.asyncio
+async def test_import_without_cache_clears_cached_misses(
+    session_factory, monkeypatch, fake_redis
+):
+    """
+    Test that users imported with ``--no-cache`` aren't hidden by cached misses.
+
+    Args:
+        session_factory: Session factory bound to the test database.
+        monkeypatch: Fixture used to swap the database.
+        fake_redis: The Redis stand-in backing the cache.
+    """
+    async with session_factory() as session:
+        session.add(Role(id=1, name="admin"))
+        await session.commit()
+    monkeypatch.setattr(cli, "async_session", session_factory)
+    await cache.set_negative_cache([user_crud.user_cache_key(1)])
+    async with session_factory() as session:
+        assert await user_crud.get_user_json(session, 1) is None
+
+    records = [{"username": "a", "email": "a@example.com", "role": "admin"}]
+    await cli.import_file("users", iter(records), rebuild_cache=False)
+
+    assert await cache.get_cache(user_crud.user_cache_key(1)) is None
+    async with session_factory() as session:
+        assert (
+            orjson.loads(await user_crud.get_user_json(session, 1))["username"] == "a"
+        )
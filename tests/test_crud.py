@@ -5,9 +5,18 @@ This module contains test cases for Create, Read, Update, Delete (CRUD)
 operations, specifically focusing on user management functionality.
 """
 
+import orjson
 import pytest
-from ..iam.crud.user import create_user
-from ..iam.schemas.user import UserCreate
+from sqlalchemy import select
+from iam.core.cache import NEGATIVE_VALUE
+from iam.core.config import settings
+from iam.crud import user as user_crud
+from iam.crud.role import RoleCatalogue
+from iam.crud.user import UserIdFilter, create_user
+from iam.models.role import Role
+from iam.models.user import User
+from iam.schemas.user import User as UserSchema
+from iam.schemas.user import UserCreate, UserUpdate
 
 
 @pytest.mark.asyncio
@@ -25,3 +34,287 @@ async def test_create_user(db_session):
     user_data = {"username": "test", "email": "test@example.com", "role_id": 1}
     user = await create_user(db_session, UserCreate(**user_data))
     assert user.username == "test"
+
+
+@pytest.mark.asyncio
+async def test_get_users_preserves_order_and_backfills_cache(db_session, monkeypatch):
+    """
+    Test the get_users batch lookup.
+
+    Args:
+        db_session: The database session fixture.
+        monkeypatch: Fixture used to replace the cache with a dictionary.
+
+    Tests that:
+        - Results follow the requested order, with None for unknown IDs
+        - Cache hits are decoded and cache misses are written back
+    """
+    cached_user = {"id": 2, "username": "cached", "role": None}
+    cache = {user_crud.user_cache_key(2): orjson.dumps(cached_user)}
+
+    async def get_many_cache(keys):
+        return [cache.get(key) for key in keys]
+
+    async def set_many_cache(mapping, ttl=300):
+        cache.update(mapping)
+
+    monkeypatch.setattr(user_crud, "get_many_cache", get_many_cache)
+    monkeypatch.setattr(user_crud, "set_many_cache", set_many_cache)
+    db_session.add(Role(name="admin"))
+    db_session.add_all(
+        [
+            User(username="one", email="one@example.com", role_id=1),
+            User(username="two", email="two@example.com", role_id=1),
+        ]
+    )
+    await db_session.commit()
+
+    users = await user_crud.get_users(db_session, [3, 1, 2])
+    one = {
+        "username": "one",
+        "email": "one@example.com",
+        "role_id": 1,
+        "id": 1,
+        "version": 1,
+        "role": {"name": "admin", "id": 1},
+    }
+    assert users == [None, one, cached_user]
+    assert orjson.loads(cache[user_crud.user_cache_key(1)]) == one
+
+
+@pytest.mark.asyncio
+async def test_create_users_reports_each_item(db_session, monkeypatch):
+    """
+    Test the create_users bulk insert.
+
+    Args:
+        db_session: The database session fixture.
+        monkeypatch: Fixture used to replace the cache with a dictionary.
+
+    Tests that:
+        - New users are created and cached as serialize_user encodes them
+        - Existing and repeated usernames are reported as conflicts
+        - Unknown roles are reported as invalid
+    """
+    cache, ttls = {}, []
+
+    async def set_many_cache(mapping, ttl=300):
+        cache.update(mapping)
+        ttls.append(ttl)
+
+    monkeypatch.setattr(user_crud, "set_many_cache", set_many_cache)
+    monkeypatch.setattr(user_crud, "role_catalogue", RoleCatalogue(60))
+    db_session.add(Role(name="admin"))
+    db_session.add(User(username="taken", email="taken@example.com", role_id=1))
+    await db_session.commit()
+
+    users = [
+        UserCreate(username="new", email="new@example.com", role_id=1),
+        UserCreate(username="taken", email="other@example.com", role_id=1),
+        UserCreate(username="new", email="again@example.com", role_id=1),
+        UserCreate(username="ghost", email="ghost@example.com", role_id=7),
+    ]
+    results = await user_crud.create_users(db_session, users)
+
+    assert [result["status"] for result in results] == [
+        "created",
+        "conflict",
+        "conflict",
+        "invalid",
+    ]
+    user_id = results[0]["id"]
+    assert list(cache) == [user_crud.user_cache_key(user_id)]
+    assert orjson.loads(cache[user_crud.user_cache_key(user_id)]) == {
+        "username": "new",
+        "email": "new@example.com",
+        "role_id": 1,
+        "id": user_id,
+        "version": 1,
+        "role": {"name": "admin", "id": 1},
+    }
+    stored = await db_session.get(User, user_id)
+    assert cache[user_crud.user_cache_key(user_id)] == user_crud.serialize_user(stored)
+    assert ttls == [settings.USER_CACHE_TTL + settings.CACHE_STALE_TTL]
+
+
+@pytest.mark.asyncio
+async def test_row_by_row_insert_skips_only_conflicting_rows(db_session):
+    """
+    Test the per-row insert used on databases without ON CONFLICT DO NOTHING.
+
+    Args:
+        db_session: The database session fixture.
+
+    Tests that:
+        - A duplicate only rolls back its own row, not the rows around it
+    """
+    db_session.add(Role(name="admin"))
+    db_session.add(User(username="taken", email="taken@example.com", role_id=1))
+    await db_session.commit()
+
+    inserted = await user_crud._insert_rows_one_by_one(
+        db_session,
+        [
+            {"username": "first", "email": "first@example.com", "role_id": 1},
+            {"username": "taken", "email": "dup@example.com", "role_id": 1},
+            {"username": "last", "email": "last@example.com", "role_id": 1},
+        ],
+    )
+    await db_session.commit()
+
+    assert [username for _, username in inserted] == ["first", "last"]
+    result = await db_session.execute(select(User.username).order_by(User.id))
+    assert result.scalars().all() == ["taken", "first", "last"]
+
+
+@pytest.mark.asyncio
+async def test_serialize_user_matches_schema(db_session):
+    """
+    Test that the cached representation of a user matches its API schema.
+
+    Args:
+        db_session: The database session fixture.
+    """
+    db_session.add(Role(name="admin"))
+    user = User(username="one", email="one@example.com", role_id=1)
+    db_session.add(user)
+    await db_session.commit()
+    await db_session.refresh(user)
+
+    cached = user_crud.serialize_user(user)
+    assert orjson.loads(cached) == UserSchema.model_validate(user).model_dump()
+    assert user_crud.user_cache_key(1) == f"user:v{user_crud.USER_CACHE_VERSION}:1"
+
+
+@pytest.mark.asyncio
+async def test_update_user_role_adjusts_member_counts(db_session, monkeypatch):
+    """
+    Test that changing a user's role moves it between role member counts.
+
+    Args:
+        db_session: The database session fixture.
+        monkeypatch: Fixture used to record cache writes and count changes.
+    """
+    adjustments = []
+
+    async def set_cache(key, value, ttl=300):
+        pass
+
+    async def adjust_member_counts(deltas):
+        adjustments.append(dict(deltas))
+
+    monkeypatch.setattr(user_crud, "set_cache", set_cache)
+    monkeypatch.setattr(user_crud, "adjust_member_counts", adjust_member_counts)
+    db_session.add_all([Role(id=1, name="admin"), Role(id=2, name="viewer")])
+    await db_session.commit()
+    user = await create_user(
+        db_session, UserCreate(username="ana", email="ana@example.com", role_id=1)
+    )
+
+    updated = await user_crud.update_user(db_session, user.id, UserUpdate(role_id=2))
+    assert updated.role.name == "viewer"
+    await user_crud.update_user(db_session, user.id, UserUpdate(username="ana2"))
+    assert adjustments == [{1: 1}, {1: -1, 2: 1}]
+    assert await user_crud.update_user(db_session, 99, UserUpdate(role_id=1)) is None
+
+
+@pytest.mark.asyncio
+async def test_list_role_members_pages_by_id(db_session):
+    """
+    Test keyset pagination over the users of one role.
+
+    Args:
+        db_session: The database session fixture.
+    """
+    db_session.add_all([Role(id=1, name="admin"), Role(id=2, name="viewer")])
+    db_session.add_all(
+        User(id=i, username=f"u{i}", email=f"u{i}@example.com", role_id=1 + i % 2)
+        for i in range(1, 8)
+    )
+    await db_session.commit()
+
+    first = await user_crud.list_role_members(db_session, 2, None, 2)
+    second = await user_crud.list_role_members(db_session, 2, first[-1].id, 2)
+    assert [user.id for user in first] == [1, 3]
+    assert [user.id for user in second] == [5, 7]
+
+
+@pytest.mark.asyncio
+async def test_get_users_caches_missing_users(db_session, monkeypatch):
+    """
+    Test that users missing from the database are cached as missing.
+
+    Args:
+        db_session: The database session fixture.
+        monkeypatch: Fixture used to replace the cache with a dictionary.
+
+    Tests that:
+        - An unknown ID is cached with the negative value
+        - Later lookups trust that entry instead of querying the database
+    """
+    cache = {}
+
+    async def get_many_cache(keys):
+        return [cache.get(key) for key in keys]
+
+    async def set_many_cache(mapping, ttl=300):
+        cache.update(mapping)
+
+    async def set_negative_cache(keys, ttl=None):
+        cache.update(dict.fromkeys(keys, NEGATIVE_VALUE))
+
+    monkeypatch.setattr(user_crud, "get_many_cache", get_many_cache)
+    monkeypatch.setattr(user_crud, "set_many_cache", set_many_cache)
+    monkeypatch.setattr(user_crud, "set_negative_cache", set_negative_cache)
+    db_session.add(Role(name="admin"))
+    await db_session.commit()
+
+    assert await user_crud.get_users(db_session, [5]) == [None]
+    assert cache == {user_crud.user_cache_key(5): NEGATIVE_VALUE}
+
+    db_session.add(User(id=5, username="late", email="late@example.com", role_id=1))
+    await db_session.commit()
+    assert await user_crud.get_users(db_session, [5]) == [None]
+
+
+@pytest.mark.asyncio
+async def test_user_filter_rejects_unknown_ids(db_session, monkeypatch):
+    """
+    Test the per-worker existence filter.
+
+    Args:
+        db_session: The database session fixture.
+        monkeypatch: Fixture used to install the filter and fail on cache use.
+
+    Tests that:
+        - Every ID passes until the filter is built
+        - IDs missing from the filter are rejected without a cache lookup
+        - IDs above the largest known one and announced IDs pass
+    """
+
+    async def unexpected_lookup(*args, **kwargs):
+        raise AssertionError("Rejected IDs must not reach the cache")
+
+    user_filter = UserIdFilter("users:created")
+    monkeypatch.setattr(user_crud, "user_filter", user_filter)
+    monkeypatch.setattr(user_crud, "get_or_load", unexpected_lookup)
+    monkeypatch.setattr(user_crud, "get_many_cache", unexpected_lookup)
+    db_session.add(Role(name="admin"))
+    db_session.add_all(
+        User(id=i, username=f"u{i}", email=f"u{i}@example.com", role_id=1)
+        for i in (1, 3)
+    )
+    await db_session.commit()
+    assert user_filter.might_exist(2)
+
+    await user_filter.rebuild(db_session)
+    assert await user_crud.get_user_json(db_session, 2) is None
+    assert await user_crud.get_users_json(db_session, [0, 2]) == [None, None]
+    assert [user_filter.might_exist(i) for i in (1, 2, 3, 4)] == [
+        True,
+        False,
+        True,
+        True,
+    ]
+    user_filter.add([2])
+    assert user_filter.might_exist(2)
@@ -0,0 +1,50 @@
+"""Tests for conditional GET support.
+
+This module verifies If-None-Match matching and that the ETags of users and
+role snapshots follow their versions.
+"""
+
+import orjson
+from starlette.requests import Request
+from iam.core.etag import etag_matches, not_modified
+from iam.crud.role import RoleSnapshot
+from iam.crud.user import user_etag
+from iam.models.role import Role
+
+
+def request_with(if_none_match: str | None) -> Request:
+    headers = (
+        [] if if_none_match is None else [(b"if-none-match", if_none_match.encode())]
+    )
+    return Request({"type": "http", "headers": headers})
+
+
+def test_etag_matches():
+    """Test strong, weak, listed and wildcard If-None-Match values."""
+    assert etag_matches(request_with('"a"'), '"a"')
+    assert etag_matches(request_with('W/"a"'), '"a"')
+    assert etag_matches(request_with('"b", W/"a"'), '"a"')
+    assert etag_matches(request_with("*"), '"a"')
+    assert not etag_matches(request_with('"b"'), '"a"')
+    assert not etag_matches(request_with(None), '"a"')
+    response = not_modified('"a"')
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"a"'
+
+
+def test_etags_follow_versions():
+    """Test that ETags change with the user's row version and the catalogue."""
+    first = user_etag(1, orjson.dumps({"id": 1, "version": 1}))
+    assert first == user_etag(1, orjson.dumps({"id": 1, "version": 1, "email": "x"}))
+    assert first != user_etag(1, orjson.dumps({"id": 1, "version": 2}))
+    assert first == user_etag(
+        1, orjson.dumps({"username": '"version":9', "id": 1, "version": 1})
+    )
+
+    roles = [Role(id=1, name="admin")]
+    assert RoleSnapshot.build(1, roles).tag == RoleSnapshot.build(1, roles).tag
+    assert RoleSnapshot.build(1, roles).tag != RoleSnapshot.build(2, roles).tag
+    assert (
+        RoleSnapshot.build(1, roles).tag
+        != RoleSnapshot.build(1, [*roles, Role(id=2, name="viewer")]).tag
+    )
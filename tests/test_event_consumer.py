@@ -0,0 +1,153 @@
+"""Tests for the event consumer worker.
+
+This module verifies batched acknowledgements, cache warming from lifecycle
+events and the retry and dead-letter path for failed or malformed events.
+"""
+
+import orjson
+import pytest
+from iam.crud import user as user_crud
+from iam.workers import event_consumer
+from iam.workers.event_consumer import AckTracker, EventConsumer
+
+
+class FakeMessage:
+    """Incoming message stand-in recording how it was settled."""
+
+    def __init__(self, tag, body=b"{}", headers=None):
+        self.delivery_tag = tag
+        self.body = body
+        self.headers = headers or {}
+        self.acks = []
+        self.nacked = False
+
+    async def ack(self, multiple=False):
+        if self.nacked:
+            raise RuntimeError("Message already nacked")
+        self.acks.append(multiple)
+
+    async def nack(self, requeue=True):
+        self.nacked = True
+
+
+class RecordingExchange:
+    """Exchange stand-in that records published messages."""
+
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, message, routing_key):
+        self.published.append((routing_key, message))
+
+
+class RecordingChannel:
+    """Channel stand-in exposing a recording default exchange."""
+
+    def __init__(self):
+        self.default_exchange = RecordingExchange()
+
+
+class FailingExchange:
+    """Exchange stand-in whose publishes all fail."""
+
+    async def publish(self, message, routing_key):
+        raise ConnectionError("broker unavailable")
+
+
+def event(tag, user_id, headers=None):
+    return FakeMessage(tag, orjson.dumps({"user_id": user_id}), headers)
+
+
+@pytest.mark.asyncio
+async def test_ack_tracker_acks_settled_prefix():
+    """Only deliveries with every earlier tag settled are acked, in one ack."""
+    tracker = AckTracker(batch_size=2)
+    messages = [FakeMessage(tag) for tag in (1, 2, 3)]
+    for message in messages:
+        tracker.track(message)
+
+    await tracker.settle(messages[1])
+    await tracker.flush()
+    assert [message.acks for message in messages] == [[], [], []]
+
+    await tracker.settle(messages[0])
+    assert messages[1].acks == [True]
+    await tracker.settle(messages[2])
+    await tracker.flush()
+    assert messages[2].acks == [True]
+
+
+@pytest.mark.asyncio
+async def test_created_events_warm_the_cache(session_factory, monkeypatch):
+    """A batch of user.created events loads the users in one call and is acked."""
+    warmed = []
+
+    async def get_users_json(db, user_ids):
+        warmed.append(user_ids)
+
+    monkeypatch.setattr(user_crud, "get_users_json", get_users_json)
+    monkeypatch.setattr(event_consumer, "async_session", session_factory)
+    consumer = EventConsumer("amqp://test", ["user.created"], batch_size=10)
+    consumer._trackers["user.created"] = tracker = AckTracker(batch_size=10)
+    messages = [event(1, 7), event(2, 8), event(3, 7)]
+    for message in messages:
+        tracker.track(message)
+
+    await consumer._handle("user.created", messages)
+    await tracker.flush()
+    assert warmed == [[7, 8]]
+    assert messages[-1].acks == [True]
+
+
+@pytest.mark.asyncio
+async def test_failed_events_are_retried_then_dead_lettered(
+    session_factory, monkeypatch
+):
+    """Failed events go to the delay queue, and to the dead-letter queue at last."""
+
+    async def fail(db, user_ids):
+        raise RuntimeError("cache unavailable")
+
+    monkeypatch.setitem(event_consumer.HANDLERS, "user.created", fail)
+    monkeypatch.setattr(event_consumer, "async_session", session_factory)
+    consumer = EventConsumer("amqp://test", ["user.created"], max_retries=2)
+    consumer._publish_channel = channel = RecordingChannel()
+    consumer._trackers["user.created"] = AckTracker(batch_size=1)
+    messages = [
+        event(1, 7),
+        event(2, 8, {"x-retries": 2}),
+        FakeMessage(3, b"not json"),
+    ]
+    for message in messages:
+        consumer._trackers["user.created"].track(message)
+
+    await consumer._handle("user.created", messages)
+    published = channel.default_exchange.published
+    assert [routing_key for routing_key, _ in published] == [
+        "user.created.dead",
+        "user.created.retry.1000",
+        "user.created.dead",
+    ]
+    assert published[1][1].headers["x-retries"] == 1
+    assert messages[-1].acks == [True]
+
+
+@pytest.mark.asyncio
+async def test_requeued_events_are_never_acked():
+    """A message requeued because forwarding failed is left out of batch acks."""
+    consumer = EventConsumer("amqp://test", ["user.created"])
+    consumer._publish_channel = channel = RecordingChannel()
+    channel.default_exchange = FailingExchange()
+    consumer._trackers["user.created"] = tracker = AckTracker(batch_size=10)
+    first, malformed, last = FakeMessage(1), FakeMessage(2, b"not json"), event(3, 7)
+    for message in (first, malformed, last):
+        tracker.track(message)
+
+    await consumer._handle("user.created", [malformed])
+    await tracker.settle(first)
+    await tracker.flush()
+    assert malformed.nacked and first.acks == [True]
+
+    await tracker.settle(last)
+    await tracker.flush()
+    assert malformed.acks == [] and last.acks == [True]
@@ -0,0 +1,101 @@
+"""Tests for the event publisher.
+
+This module verifies that the pooled publisher buffers events, flushes them in
+batches over a single connection and declares each queue only once.
+"""
+
+import asyncio
+import pytest
+import aio_pika
+from iam.core.messaging import EventPublisher
+
+
+class FakeExchange:
+    """Default exchange stand-in that records published messages."""
+
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, message, routing_key, timeout=None):
+        self.published.append((routing_key, message.body.decode()))
+
+
+class FakeChannel:
+    """Channel stand-in that records queue declarations."""
+
+    def __init__(self, exchange):
+        self.default_exchange = exchange
+        self.declared = []
+        self.is_closed = False
+
+    async def declare_queue(self, name, durable=False):
+        self.declared.append(name)
+
+    async def close(self):
+        self.is_closed = True
+
+
+class FakeConnection:
+    """Connection stand-in handing out fake channels."""
+
+    def __init__(self):
+        self.exchange = FakeExchange()
+        self.channels = []
+
+    async def channel(self, publisher_confirms=True):
+        channel = FakeChannel(self.exchange)
+        self.channels.append(channel)
+        return channel
+
+    async def close(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_publisher_batches_over_one_connection(monkeypatch):
+    """Events share one connection and each queue is declared once."""
+    connections = []
+
+    async def connect_robust(url):
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    monkeypatch.setattr(aio_pika, "connect_robust", connect_robust)
+    publisher = EventPublisher("amqp://test", pool_size=1, batch_size=10)
+
+    for i in range(25):
+        await publisher.publish("user.created", f"event {i}")
+    await publisher.close()
+
+    assert len(connections) == 1
+    published = connections[0].exchange.published
+    assert [message for _, message in published] == [f"event {i}" for i in range(25)]
+    declared = [
+        name for channel in connections[0].channels for name in channel.declared
+    ]
+    assert declared == ["user.created"]
+
+
+@pytest.mark.asyncio
+async def test_publisher_applies_backpressure(monkeypatch):
+    """A full buffer makes publish time out instead of growing memory."""
+    release = asyncio.Event()
+
+    async def connect_robust(url):
+        return FakeConnection()
+
+    async def stalled_publish(self, message, routing_key, timeout=None):
+        await release.wait()
+
+    monkeypatch.setattr(aio_pika, "connect_robust", connect_robust)
+    monkeypatch.setattr(FakeExchange, "publish", stalled_publish)
+    publisher = EventPublisher("amqp://test", buffer_size=1, publish_timeout=0.05)
+
+    await publisher.publish("user.created", "in flight")
+    await asyncio.sleep(0)
+    await publisher.publish("user.created", "buffered")
+    with pytest.raises(asyncio.TimeoutError):
+        await publisher.publish("user.created", "rejected")
+
+    release.set()
+    await publisher.close()
@@ -5,8 +5,13 @@ including response status codes and expected prometheus metrics content.
 """
 
 import pytest
-from httpx import AsyncClient
-from ..iam.main import app
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from iam.core.middleware import RequestInstrumentationMiddleware
+from iam.db.session import instrument_engine
+from iam.main import app
 
 
 @pytest.mark.asyncio
@@ -17,7 +22,90 @@ async def test_metrics_endpoint():
     - Endpoint returns 200 status code
     - Response contains expected prometheus metrics
     """
-    async with AsyncClient(transport=app, base_url="http://test") as ac:
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
         response = await ac.get("/metrics")
     assert response.status_code == 200
     assert b"http_requests_total" in response.content
+
+
+@pytest.mark.asyncio
+async def test_requests_are_labelled_by_route_template():
+    """Test that requests are counted per route template, method and status.
+
+    Verifies that:
+    - Path parameters are collapsed into the route template
+    - Unknown paths are grouped under a single label
+    """
+
+    def count(route, status):
+        labels = {"method": "GET", "route": route, "status": status}
+        return REGISTRY.get_sample_value("http_requests_total", labels) or 0
+
+    template = "/api/v1/users/{user_id}"
+    before = count(template, "422"), count("unmatched", "404")
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        await ac.get("/api/v1/users/not-a-number")
+        await ac.get("/no/such/path")
+    assert count(template, "422") == before[0] + 1
+    assert count("unmatched", "404") == before[1] + 1
+
+
+@pytest.mark.asyncio
+async def test_db_queries_are_timed(db_engine):
+    """Test that statements are timed per database and operation.
+
+    Args:
+        db_engine: The in-memory database engine fixture.
+    """
+    labels = {"database": "test", "operation": "SELECT"}
+    instrument_engine(db_engine, "test")
+    async with db_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    count = REGISTRY.get_sample_value("db_query_duration_seconds_count", labels)
+    assert count == 1
+
+
+@pytest.mark.asyncio
+async def test_request_id_is_propagated():
+    """Test that the request ID is echoed, or generated when missing.
+
+    Verifies that:
+    - A client-supplied X-Request-ID is returned unchanged
+    - Requests without one get a fresh ID
+    """
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        given = await ac.get("/health", headers={"X-Request-ID": "abc-123"})
+        first = await ac.get("/health")
+        second = await ac.get("/health")
+    assert given.headers["x-request-id"] == "abc-123"
+    assert first.headers["x-request-id"]
+    assert first.headers["x-request-id"] != second.headers["x-request-id"]
+
+
+@pytest.mark.asyncio
+async def test_unsampled_requests_are_counted_but_not_timed():
+    """Test that sampling only skips the latency histogram.
+
+    Verifies that:
+    - Every request is counted
+    - No duration is observed at a sample rate of zero
+    """
+    labels = {"method": "GET", "route": "/sampled", "status": "200"}
+    inner = FastAPI()
+    inner.get("/sampled")(lambda: {})
+    sampled = RequestInstrumentationMiddleware(inner, sample_rate=0.0)
+    async with AsyncClient(
+        transport=ASGITransport(app=sampled), base_url="http://test"
+    ) as ac:
+        response = await ac.get("/sampled")
+    assert response.status_code == 200
+    assert REGISTRY.get_sample_value("http_requests_total", labels) == 1
+    assert (
+        REGISTRY.get_sample_value("http_request_duration_seconds_count", labels) is None
+    )
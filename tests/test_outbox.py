@@ -0,0 +1,64 @@
+"""Tests for the transactional outbox.
+
+This module verifies that user creation records its event in the outbox and
+that the relay publishes and removes outbox rows in batches.
+"""
+
+import orjson
+import pytest
+from sqlalchemy.future import select
+from iam.crud import user as user_crud
+from iam.crud.outbox import add_event
+from iam.models.outbox import OutboxEvent
+from iam.models.role import Role
+from iam.schemas.user import UserCreate
+from iam.workers import outbox_relay
+
+
+class RecordingPublisher:
+    """Publisher stand-in that records published batches."""
+
+    def __init__(self):
+        self.batches = []
+
+    async def publish_batch(self, events):
+        self.batches.append(events)
+
+
+@pytest.mark.asyncio
+async def test_create_user_writes_outbox_event(db_session, monkeypatch):
+    """The user.created event is committed together with the user."""
+
+    async def set_cache(key, value, ttl=300):
+        pass
+
+    monkeypatch.setattr(user_crud, "set_cache", set_cache)
+    db_session.add(Role(name="admin"))
+    await db_session.commit()
+
+    user = UserCreate(username="ana", email="ana@example.com", role_id=1)
+    db_user = await user_crud.create_user(db_session, user)
+
+    events = (await db_session.execute(select(OutboxEvent))).scalars().all()
+    assert [(e.queue, orjson.loads(e.payload)) for e in events] == [
+        ("user.created", {"user_id": db_user.id, "username": "ana"})
+    ]
+
+
+@pytest.mark.asyncio
+async def test_relay_publishes_and_deletes_in_batches(session_factory, monkeypatch):
+    """The relay drains the outbox in batches of the requested size."""
+    publisher = RecordingPublisher()
+    monkeypatch.setattr(outbox_relay, "publisher", publisher)
+    monkeypatch.setattr(outbox_relay, "async_session", session_factory)
+
+    async with session_factory() as session:
+        for i in range(5):
+            add_event(session, "user.created", f"event {i}")
+        await session.commit()
+
+    assert await outbox_relay.relay_once(batch_size=3) == 3
+    assert await outbox_relay.relay_once(batch_size=3) == 2
+    assert await outbox_relay.relay_once(batch_size=3) == 0
+    assert [len(batch) for batch in publisher.batches] == [3, 2]
+    assert publisher.batches[0][0] == ("user.created", "event 0")
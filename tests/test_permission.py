@@ -0,0 +1,74 @@
+"""
+Test module for permissions and authorization decisions.
+
+This module contains test cases for compiling role permissions into the role
+catalogue and deciding authorization checks against them.
+"""
+
+import pytest
+from iam.crud import permission as permission_crud
+from iam.crud.role import RoleCatalogue, RoleSnapshot
+from iam.models.permission import Permission
+from iam.models.role import Role
+from iam.models.user import User
+from iam.schemas.permission import AuthorizationCheck
+
+
+def test_role_snapshot_allows():
+    """
+    Test permission matching, wildcards included, on a role snapshot.
+    """
+    snapshot = RoleSnapshot.build(
+        1,
+        [Role(id=1, name="admin"), Role(id=2, name="viewer"), Role(id=3, name="ops")],
+        [(1, "*", "*"), (2, "read", "invoices"), (2, "read", "*"), (3, "*", "hosts")],
+    )
+    assert snapshot.allows(1, "delete", "anything")
+    assert snapshot.allows(2, "read", "reports")
+    assert not snapshot.allows(2, "write", "invoices")
+    assert snapshot.allows(3, "restart", "hosts")
+    assert not snapshot.allows(3, "restart", "invoices")
+    assert not snapshot.allows(4, "read", "invoices")
+    assert snapshot.permissions[2] == {("read", "invoices"), ("read", "*")}
+
+
+@pytest.mark.asyncio
+async def test_authorize(db_session, monkeypatch):
+    """
+    Test batched authorization decisions against the role catalogue.
+
+    Args:
+        db_session: The database session fixture.
+        monkeypatch: Fixture used to replace the shared role catalogue.
+
+    Verifies that decisions follow the user's role, are returned in request
+    order and deny unknown users.
+    """
+    db_session.add_all([Role(id=1, name="admin"), Role(id=2, name="viewer")])
+    db_session.add_all(
+        [
+            Permission(role_id=1, action="*", resource="*"),
+            Permission(role_id=2, action="read", resource="invoices"),
+        ]
+    )
+    db_session.add_all(
+        [
+            User(id=1, username="alice", email="alice@example.com", role_id=1),
+            User(id=2, username="bob", email="bob@example.com", role_id=2),
+        ]
+    )
+    await db_session.commit()
+    catalogue = RoleCatalogue(check_interval=60)
+    await catalogue.get(db_session)
+    monkeypatch.setattr(permission_crud, "role_catalogue", catalogue)
+
+    decisions = await permission_crud.authorize(
+        db_session,
+        [
+            AuthorizationCheck(user_id=2, action="read", resource="invoices"),
+            AuthorizationCheck(user_id=2, action="write", resource="invoices"),
+            AuthorizationCheck(user_id=1, action="write", resource="invoices"),
+            AuthorizationCheck(user_id=3, action="read", resource="invoices"),
+        ],
+    )
+    assert decisions == [True, False, True, False]
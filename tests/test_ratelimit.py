@@ -0,0 +1,128 @@
+"""Tests for per-client, per-route rate limiting.
+
+This module verifies limit parsing, the local token bucket pre-filter, the
+Redis sliding window and the 429 responses returned to limited clients.
+"""
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from redis.crc import key_slot
+from iam.core import ratelimit
+from iam.core.ratelimit import RateLimiter, parse_limit, window_key
+from iam.main import app
+
+
+def test_parse_limit():
+    """Test that limits are parsed into a count and a window in seconds."""
+    assert parse_limit("10/second") == (10, 1.0)
+    assert parse_limit("500 / hour") == (500, 3600.0)
+    with pytest.raises(ValueError):
+        parse_limit("10/fortnight")
+    with pytest.raises(ValueError):
+        parse_limit("ten/second")
+
+
+@pytest.mark.asyncio
+async def test_local_bucket_rejects_before_redis(monkeypatch):
+    """Test that a client over its limit on this worker never reaches Redis.
+
+    Args:
+        monkeypatch: Fixture used to replace the Redis call.
+    """
+    calls = []
+
+    async def call_redis(prefix, operation, default=None, shard=None):
+        calls.append(prefix)
+        return 0
+
+    monkeypatch.setattr(ratelimit.cache, "call_redis", call_redis)
+    limiter = RateLimiter({"POST /things": "2/minute"}, max_local_clients=10)
+    assert await limiter.hit("POST /things", "10.0.0.1") == 0
+    assert await limiter.hit("POST /things", "10.0.0.1") == 0
+    assert await limiter.hit("POST /things", "10.0.0.1") > 0
+    assert await limiter.hit("POST /things", "10.0.0.2") == 0
+    assert await limiter.hit("GET /things", "10.0.0.1") == 0
+    assert calls == ["ratelimit"] * 3
+
+
+@pytest.mark.asyncio
+async def test_redis_window_rejects(monkeypatch):
+    """Test that the shared sliding window can reject a request.
+
+    Args:
+        monkeypatch: Fixture used to replace the Redis call.
+    """
+
+    async def call_redis(prefix, operation, default=None, shard=None):
+        return 1500
+
+    monkeypatch.setattr(ratelimit.cache, "call_redis", call_redis)
+    limiter = RateLimiter({"POST /things": "100/second"}, max_local_clients=10)
+    assert await limiter.hit("POST /things", "10.0.0.1") == 1.5
+
+
+def test_window_keys_have_no_hash_tags():
+    """Test that route templates don't turn into Redis Cluster hash tags."""
+    key = window_key("GET /api/v1/users/{user_id}", "10.0.0.1")
+    assert key == "ratelimit:GET /api/v1/users/user_id:10.0.0.1"
+    assert key_slot(key.encode()) != key_slot(
+        window_key("GET /api/v1/users/{user_id}", "10.0.0.2").encode()
+    )
+
+
+@pytest.mark.asyncio
+async def test_limited_requests_get_429(monkeypatch):
+    """Test that the API answers 429 with Retry-After once a limit is reached.
+
+    Args:
+        monkeypatch: Fixture used to replace the limiter and the Redis call.
+    """
+
+    async def call_redis(prefix, operation, default=None, shard=None):
+        return 0
+
+    monkeypatch.setattr(ratelimit.cache, "call_redis", call_redis)
+    monkeypatch.setattr(
+        ratelimit, "rate_limiter", RateLimiter({"GET /health": "1/minute"}, 10)
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        first = await ac.get("/health")
+        second = await ac.get("/health")
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert int(second.headers["retry-after"]) > 0
+
+
+@pytest.mark.asyncio
+async def test_clients_behind_a_trusted_proxy_are_limited_separately(monkeypatch):
+    """Test that clients behind the same proxy don't share a bucket.
+
+    Args:
+        monkeypatch: Fixture used to replace the limiter, the Redis call and
+            the trusted proxies.
+    """
+
+    async def call_redis(prefix, operation, default=None, shard=None):
+        return 0
+
+    monkeypatch.setattr(ratelimit.cache, "call_redis", call_redis)
+    monkeypatch.setattr(
+        ratelimit, "rate_limiter", RateLimiter({"GET /health": "1/minute"}, 10)
+    )
+    monkeypatch.setattr(ratelimit.settings, "FORWARDED_ALLOW_IPS", "10.0.0.0/8")
+    async with AsyncClient(
+        transport=ASGITransport(app=app, client=("10.1.2.3", 4321)),
+        base_url="http://test",
+    ) as ac:
+        first = await ac.get("/health", headers={"X-Forwarded-For": "203.0.113.1"})
+        second = await ac.get(
+            "/health", headers={"X-Forwarded-For": "203.0.113.1, 203.0.113.2"}
+        )
+        repeat = await ac.get(
+            "/health", headers={"X-Forwarded-For": "198.51.100.7, 203.0.113.1"}
+        )
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert repeat.status_code == 429
@@ -2,11 +2,23 @@
 Test module for the resilience decorator functionality.
 
 This module contains tests that verify the behavior of the resilient decorator,
-which provides retry capabilities for temporary failures in async functions.
+which provides retry capabilities for temporary failures in async functions,
+and of the circuit breaker and retry budget behind it.
 """
 
+import asyncio
+import time
+
 import pytest
-from iam.core.resilience import resilient
+from iam.core.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryBudget,
+    get_breaker,
+    reset_deadline,
+    resilient,
+    set_deadline,
+)
 
 COUNTER = 0
 
@@ -42,3 +54,83 @@ async def test_resilient_success():
     """
     result = await fake_service()
     assert result == "Success"
+
+
+def test_circuit_breaker_opens_and_half_opens(monkeypatch):
+    """
+    Test that a breaker opens after consecutive failures and lets a single
+    trial call through once the reset timeout has passed.
+    """
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("test", fail_max=2, reset_timeout=10)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    now[0] += 10
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_retry_budget_limits_retries():
+    """
+    Test that the retry budget refuses retries once its tokens are spent.
+    """
+    budget = RetryBudget(ratio=0.5, min_per_second=0, max_tokens=2)
+    assert budget.try_withdraw()
+    assert budget.try_withdraw()
+    assert not budget.try_withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.try_withdraw()
+
+
+@pytest.mark.asyncio
+async def test_resilient_fails_fast_when_circuit_is_open():
+    """
+    Test that an open breaker rejects calls without running the function.
+    """
+    calls = 0
+
+    @resilient(dependency="test-open")
+    async def service():
+        nonlocal calls
+        calls += 1
+
+    breaker = get_breaker("test-open")
+    for _ in range(breaker.fail_max):
+        breaker.record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        await service()
+    assert calls == 0
+
+
+@pytest.mark.asyncio
+async def test_resilient_stops_at_deadline():
+    """
+    Test that an attempt still running when the deadline passes is cancelled
+    and not retried.
+    """
+    calls = 0
+
+    @resilient(dependency="test-deadline")
+    async def slow_service():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(1)
+
+    token = set_deadline(0.05)
+    try:
+        with pytest.raises(TimeoutError):
+            await slow_service()
+    finally:
+        reset_deadline(token)
+    assert calls == 1
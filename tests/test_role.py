@@ -5,9 +5,13 @@ This module contains test cases for role-related operations like creation,
 validation and management of roles in the IAM system.
 """
 
+import orjson
 import pytest
-from ..iam.crud.role import create_role
-from ..iam.schemas.role import RoleCreate
+from iam.crud import role as role_crud
+from iam.crud.role import RoleCatalogue, RoleSnapshot, create_role
+from iam.models.role import Role
+from iam.models.user import User
+from iam.schemas.role import RoleCreate
 
 
 @pytest.mark.asyncio
@@ -24,3 +28,109 @@ async def test_create_role(db_session):
     role_data = {"name": "admin"}
     role = await create_role(db_session, RoleCreate(**role_data))
     assert role.name == "admin"
+
+
+@pytest.mark.asyncio
+async def test_role_catalogue_reloads_on_version_change(db_session, monkeypatch):
+    """
+    Test that the role catalogue only reloads when the version counter moves.
+
+    Args:
+        db_session: The database session fixture.
+        monkeypatch: Fixture used to replace the Redis version counter.
+    """
+    version = 1
+
+    async def get_counter(key):
+        return version
+
+    monkeypatch.setattr(role_crud, "get_counter", get_counter)
+    catalogue = RoleCatalogue(check_interval=0)
+    db_session.add(Role(name="admin"))
+    await db_session.commit()
+
+    first = await catalogue.get(db_session)
+    assert first.roles == ({"name": "admin", "id": 1},)
+    assert orjson.loads(first.body) == [{"name": "admin", "id": 1}]
+
+    db_session.add(Role(name="viewer"))
+    await db_session.commit()
+    assert await catalogue.get(db_session) is first
+
+    version = 2
+    second = await catalogue.get(db_session)
+    assert second.version == 2
+    assert dict(second.names) == {1: "admin", 2: "viewer"}
+
+
+@pytest.mark.asyncio
+async def test_role_catalogue_resolve_reloads_for_unknown_ids(db_session, monkeypatch):
+    """
+    Test that resolving an unknown role ID reloads the snapshot once.
+
+    Args:
+        db_session: The database session fixture.
+        monkeypatch: Fixture used to make Redis unavailable.
+    """
+
+    async def get_counter(key):
+        return None
+
+    monkeypatch.setattr(role_crud, "get_counter", get_counter)
+    catalogue = RoleCatalogue(check_interval=60)
+    db_session.add(Role(name="admin"))
+    await db_session.commit()
+    assert await catalogue.resolve({1}, db_session) == {1: "admin"}
+
+    db_session.add(Role(name="viewer"))
+    await db_session.commit()
+    assert await catalogue.resolve({1, 2, 3}, db_session) == {1: "admin", 2: "viewer"}
+
+
+def test_role_snapshot_page():
+    """
+    Test keyset pagination over a role snapshot.
+    """
+    snapshot = RoleSnapshot.build(
+        1, [Role(id=role_id, name=f"role{role_id}") for role_id in (1, 2, 5, 9)]
+    )
+    assert [role["id"] for role in snapshot.page(None, 2)] == [1, 2]
+    assert [role["id"] for role in snapshot.page(2, 2)] == [5, 9]
+    assert [role["id"] for role in snapshot.page(4, None)] == [5, 9]
+    assert snapshot.page(9, 2) == ()
+
+
+@pytest.mark.asyncio
+async def test_member_counts_are_rebuilt_when_missing(db_session, monkeypatch):
+    """
+    Test that member counts come from Redis, and from one grouped count when
+    the Redis hash is missing.
+
+    Args:
+        db_session: The database session fixture.
+        monkeypatch: Fixture used to replace the Redis hash and catalogue.
+    """
+    stored = {}
+
+    async def get_hash_counters(key):
+        return stored.get(key), 0
+
+    async def set_hash_counters(key, counters, changes, ttl):
+        stored[key] = dict(counters)
+
+    monkeypatch.setattr(role_crud, "get_hash_counters", get_hash_counters)
+    monkeypatch.setattr(role_crud, "set_hash_counters", set_hash_counters)
+    catalogue = RoleCatalogue(check_interval=60)
+    monkeypatch.setattr(role_crud, "role_catalogue", catalogue)
+    db_session.add_all([Role(id=1, name="admin"), Role(id=2, name="viewer")])
+    db_session.add_all(
+        User(id=i, username=f"u{i}", email=f"u{i}@example.com", role_id=1)
+        for i in range(3)
+    )
+    await db_session.commit()
+    await catalogue.get(db_session)
+
+    assert await role_crud.get_member_counts(db_session) == {1: 3, 2: 0}
+    assert stored[role_crud.ROLE_MEMBERS_KEY] == {"1": 3, "2": 0}
+    stored[role_crud.ROLE_MEMBERS_KEY] = {"1": 2, "2": 1}
+    assert await role_crud.get_member_counts(db_session) == {1: 2, 2: 1}
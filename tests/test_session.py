@@ -0,0 +1,89 @@
+"""Tests for the database engine profile.
+
+This module verifies that engine options are derived from settings and
+adapted to the database backend, and that read replicas are rotated.
+"""
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.requests import Request
+from iam.core.config import settings
+from iam.db import session
+from iam.db.session import InstrumentedQueuePool, ReplicaRouter, engine_options
+
+
+def test_sqlite_keeps_default_pool():
+    """SQLite engines only get logging options."""
+    options = engine_options("sqlite+aiosqlite:///./test.db")
+    assert options == {"echo": settings.DB_ECHO, "echo_pool": settings.DB_ECHO_POOL}
+
+
+def test_asyncpg_profile():
+    """PostgreSQL engines get a sized pool, timeouts and server settings."""
+    options = engine_options("postgresql+asyncpg://iam:secret@db/iam")
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert options["pool_size"] == settings.DB_POOL_SIZE
+    assert options["pool_pre_ping"] is settings.DB_POOL_PRE_PING
+    connect_args = options["connect_args"]
+    assert connect_args["statement_cache_size"] == settings.DB_STATEMENT_CACHE_SIZE
+    assert connect_args["server_settings"]["jit"] == "off"
+    assert connect_args["server_settings"]["statement_timeout"] == str(
+        int(settings.DB_STATEMENT_TIMEOUT * 1000)
+    )
+
+
+def test_replica_router_rotates_and_skips_unhealthy():
+    """Replicas are used in turn, and failed ones are skipped until retried."""
+    engines = [
+        create_async_engine("sqlite+aiosqlite:///:memory:"),
+        create_async_engine("sqlite+aiosqlite:///:memory:"),
+    ]
+    router = ReplicaRouter(engines, "round_robin", retry_interval=60)
+    assert [router.choose() for _ in range(4)] == [0, 1, 0, 1]
+
+    router.mark_unhealthy(0)
+    assert {router.choose() for _ in range(4)} == {1}
+
+    router.mark_unhealthy(1)
+    assert router.choose() is None
+
+
+@pytest.mark.asyncio
+async def test_unreachable_replica_falls_back_to_the_primary(
+    session_factory, monkeypatch
+):
+    """A replica that refuses connections sends the request to the primary."""
+
+    async def refuse():
+        raise ConnectionRefusedError("replica down")
+
+    replica = create_async_engine("sqlite+aiosqlite://", async_creator=refuse)
+    router = ReplicaRouter([replica], "round_robin", retry_interval=60)
+    monkeypatch.setattr(session, "replica_router", router)
+    monkeypatch.setattr(session, "async_session", session_factory)
+
+    reads = session.get_read_session(Request({"type": "http", "headers": []}))
+    db = await anext(reads)
+    try:
+        assert await db.scalar(text("SELECT 1")) == 1
+        assert db.bind is session_factory.kw["bind"]
+    finally:
+        await reads.aclose()
+    assert router.choose() is None
+    await replica.dispose()
+
+
+@pytest.mark.asyncio
+async def test_engines_are_created_per_process(monkeypatch):
+    """Engines only exist between init_engines and dispose_engines."""
+    monkeypatch.setattr(session, "engine", None)
+    monkeypatch.setattr(session, "replica_router", None)
+    session.init_engines()
+    try:
+        assert session.engine is not None
+        assert session.async_session.kw["bind"] is session.engine
+    finally:
+        await session.dispose_engines()
+    assert session.engine is None
+    assert session.async_session.kw["bind"] is None
@@ -0,0 +1,67 @@
+"""Tests for sharding cache keys over several Redis servers.
+
+This module verifies the consistent-hash ring and that a failing shard only
+affects its own keys.
+"""
+
+from collections import Counter
+
+import pytest
+from redis.exceptions import ConnectionError
+from iam.core import cache
+from iam.core.sharding import HashRing
+
+
+def test_hash_ring_spreads_and_keeps_keys():
+    """Test that keys spread evenly and adding a node only moves keys to it."""
+    keys = [f"user:v2:{i}" for i in range(3000)]
+    ring = HashRing(["a", "b", "c"], ["a", "b", "c"])
+    before = {key: ring.node_for(key) for key in keys}
+    assert min(Counter(before.values()).values()) > 600
+
+    grown = HashRing(["c", "a", "d", "b"], ["c", "a", "d", "b"])
+    moved = [key for key in keys if grown.node_for(key) != before[key]]
+    assert 0 < len(moved) < 1200
+    assert {grown.node_for(key) for key in moved} == {"d"}
+
+    with pytest.raises(ValueError):
+        HashRing(["a", "b"], ["a", "a"])
+
+
+class FakeShard:
+    """Dictionary-backed client answering MGET, or failing every call."""
+
+    def __init__(self, data: dict[str, bytes], down: bool = False):
+        self.data = data
+        self.down = down
+        self.calls = 0
+
+    async def mget(self, keys):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("shard down")
+        return [self.data.get(key) for key in keys]
+
+
+@pytest.mark.asyncio
+async def test_get_many_cache_groups_keys_and_degrades_per_shard(monkeypatch):
+    """Test that each shard gets one MGET and a failing one only misses its keys.
+
+    Args:
+        monkeypatch: Fixture used to restore the configured shards.
+    """
+    for name in ("shards", "redis_client", "_ring"):
+        monkeypatch.setattr(cache, name, getattr(cache, name))
+    monkeypatch.setattr(cache, "local_cache", None)
+    keys = [f"user:v2:{i}" for i in range(50)]
+    values = {key: key.encode() for key in keys}
+    up, down = FakeShard(values), FakeShard(values, down=True)
+    cache.open_redis([up, down])
+
+    result = await cache.get_many_cache(keys)
+
+    assert up.calls == down.calls == 1
+    for key, value in zip(keys, result):
+        expected = values[key] if cache.shard_for(key).client is up else None
+        assert value == expected
+    assert any(result) and not all(result)
@@ -0,0 +1,67 @@
+"""Tests for request coalescing.
+
+This module verifies that concurrent loads of the same key share a single
+execution and that failures reach every waiting caller.
+"""
+
+import asyncio
+import pytest
+from iam.core.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    """Only one call runs while others for the same key wait for its result."""
+    flight = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(*(flight.do("user:1", load) for _ in range(20)))
+    assert results == ["value"] * 20
+    assert calls == 1
+    assert not flight.in_flight("user:1")
+
+
+@pytest.mark.asyncio
+async def test_failures_propagate_to_waiters():
+    """Every coalesced caller sees the leading call's exception."""
+    flight = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("database unavailable")
+
+    results = await asyncio.gather(
+        *(flight.do("user:1", load) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_waiters_take_over_when_the_leader_is_cancelled():
+    """A cancelled leader hands the load to a waiter instead of failing it."""
+    flight = SingleFlight()
+    started = asyncio.Event()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        started.set()
+        await asyncio.sleep(0.05 if calls == 1 else 0)
+        return calls
+
+    leader = asyncio.create_task(flight.do("user:1", load))
+    await started.wait()
+    waiters = [asyncio.create_task(flight.do("user:1", load)) for _ in range(3)]
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await asyncio.gather(*waiters) == [2, 2, 2]
+    assert leader.cancelled()
+    assert calls == 2